@@ -5,16 +5,19 @@ import numpy as np
 
 
 def fft_infer_period(data: pd.DataFrame):
-    data = data.values.reshape(-1, )
-    ft = np.fft.rfft(data)
-    freqs = np.fft.rfftfreq(len(data), 1)
-    mags = abs(ft)
-    inflection = np.diff(np.sign(np.diff(mags)))
-    peaks = (inflection < 0).nonzero()[0] + 1
-    peak = peaks[mags[peaks].argmax()]
-    signal_freq = freqs[peak]
-    period = int(1 / signal_freq)
-    return period
+    """Infer the period of every column of data with one batched fft."""
+    values = np.asarray(data, dtype=float)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    mags = abs(np.fft.rfft(values, axis=0))
+    freqs = np.fft.rfftfreq(values.shape[0], 1)
+    inflection = np.diff(np.sign(np.diff(mags, axis=0)), axis=0)
+    # the highest peak of the magnitudes of every column
+    peak_mags = np.where(inflection < 0, mags[1:-1], -np.inf)
+    peaks = peak_mags.argmax(axis=0) + 1
+    signal_freqs = freqs[peaks]
+    periods = (1 / signal_freqs).astype(int)
+    return periods
 
 
 class Snavie(object):
@@ -22,32 +25,23 @@ class Snavie(object):
     def __init__(self):
         self.periods = []
         self.series_name = []
-        self.history_data = []
+        self.history_data = None
 
     def fit(self, df_train: pd.DataFrame, series_name):
         self.series_name = series_name
-        for col in series_name:
-            period = fft_infer_period(df_train[col])
-            self.periods.append(period)
-            self.history_data.append(df_train[col][-period:])
+        values = df_train[series_name].values
+        self.periods = fft_infer_period(values)
+        # the last period of every series is repeated to forecast
+        self.history_data = values[-self.periods.max():]
 
         return self
 
     def predict(self, horizon: int):
-        results = []
-        for i in range(len(self.series_name)):
-            result = []
-            horizon_tmp = horizon
-            while horizon_tmp - self.periods[i] > 0:
-                result.extend(self.history_data[i])
-                horizon_tmp = horizon_tmp - self.periods[i]
-
-            if horizon_tmp > 0:
-                result.extend(self.history_data[i][:horizon_tmp])
-
-            results.append(result)
-        df_forecast = pd.DataFrame(results).T
-        df_forecast.columns = self.series_name
+        n_history, n_series = self.history_data.shape
+        steps = np.arange(horizon).reshape(-1, 1)
+        rows = n_history - self.periods + steps % self.periods
+        forecast = np.take(self.history_data, rows * n_series + np.arange(n_series))
+        df_forecast = pd.DataFrame(forecast, columns=self.series_name)
         return df_forecast
 
 
@@ -2,7 +2,7 @@ from typing import Dict
 
 from hypernets.hyperctl import api as hyperctl_api
 from tsbenchmark import tasks
-from tsbenchmark.util import cal_task_metrics
+from tsbenchmark.util import cal_task_metrics, payload_util
 import pandas as pd
 import json
 import os
@@ -22,13 +22,23 @@ logger = hyn_logging.get_logger(__name__)
 
 __all__ = ['get_task', 'get_local_task', 'send_report_data']
 
+# (task, sink) of the job run by the in-process benchmark, the task is given to the player directly and the report
+# data is passed to the sink instead of being sent to the api server
+_inprocess_context = None
+
+
+def _set_inprocess_context(task, sink):
+    global _inprocess_context
+    _inprocess_context = (task, sink) if task is not None else None
+
 
 def get_task():
     """Get a TsTask from benchmark server.
 
     TsTask is a unit task, which help Player get the data and metadata.
     Get the TsTaskConfig from benchmark server and construct it to TSTask. Call TSTask.ready() method init start
-    time and load data.
+    time and load data. The data is memory-mapped from the datasets cache, so concurrent players on one host
+    share a single copy of it.
 
     See Also
     --------
@@ -43,14 +53,19 @@ def get_task():
     TSTask : The TsTask  for player get the data and metadata.
 
     """
+    if _inprocess_context is not None:
+        return _inprocess_context[0]
+
     hyperctl_job_params = hyperctl_api.get_job_params()
 
     job_params = JobParams(**hyperctl_job_params)
 
-    task_config = tasks.get_task_config(job_params.task_config_id, cache_path=job_params.dataset_cache_path)
+    task_config = tasks.get_task_config(job_params.task_config_id, cache_path=job_params.dataset_cache_path,
+                                        memory_map=True)
 
     t = TSTask(task_config=task_config, random_state=job_params.random_state,
-               max_trials=job_params.max_trials, reward_metric=job_params.reward_metric)
+               max_trials=job_params.max_trials, reward_metric=job_params.reward_metric,
+               server_metrics=job_params.server_metrics)
     t.ready()
     return t
 
@@ -128,6 +143,10 @@ def report_task(report_data: Dict, bm_task_id=None, api_server_uri=None):
 
     """
 
+    if _inprocess_context is not None:
+        _inprocess_context[1](report_data)
+        return
+
     bm_task_id = _get_bm_task_id(bm_task_id)
     assert bm_task_id
     api_server_uri = _get_api_server_api(api_server_uri)
@@ -142,7 +161,7 @@ def report_task(report_data: Dict, bm_task_id=None, api_server_uri=None):
     utils.post_request(report_url, json.dumps(request_dict))
 
 
-def send_report_data(task: TSTask, y_pred: pd.DataFrame, key_params='', best_params=''):
+def send_report_data(task: TSTask, y_pred: pd.DataFrame, key_params='', best_params='', float32=False):
     """Send report data.
 
     This api used for send report data to benchmark server.
@@ -159,10 +178,13 @@ def send_report_data(task: TSTask, y_pred: pd.DataFrame, key_params='', best_par
     best_params: str, default=''
         The best model's params, for automl, there are many models will be trained.
         If user want to save the best params, user may assign the best_params.
+    float32: bool, default=False
+        Whether to send the predicted and real values as float32, which halves the size of the report data.
 
     Notes
     ----------
         When develop a new play locally, this method will help user validate the predicted and params.
+        If the benchmark computes the metrics on the server, only the predicted values are sent.
 
     """
     task._end_time = time.time()
@@ -173,14 +195,25 @@ def send_report_data(task: TSTask, y_pred: pd.DataFrame, key_params='', best_par
     if y_pred.shape[0] != task.get_test().shape[0]:
         raise Exception(f"The result should have {task.get_test().shape[0]} rows but got {y_pred.shape[0]}. ")
 
+    if task.server_metrics:
+        report_data = {
+            'duration': time.time() - task.start_time - task.download_time,
+            'y_predict': payload_util.encode(y_pred[task.series_name], float32=float32),
+            'key_params': key_params,
+            'best_params': best_params
+        }
+        report_task(report_data)
+        return
+
     task_metrics = cal_task_metrics(y_pred, task.get_test()[task.series_name], task.date_name,
                                     task.series_name,
-                                    task.covariables_name, target_metrics, 'regression')
+                                    task.covariables_name, target_metrics, 'regression',
+                                    scales=getattr(task, 'scales', None))
 
     report_data = {
         'duration': time.time() - task.start_time - task.download_time,
-        'y_predict': y_pred[task.series_name].to_json(orient='records')[1:-1].replace('},{', '} {'),
-        'y_real': task.get_test()[task.series_name].to_json(orient='records')[1:-1].replace('},{', '} {'),
+        'y_predict': payload_util.encode(y_pred[task.series_name], float32=float32),
+        'y_real': payload_util.encode(task.get_test()[task.series_name], float32=float32),
         'metrics': task_metrics,
         'key_params': key_params,
         'best_params': best_params
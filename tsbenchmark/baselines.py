@@ -0,0 +1,153 @@
+'''Classic reference forecasts computed by the benchmark server.
+
+All the baselines of a dataset are computed from its train data in one vectorized pass over the matrix of the
+series, scored with the test data cached by the server and saved to the result store like the results reported by
+the players, named with the prefix `baseline_`.
+'''
+import time
+
+import numpy as np
+import pandas as pd
+
+from hypernets.utils import logging
+
+from tsbenchmark.util import payload_util
+
+logger = logging.getLogger(__name__)
+
+BASELINE_PLAYER_PREFIX = 'baseline_'
+
+BASELINE_NAIVE = 'naive'
+BASELINE_SEASONAL_NAIVE = 'seasonal_naive'
+BASELINE_DRIFT = 'drift'
+BASELINE_MEAN = 'mean'
+BASELINE_MOVING_AVERAGE = 'moving_average'
+
+BASELINES = [BASELINE_NAIVE, BASELINE_SEASONAL_NAIVE, BASELINE_DRIFT, BASELINE_MEAN, BASELINE_MOVING_AVERAGE]
+
+
+def is_baseline_player(player_name):
+    return player_name.startswith(BASELINE_PLAYER_PREFIX)
+
+
+def infer_periods(values):
+    '''Infer the period of every column of values with one batched fft, 1 if the series is too short.'''
+    n_rows, n_series = values.shape
+    if n_rows < 4:
+        return np.ones(n_series, dtype=int)
+    mags = abs(np.fft.rfft(values - values.mean(axis=0), axis=0))
+    freqs = np.fft.rfftfreq(n_rows, 1)
+    inflection = np.diff(np.sign(np.diff(mags, axis=0)), axis=0)
+    # the highest peak of the magnitudes of every column
+    peak_mags = np.where(inflection < 0, mags[1:-1], -np.inf)
+    peaks = peak_mags.argmax(axis=0) + 1
+    periods = (1 / freqs[peaks]).astype(int)
+    return np.clip(periods, 1, n_rows)
+
+
+def forecast_baselines(values, horizon, baselines=None, window=None):
+    '''Forecast the next `horizon` steps of every column of values by the baselines.
+
+    Parameters
+    ----------
+    values: array of shape (n_rows, n_series), the missing values are filled by the former ones.
+    horizon: int, steps to forecast.
+    baselines: list of str, baselines to compute, default is all of `BASELINES`.
+    window: int, optional, window of the moving average, default is the inferred period of each series.
+
+    Returns
+    -------
+    dict of baseline to the forecast array of shape (horizon, n_series).
+    '''
+    baselines = BASELINES if baselines is None else baselines
+    values = pd.DataFrame(np.asarray(values, dtype=float)).ffill().bfill().values
+    n_rows, n_series = values.shape
+    if n_rows == 0:
+        raise ValueError("no train data to forecast")
+
+    steps = np.arange(1, horizon + 1).reshape(-1, 1)
+    last = values[-1]
+    columns = np.arange(n_series)
+    need_periods = BASELINE_SEASONAL_NAIVE in baselines or (BASELINE_MOVING_AVERAGE in baselines and window is None)
+    periods = infer_periods(values) if need_periods else None
+
+    forecasts = {}
+    for baseline in baselines:
+        if baseline == BASELINE_NAIVE:
+            forecast = np.repeat(last.reshape(1, -1), horizon, axis=0)
+        elif baseline == BASELINE_SEASONAL_NAIVE:
+            # the last period of every series is repeated
+            rows = n_rows - periods + (steps - 1) % periods
+            forecast = values[rows, columns]
+        elif baseline == BASELINE_DRIFT:
+            slope = (last - values[0]) / (n_rows - 1) if n_rows > 1 else np.zeros(n_series)
+            forecast = last + steps * slope
+        elif baseline == BASELINE_MEAN:
+            forecast = np.repeat(values.mean(axis=0).reshape(1, -1), horizon, axis=0)
+        elif baseline == BASELINE_MOVING_AVERAGE:
+            windows = np.clip(periods if window is None else np.full(n_series, window), 1, n_rows)
+            cumsum = np.vstack([np.zeros((1, n_series)), np.cumsum(values, axis=0)])
+            average = (cumsum[-1] - cumsum[n_rows - windows, columns]) / windows
+            forecast = np.repeat(average.reshape(1, -1), horizon, axis=0)
+        else:
+            raise ValueError(f"Unseen baseline {baseline}, available baselines are {BASELINES}")
+        forecasts[baseline] = forecast
+    return forecasts
+
+
+class BaselinePlayer:
+    '''Stands for a baseline in the benchmark tasks and the results, it has neither env nor exec file.'''
+
+    def __init__(self, baseline):
+        self.baseline = baseline
+        self.name = BASELINE_PLAYER_PREFIX + baseline
+        self.tasks = None
+        self.random = False
+
+
+class BaselineEngine:
+    '''Compute the reference forecasts of the tasks and score them by the scorer of the benchmark server.
+
+    The train data of a task is loaded once and all the baselines are computed in one pass, the test data is taken
+    from the cache of the scorer which is shared with the results reported by the players.
+    '''
+
+    def __init__(self, baselines=None, window=None):
+        baselines = list(BASELINES) if baselines is None else list(baselines)
+        unseen = [b for b in baselines if b not in BASELINES]
+        if len(unseen) > 0:
+            raise ValueError(f"Unseen baselines {unseen}, available baselines are {BASELINES}")
+        if window is not None and window < 1:
+            raise ValueError(f"window of the moving average should be positive but got {window}")
+        self.baselines = baselines
+        self.window = window
+        self.players = {baseline: BaselinePlayer(baseline) for baseline in baselines}
+
+    def forecast(self, df_train, series_name, horizon, baselines=None):
+        baselines = self.baselines if baselines is None else baselines
+        forecasts = forecast_baselines(df_train[series_name].values, horizon, baselines, self.window)
+        return {baseline: pd.DataFrame(forecast, columns=series_name) for baseline, forecast in forecasts.items()}
+
+    def report(self, ts_task, scorer, baselines=None):
+        '''The report data of the baselines of a task, in the same format as the players report to the server.
+
+        Returns
+        -------
+        list of (BaselinePlayer, report data with metrics).
+        '''
+        # the metadata of the task is loaded with the test data by the scorer
+        _, metadata = scorer.get_test(ts_task)
+        start_time = time.time()
+        forecasts = self.forecast(ts_task.get_train(), metadata['series_name'], ts_task.horizon, baselines)
+        # the pass is shared, so is the duration
+        duration = (time.time() - start_time) / max(len(forecasts), 1)
+
+        reports = []
+        for baseline, df_forecast in forecasts.items():
+            report_data = {'duration': duration,
+                           'y_predict': payload_util.encode(df_forecast),
+                           'key_params': '',
+                           'best_params': ''}
+            reports.append((self.players[baseline], scorer.score(ts_task, report_data)))
+        logger.info(f"computed baselines {list(forecasts.keys())} of task {ts_task.id}")
+        return reports
@@ -1,5 +1,11 @@
 import abc
+import multiprocessing
 import os
+import queue
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 from typing import List
 
@@ -8,11 +14,14 @@ from hypernets.hyperctl.batch import ShellJob, Batch
 from hypernets.hyperctl.callbacks import BatchCallback
 from hypernets.utils import logging
 from tsbenchmark import consts
-from tsbenchmark.callbacks import BenchmarkCallback
-from tsbenchmark.consts import DEFAULT_WORKING_DIR
+from tsbenchmark.callbacks import BenchmarkCallback, JobJournal
+from tsbenchmark.consts import DEFAULT_WORKING_DIR, DATA_SIZE_SMALL, DATA_SIZE_MEDIUM, DATA_SIZE_LARGE
+from tsbenchmark.executor import thread_envs
 from tsbenchmark.players import Player, JobParams, PythonEnv
-from tsbenchmark.server import BenchmarkBatchApplication
+from tsbenchmark.provision import EnvProvisioner
+from tsbenchmark.server import BenchmarkBatchApplication, TaskScorer
 from tsbenchmark.tasks import TSTask, TSTaskConfig
+from tsbenchmark.worker import WarmWorkerPool, _load_exec_module
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +39,71 @@ class BenchmarkTask:
     def status(self):
         return self._status
 
+    def set_status(self, status):
+        self._status = status
+
     @property
     def id(self):
         return f"{self.player.name}_{self.ts_task.id}_{self.ts_task.random_state}"
 
 
+class TaskCostEstimator:
+    """Estimate the running time of benchmark tasks to submit the longest ones first.
+
+    The mean duration in the history of the same player and task config is used if there is one. Otherwise
+    the cost is the number of cells of the dataset, guessed by the data_size if the shape is unknown,
+    multiplied by the seconds per cell of the player(or of all players) learned from the history.
+
+    Parameters
+    ----------
+    history: pandas.DataFrame, optional
+        Results of the former runs with columns 'player', 'task_id', 'shape', 'data_size' and 'duration'.
+    """
+
+    DATA_SIZE_CELLS = {DATA_SIZE_SMALL: 1e3, DATA_SIZE_MEDIUM: 1e5, DATA_SIZE_LARGE: 1e7}
+
+    def __init__(self, history=None):
+        self._durations = {}
+        self._player_scales = {}
+        self._scale = 1.0
+
+        if history is None or history.shape[0] == 0:
+            return
+        history = history.dropna(subset=['duration'])
+        if history.shape[0] == 0:
+            return
+        task_ids = history['task_id'].astype(str)
+        self._durations = history['duration'].groupby([history['player'], task_ids]).mean().to_dict()
+        cells = [self.cells_of(shape, data_size) for shape, data_size in zip(history['shape'], history['data_size'])]
+        scales = history['duration'] / cells
+        self._player_scales = scales.groupby(history['player']).median().to_dict()
+        self._scale = float(scales.median())
+
+    @classmethod
+    def cells_of(cls, shape, data_size):
+        sizes = re.findall(r'\d+', shape) if isinstance(shape, str) else []
+        if len(sizes) == 2:
+            return max(int(sizes[0]) * int(sizes[1]), 1)
+        return cls.DATA_SIZE_CELLS.get(data_size, cls.DATA_SIZE_CELLS[DATA_SIZE_SMALL])
+
+    def estimate(self, bm_task):
+        ts_task = bm_task.ts_task
+        duration = self._durations.get((bm_task.player.name, str(ts_task.id)))
+        if duration is not None:
+            return duration
+        scale = self._player_scales.get(bm_task.player.name, self._scale)
+        return self.cells_of(ts_task.shape, ts_task.data_size) * scale
+
+    def order(self, bm_tasks):
+        """Sort the tasks by the estimated cost descending, the longest processing time first."""
+        return sorted(bm_tasks, key=self.estimate, reverse=True)
+
+
 class Benchmark(metaclass=abc.ABCMeta):
 
     def __init__(self, name, desc, players, ts_tasks_config: List[TSTaskConfig], random_states: List[int],
-                 task_constraints=None, working_dir=None, callbacks: List[BenchmarkCallback]=None):
+                 task_constraints=None, working_dir=None, callbacks: List[BenchmarkCallback]=None,
+                 server_metrics=False, history=None, resume=False, baselines=None):
 
         self.name = name
         self.desc = desc
@@ -54,6 +119,15 @@ class Benchmark(metaclass=abc.ABCMeta):
         # self.task_constraints = preset_task_constraints
         self.task_constraints = {} if task_constraints is None else task_constraints
         self.callbacks = callbacks if callbacks is not None else []
+        # whether the players upload only the predictions and the metrics are computed by the server
+        self.server_metrics = server_metrics
+        # jobs are submitted in the order of the costs estimated from the results of the former runs
+        self.cost_estimator = TaskCostEstimator(history)
+        self.history = history
+        # skip the tasks which have results or succeed in the journal
+        self.resume = resume
+        # the engine of the reference forecasts computed by the server, BaselineEngine
+        self.baselines = baselines
 
         if working_dir is None:
             self.working_dir = DEFAULT_WORKING_DIR
@@ -61,10 +135,79 @@ class Benchmark(metaclass=abc.ABCMeta):
             self.working_dir = Path(working_dir).absolute().as_posix()
 
         self._tasks = None
+        self._tasks_by_id = {}
+        self._tasks_by_key = {}
 
     def tasks(self):
         return self._tasks
 
+    def _reset_tasks(self):
+        self._tasks = []
+        self._tasks_by_id = {}
+        self._tasks_by_key = {}
+
+    def _add_task(self, bm_task):
+        self._tasks.append(bm_task)
+        self._tasks_by_id[bm_task.id] = bm_task
+        self._tasks_by_key[(bm_task.player.name, bm_task.ts_task.id, bm_task.ts_task.random_state)] = bm_task
+
+    def _handle_on_start(self):
+        for callback in self.callbacks:
+            callback.on_start(self)
+
+    def _create_tasks(self, ts_task_config):
+        for player in self.players:
+            player: Player = player
+            if player.tasks is not None:
+                # check the player whether support the task type
+                if ts_task_config.task not in player.tasks:
+                    skip_msg = f"skip {ts_task_config.id} for {player.name} because of not supported this task type."
+                    logger.debug(skip_msg)
+                    continue
+            if player.random is True:
+                for random_state in self.random_states:
+                    ts_task = TSTask(ts_task_config, random_state=random_state, **self.task_constraints)
+                    self._add_task(BenchmarkTask(ts_task, player))
+            else:
+                ts_task = TSTask(ts_task_config, random_state=None, **self.task_constraints)
+                self._add_task(BenchmarkTask(ts_task, player))
+
+    def _submitted_tasks(self):
+        """Tasks to submit, the longest first to shorten the tail of the benchmark. The completed tasks are skipped
+        if resume."""
+        completed = self.completed_tasks() if self.resume else set()
+        bm_tasks = []
+        for bm_task in self.cost_estimator.order(self._tasks):
+            task_key = JobJournal.task_key(bm_task.player.name, bm_task.ts_task.id, bm_task.ts_task.random_state)
+            if task_key in completed:
+                logger.info(f"skip task {bm_task.id} because of it is completed")
+                continue
+            bm_tasks.append(bm_task)
+        return bm_tasks
+
+    def _run_baselines(self, scorer):
+        """Compute the baselines of every task with the test data cached by scorer and pass the results to the
+        callbacks like the messages of the players."""
+        if self.baselines is None:
+            return
+        completed = self.completed_tasks() if self.resume else set()
+        for ts_task_config in self.ts_tasks_config:
+            ts_task = TSTask(ts_task_config, random_state=None, **self.task_constraints)
+            baselines = [b for b in self.baselines.baselines
+                         if JobJournal.task_key(self.baselines.players[b].name, ts_task.id, None) not in completed]
+            if len(baselines) == 0:
+                continue
+            try:
+                reports = self.baselines.report(ts_task, scorer, baselines)
+            except Exception as e:
+                logger.exception(f"failed to compute baselines of task {ts_task.id}: {e}")
+                continue
+            for player, report_data in reports:
+                bm_task = BenchmarkTask(ts_task, player)
+                bm_task.set_status(ShellJob.STATUS_SUCCEED)
+                for callback in self.callbacks:
+                    callback.on_task_message(self, bm_task, report_data)
+
     @abc.abstractmethod
     def run(self):
         pass
@@ -73,20 +216,34 @@ class Benchmark(metaclass=abc.ABCMeta):
         pass
 
     def get_task(self, bm_task_id):
-        if self._tasks is None:
-            return None
-        for bm_task in self._tasks:
-            if bm_task.id == bm_task_id:
-                return bm_task
-        return None
+        return self._tasks_by_id.get(bm_task_id)
 
     def find_task(self, player_name, random_state, task_config_id):
-        for bm_task in self._tasks:
-            bm_task: BenchmarkTask = bm_task
-            if bm_task.ts_task.id == task_config_id and bm_task.ts_task.random_state == random_state\
-                    and player_name == bm_task.player.name:
-                return bm_task
-        return None
+        return self._tasks_by_key.get((player_name, task_config_id, random_state))
+
+    def journal_file(self):
+        return (Path(self.working_dir) / JobJournal.FILE_NAME).as_posix()
+
+    def completed_tasks(self):
+        """Keys (player, task_id, random_state) of the tasks of this benchmark which have results or succeed in
+        the journal."""
+        completed = JobJournal(self.journal_file()).succeed_tasks()
+        if self.history is None or self.history.shape[0] == 0:
+            return completed
+        # the history holds the results of other random states and the rows of failed reports as well
+        task_keys = {JobJournal.task_key(bm_task.player.name, bm_task.ts_task.id, bm_task.ts_task.random_state)
+                     for bm_task in self._tasks or []}
+        if self.baselines is not None:
+            task_keys.update(JobJournal.task_key(player.name, ts_task_config.id, None)
+                             for player in self.baselines.players.values()
+                             for ts_task_config in self.ts_tasks_config)
+        history = self.history.dropna(subset=['duration'])
+        for player_name, task_id, random_state in zip(history['player'], history['task_id'],
+                                                      history['random_state']):
+            task_key = JobJournal.task_key(player_name, task_id, random_state)
+            if task_key in task_keys:
+                completed.add(task_key)
+        return completed
 
     def get_batches_data_dir(self):
         return (Path(self.working_dir) / "batches").as_posix()
@@ -101,27 +258,25 @@ class HyperctlBatchCallback(BatchCallback):
         pass
 
     def on_job_start(self, batch, job, executor):
+        bm_task = self.find_ts_task(job)
+        if bm_task is None:
+            logger.warning(f"no benchmark task of job {job.name}, skip its start")
+            return
         for bm_callback in self.bm.callbacks:
-            # bm, bm_task
-            bm_task = self.find_ts_task(job)  # TODO check None
             bm_callback.on_task_start(self.bm, bm_task)
 
     def find_ts_task(self, job):
         job: ShellJob = job
         job_params = JobParams(**job.params)
-
-        random_state = job_params.random_state
-        task_config_id = job_params.task_config_id
-        for bm_task in self.bm.tasks():
-            bm_task: BenchmarkTask = bm_task
-            if bm_task.ts_task.id == task_config_id and bm_task.ts_task.random_state == random_state:
-                return bm_task
-        return None
+        return self.bm.get_task(job_params.bm_task_id)
 
     def on_job_finish(self, batch, job, executor, elapsed: float):
+        bm_task = self.find_ts_task(job)
+        if bm_task is None:
+            logger.warning(f"no benchmark task of job {job.name}, skip its finish")
+            return
+        bm_task.set_status(job.status)
         for bm_callback in self.bm.callbacks:
-            # bm, bm_task
-            bm_task = self.find_ts_task(job)  # TODO check None
             bm_callback.on_task_finish(self.bm, bm_task, elapsed)
 
     def on_job_break(self, batch, job, executor, elapsed: float):  # TODO
@@ -173,7 +328,8 @@ class BenchmarkBaseOnHyperctl(Benchmark, metaclass=abc.ABCMeta):
 
         job_params = JobParams(bm_task_id=bm_task.id, task_config_id=task_id,
                                random_state=random_state, max_trials=safe_getattr(bm_task.ts_task, 'max_trials'),
-                               reward_metric=safe_getattr(bm_task.ts_task, 'reward_metric'))
+                               reward_metric=safe_getattr(bm_task.ts_task, 'reward_metric'),
+                               server_metrics=self.server_metrics)
 
         # TODO support windows
         working_dir_path = batch.data_dir_path() / name
@@ -189,7 +345,9 @@ class BenchmarkBaseOnHyperctl(Benchmark, metaclass=abc.ABCMeta):
         else:
             raise ValueError(f"unseen venv kind {venv_kind}")
 
-        merged_command = f"{self.get_command_prefix()} {command} " \
+        # pin the threads of the numeric libraries to the requested cpu cores
+        envs_prefix = "".join(f"{k}={v} " for k, v in thread_envs(player.resource).items())
+        merged_command = f"{envs_prefix}{self.get_command_prefix()} {command} " \
                          f"{self.get_exec_py_args(working_dir_path, player)} {self.get_datasets_cache_path_args()}" \
                          f"  --python-path={os.getcwd()}"
 
@@ -200,28 +358,8 @@ class BenchmarkBaseOnHyperctl(Benchmark, metaclass=abc.ABCMeta):
                       command=merged_command,
                       output_dir=working_dir,
                       working_dir=working_dir,
-                      assets=self.get_job_asserts(bm_task))
-
-    def _handle_on_start(self):
-        for callback in self.callbacks:
-            callback.on_start(self)
-
-    def _create_tasks(self, ts_task_config):
-        for player in self.players:
-            player: Player = player
-            if player.tasks is not None:
-                # check the player whether support the task type
-                if ts_task_config.task not in player.tasks:
-                    skip_msg = f"skip {ts_task_config.id} for {player.name} because of not supported this task type."
-                    logger.debug(skip_msg)
-                    continue
-            if player.random is True:
-                for random_state in self.random_states:
-                    ts_task = TSTask(ts_task_config, random_state=random_state, **self.task_constraints)
-                    self._tasks.append(BenchmarkTask(ts_task, player))
-            else:
-                ts_task = TSTask(ts_task_config, random_state=None, **self.task_constraints)
-                self._tasks.append(BenchmarkTask(ts_task, player))
+                      assets=self.get_job_asserts(bm_task),
+                      resource=player.resource.copy())
 
     @staticmethod
     def get_datasets_cache_path_args():
@@ -233,7 +371,7 @@ class BenchmarkBaseOnHyperctl(Benchmark, metaclass=abc.ABCMeta):
 
     def run(self):
         self._handle_on_start()  # callback start
-        self._tasks = []
+        self._reset_tasks()
         # create batch app
         batches_data_dir = self.get_batches_data_dir()
 
@@ -242,11 +380,15 @@ class BenchmarkBaseOnHyperctl(Benchmark, metaclass=abc.ABCMeta):
         for ts_task_config in self.ts_tasks_config:
             self._create_tasks(ts_task_config)
 
+        # build the conda envs before the jobs racing on them
+        self.provision_envs()
+
         # generate Hyperctl Jobs
-        for bm_task in self._tasks:
+        for bm_task in self._submitted_tasks():
             self.add_job(bm_task, batch)
 
         self._batch_app = self.create_batch_app(batch)
+        self._run_baselines(self._batch_app.scorer)
         self._batch_app.start()
 
     def stop(self):
@@ -265,6 +407,9 @@ class BenchmarkBaseOnHyperctl(Benchmark, metaclass=abc.ABCMeta):
         batch_app = BenchmarkBatchApplication(**copy_dict)
         return batch_app
 
+    def provision_envs(self):
+        pass
+
     @abc.abstractmethod
     def get_backend_type(self):
         raise NotImplemented
@@ -293,6 +438,10 @@ class LocalBenchmark(BenchmarkBaseOnHyperctl):
             self.conda_home = kwargs.pop("conda_home")
         else:
             self.conda_home = None
+        # dir of the envs packed by conda-pack
+        self.conda_packs = kwargs.pop("conda_packs", None)
+        # capacity of the local machine to pack the jobs, default is all cpu cores and memory
+        self.resource = kwargs.pop("resource", None)
 
         super(LocalBenchmark, self).__init__(*args, **kwargs)
 
@@ -301,24 +450,57 @@ class LocalBenchmark(BenchmarkBaseOnHyperctl):
         if PythonEnv.KIND_CONDA in venvs and self.conda_home is None:
             raise ValueError(f"'conda_home' can not be None because of some player using conda virtual env.")
 
+        self._worker_pool = None
+
+    def run(self):
+        warm_players = [p for p in self.players if p.warm_worker.enable]
+        if len(warm_players) > 0:
+            self._worker_pool = WarmWorkerPool()
+        try:
+            for player in warm_players:
+                socket_path = self._worker_pool.start(player.name, player.env.venv.py_executable,
+                                                      player.abs_exec_file_path().as_posix(),
+                                                      player.warm_worker.preload)
+                logger.info(f"warm worker of player {player.name} is listening on {socket_path}")
+            super(LocalBenchmark, self).run()
+        finally:
+            self._stop_workers()
+
+    def stop(self):
+        super(LocalBenchmark, self).stop()
+        self._stop_workers()
+
+    def _stop_workers(self):
+        if self._worker_pool is not None:
+            self._worker_pool.stop()
+            self._worker_pool = None
+
+    def provision_envs(self):
+        if self.conda_home is not None:
+            EnvProvisioner(packs_dir=self.conda_packs).provision_local(self.players, self.conda_home)
+
     def get_backend_type(self):
         return 'local'
 
     def get_backend_conf(self):
+        backend_conf = {}
         if self.conda_home is not None:
-            return {'environments': {consts.ENV_TSB_CONDA_HOME: self.conda_home}}
-        else:
-            return {}
+            backend_conf['environments'] = {consts.ENV_TSB_CONDA_HOME: self.conda_home}
+        if self.resource is not None:
+            backend_conf['resource'] = self.resource
+        return backend_conf
 
     def make_run_custom_pythonenv_command(self,  bm_task: BenchmarkTask, batch: Batch, name):
         custom_py_executable = bm_task.player.env.venv.py_executable
         command = f"--venv-kind={PythonEnv.KIND_CUSTOM_PYTHON} --custom-py-executable={custom_py_executable}"
+        if self._worker_pool is not None and bm_task.player.warm_worker.enable:
+            command = f"{command} --warm-socket={self._worker_pool.socket_path(bm_task.player.name)}"
         return command
 
     def make_run_requirements_requirements_txt_command(self, working_dir_path, player):
         local_requirements_txt_file = player.base_dir_path / player.env.requirements.file_name
         command = f"--venv-kind={PythonEnv.KIND_CONDA} " \
-                  f"--venv-name={player.env.venv.name} " \
+                  f"--venv-name={player.env.venv.env_name} " \
                   f"--requirements-kind={PythonEnv.REQUIREMENTS_REQUIREMENTS_TXT} " \
                   f"--requirements-txt-file={local_requirements_txt_file} " \
                   f"--requirements-txt-py-version={player.env.requirements.py_version}"
@@ -327,7 +509,7 @@ class LocalBenchmark(BenchmarkBaseOnHyperctl):
     def make_run_requirements_conda_yaml_command(self, working_dir_path, player):
         local_requirements_txt_file = player.base_dir_path / player.env.requirements.file_name
         command = f"--venv-kind={PythonEnv.KIND_CONDA} " \
-                  f"--venv-name={player.env.venv.name} " \
+                  f"--venv-name={player.env.venv.env_name} " \
                   f"--requirements-kind={PythonEnv.REQUIREMENTS_CONDA_YAML} " \
                   f"--requirements-yaml-file={local_requirements_txt_file}"
         return command
@@ -351,6 +533,7 @@ class RemoteSSHBenchmark(BenchmarkBaseOnHyperctl):
             self.machines = kwargs.pop("machines")
         else:
             raise ValueError("missing args 'machines' ")
+        self.conda_packs = kwargs.pop("conda_packs", None)
 
         super(RemoteSSHBenchmark, self).__init__(*args, **kwargs)
 
@@ -362,6 +545,15 @@ class RemoteSSHBenchmark(BenchmarkBaseOnHyperctl):
                     raise ValueError(f"'conda_home' in machines can not be None"
                                      f" because of some player using conda virtual env.")
 
+        for player in self.players:
+            if player.warm_worker.enable:
+                logger.warning(f"warm worker of player {player.name} is ignored by the remote benchmark.")
+
+    def provision_envs(self):
+        venvs = set([p.env.venv_kind for p in self.players])
+        if PythonEnv.KIND_CONDA in venvs:
+            EnvProvisioner(packs_dir=self.conda_packs).provision_remote(self.players, self.machines)
+
     def get_backend_type(self):
         return 'remote'
 
@@ -372,7 +564,7 @@ class RemoteSSHBenchmark(BenchmarkBaseOnHyperctl):
 
     def make_run_requirements_requirements_txt_command(self, working_dir_path, player):
         remote_requirements_txt_file = (working_dir_path / "resources" / player.name / player.env.requirements.file_name).as_posix()
-        command = f"--venv-kind=conda --venv-name={player.env.venv.name} " \
+        command = f"--venv-kind=conda --venv-name={player.env.venv.env_name} " \
                   f"--requirements-kind={PythonEnv.REQUIREMENTS_REQUIREMENTS_TXT} " \
                   f"--requirements-txt-file={remote_requirements_txt_file} " \
                   f"--requirements-txt-py-version={player.env.requirements.py_version}"
@@ -380,7 +572,8 @@ class RemoteSSHBenchmark(BenchmarkBaseOnHyperctl):
 
     def get_job_asserts(self, bm_task: BenchmarkTask):
         run_py_shell = (HERE / "run_py.sh").absolute().as_posix()
-        return [run_py_shell, bm_task.player.base_dir]
+        provision_env_shell = (HERE / "provision_env.sh").absolute().as_posix()
+        return [run_py_shell, provision_env_shell, bm_task.player.base_dir]
 
     def make_run_custom_pythonenv_command(self,  bm_task: BenchmarkTask, batch: Batch, name):
         custom_py_executable = bm_task.player.env.venv.py_executable
@@ -390,7 +583,7 @@ class RemoteSSHBenchmark(BenchmarkBaseOnHyperctl):
     def make_run_requirements_conda_yaml_command(self, working_dir_path, player):
         conda_yaml_file = (working_dir_path / "resources" / player.name / player.env.requirements.file_name).as_posix()
         command = f"--venv-kind={PythonEnv.KIND_CONDA} " \
-                  f"--venv-name={player.env.venv.name} --requirements-kind={PythonEnv.REQUIREMENTS_CONDA_YAML} " \
+                  f"--venv-name={player.env.venv.env_name} --requirements-kind={PythonEnv.REQUIREMENTS_CONDA_YAML} " \
                   f"--requirements-yaml-file={conda_yaml_file}"
         return command
 
@@ -400,3 +593,155 @@ class RemoteSSHBenchmark(BenchmarkBaseOnHyperctl):
     def get_exec_py_args(self, working_dir_path, player):
         remote_player_exec_file = (working_dir_path / "resources" / player.name / player.exec_file).as_posix()
         return f"--python-script={remote_player_exec_file}"
+
+
+_inprocess_exec_modules = {}
+
+# the queue to notify the benchmark of the tasks picked up by the process
+_inprocess_start_queue = None
+
+
+def _init_inprocess_worker(start_queue):
+    global _inprocess_start_queue
+    _inprocess_start_queue = start_queue
+
+
+def _run_inprocess_task(bm_task_id, player_name, exec_file, task_config_id, random_state, task_constraints,
+                        server_metrics):
+    from tsbenchmark import api, tasks
+
+    start_time = time.time()
+    if _inprocess_start_queue is not None:
+        _inprocess_start_queue.put((bm_task_id, os.getpid()))
+
+    # the exec file of the player is imported once per process
+    if exec_file not in _inprocess_exec_modules:
+        _inprocess_exec_modules[exec_file] = _load_exec_module(exec_file, f"tsb_player_exec_{player_name}")
+    module = _inprocess_exec_modules[exec_file]
+
+    task_config = tasks.get_task_config(task_config_id, memory_map=True)
+    ts_task = TSTask(task_config, random_state=random_state, server_metrics=server_metrics, **task_constraints)
+    ts_task.ready()
+
+    messages = []
+    api._set_inprocess_context(ts_task, messages.append)
+    try:
+        module.main()
+    finally:
+        api._set_inprocess_context(None, None)
+    return messages, time.time() - start_time
+
+
+class InProcessBenchmark(Benchmark):
+    """Run the custom_python players in a process pool of the current interpreter.
+
+    The jobs call `main()` of the players directly, `tsb.api.get_task` returns the task prepared by the pool and
+    the report data is passed back to the benchmark, so there is neither shell nor api server. The exec files and
+    the datasets are loaded once per process of the pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.n_workers = kwargs.pop("n_workers", None)
+        kwargs.pop('batch_app_init_kwargs', None)  # no batch application
+        super(InProcessBenchmark, self).__init__(*args, **kwargs)
+
+        for player in self.players:
+            if player.env.venv_kind != PythonEnv.KIND_CUSTOM_PYTHON:
+                raise ValueError(f"in-process benchmark supports only {PythonEnv.KIND_CUSTOM_PYTHON} players "
+                                 f"but the venv of {player.name} is {player.env.venv_kind}")
+            if Path(player.env.venv.py_executable).resolve() != Path(sys.executable).resolve():
+                logger.warning(f"player {player.name} runs with the current interpreter {sys.executable} instead of "
+                               f"{player.env.venv.py_executable}")
+
+        self.scorer = TaskScorer()
+        self._executor = None
+        self._futures = None
+
+    def _on_task_start(self, bm_task, started):
+        if bm_task.id in started:
+            return
+        started.add(bm_task.id)
+        for callback in self.callbacks:
+            callback.on_task_start(self, bm_task)
+
+    def _on_task_done(self, bm_task, future, started):
+        try:
+            messages, elapsed = future.result()
+            # the notification of the start may be still in the queue
+            self._on_task_start(bm_task, started)
+            self._handle_messages(bm_task, messages)
+            bm_task.set_status(ShellJob.STATUS_SUCCEED)
+        except Exception as e:
+            logger.exception(f"failed to run task {bm_task.id}: {e}")
+            self._on_task_start(bm_task, started)
+            bm_task.set_status(ShellJob.STATUS_FAILED)
+            elapsed = 0
+        for callback in self.callbacks:
+            callback.on_task_finish(self, bm_task, elapsed)
+
+    def _handle_messages(self, bm_task, messages):
+        for report_data in messages:
+            if 'metrics' not in report_data and 'y_predict' in report_data:
+                report_data = self.scorer.score(bm_task.ts_task, report_data)
+            for callback in self.callbacks:
+                callback.on_task_message(self, bm_task, report_data)
+
+    def run(self):
+        self._handle_on_start()
+        self._reset_tasks()
+        for ts_task_config in self.ts_tasks_config:
+            self._create_tasks(ts_task_config)
+        self._run_baselines(self.scorer)
+
+        # the tasks are started once they are picked up by the processes of the pool rather than submitted
+        start_queue = multiprocessing.Queue()
+        started = set()
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_inprocess_worker,
+                                 initargs=(start_queue,)) as executor:
+            self._executor = executor
+            futures = self._futures = {}
+            for bm_task in self._submitted_tasks():
+                future = executor.submit(_run_inprocess_task, bm_task.id, bm_task.player.name,
+                                         bm_task.player.abs_exec_file_path().as_posix(), bm_task.ts_task.id,
+                                         bm_task.ts_task.random_state, self.task_constraints, self.server_metrics)
+                futures[future] = bm_task
+
+            futures_by_id = {bm_task.id: future for future, bm_task in futures.items()}
+            finished = set()
+            # the future of the task running in each process of the pool
+            running = {}
+
+            def finish(future):
+                if future not in finished:
+                    finished.add(future)
+                    self._on_task_done(futures[future], future, started)
+
+            pending = set(futures.keys())
+            while len(pending) > 0:
+                done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future)
+                while True:
+                    try:
+                        bm_task_id, pid = start_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    # a process picks up a task after it returned the former one, whose result may be still on
+                    # the way, so the former one is finished first
+                    if pid in running:
+                        finish(running[pid])
+                    running[pid] = futures_by_id[bm_task_id]
+                    self._on_task_start(self.get_task(bm_task_id), started)
+        self._executor = None
+        self._futures = None
+
+        for callback in self.callbacks:
+            callback.on_finish(self)
+
+    def stop(self):
+        executor, futures = self._executor, self._futures
+        if executor is not None:
+            # the pending tasks are cancelled one by one, cancel_futures of shutdown requires python 3.9
+            for future in list(futures.keys()):
+                future.cancel()
+            executor.shutdown(wait=False)
@@ -1,3 +1,7 @@
+import json
+import os
+import threading
+import time
 from typing import Dict
 
 
@@ -45,3 +49,86 @@ class ReporterCallback(BenchmarkCallback):
 
     def on_finish(self, bm):
         self.reporter.generate_report()
+
+
+class JobJournal:
+    """Durable journal of the states of the benchmark tasks.
+
+    The states are appended as json lines and every line is synced to disk, so the journal survives the crash of
+    the benchmark server, a line truncated by the crash is ignored.
+    """
+
+    FILE_NAME = 'journal.jsonl'
+
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEED = 'succeed'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, journal_file):
+        self.journal_file = journal_file
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def task_key(player_name, task_id, random_state):
+        # the random state read from files may be a float or nan
+        if random_state is None or random_state != random_state:
+            random_state = None
+        else:
+            random_state = int(random_state)
+        return player_name, str(task_id), random_state
+
+    def append(self, bm_task, status):
+        record = {'bm_task_id': bm_task.id,
+                  'player': bm_task.player.name,
+                  'task_id': str(bm_task.ts_task.id),
+                  'random_state': bm_task.ts_task.random_state,
+                  'status': status,
+                  'time': time.time()}
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.journal_file)), exist_ok=True)
+            with open(self.journal_file, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def records(self):
+        if not os.path.exists(self.journal_file):
+            return []
+        records = []
+        with open(self.journal_file, 'r') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass
+        return records
+
+    def succeed_tasks(self):
+        """Keys (player, task_id, random_state) of the tasks whose last state is succeed."""
+        states = {}
+        for record in self.records():
+            states[self.task_key(record['player'], record['task_id'], record['random_state'])] = record['status']
+        return set(key for key, status in states.items() if status == self.STATUS_SUCCEED)
+
+
+class JournalCallback(BenchmarkCallback):
+
+    def __init__(self, journal_file=None):
+        self.journal_file = journal_file
+        self.journal = None
+
+    def on_start(self, bm):
+        journal_file = self.journal_file
+        if journal_file is None:
+            journal_file = os.path.join(bm.working_dir, JobJournal.FILE_NAME)
+        self.journal = JobJournal(journal_file)
+
+    def on_task_start(self, bm, bm_task):
+        self.journal.append(bm_task, JobJournal.STATUS_RUNNING)
+
+    def on_task_finish(self, bm, bm_task, elapsed: float):
+        status = bm_task.status()
+        self.journal.append(bm_task, status if status is not None else JobJournal.STATUS_SUCCEED)
+
+    def on_task_break(self, bm, bm_task, elapsed: float):
+        self.journal.append(bm_task, JobJournal.STATUS_FAILED)
@@ -7,9 +7,9 @@ import os
 import tsbenchmark
 from hypernets.hyperctl.utils import load_yaml
 from tsbenchmark import consts
-from tsbenchmark.benchmark import LocalBenchmark, RemoteSSHBenchmark, Benchmark
+from tsbenchmark.benchmark import LocalBenchmark, RemoteSSHBenchmark, InProcessBenchmark, Benchmark
 import tsbenchmark.tasks
-from tsbenchmark.callbacks import BenchmarkCallback
+from tsbenchmark.callbacks import BenchmarkCallback, JournalCallback
 from tsbenchmark.players import Player, load_player
 from hypernets.utils import logging
 
@@ -74,19 +74,7 @@ class CopyCfgCallback(BenchmarkCallback):
             json.dump(bm.random_states, f)
 
 
-def load_benchmark(config_file: str, working_dir=None):
-    config_dict = load_yaml(config_file)
-    name = config_dict['name']
-    desc = config_dict.get('desc', '')
-    kind = config_dict.get('kind', 'local')
-    assert kind in ['local', 'remote']
-
-    # working_dir
-    if working_dir is None:
-        working_dir = Path(config_dict.get('working_dir', "~/tsbenchmark-data")).expanduser().as_posix()
-
-    # select datasets and tasks
-    datasets_config = config_dict.get('datasets', {})
+def _select_task_ids(datasets_config):
     datasets_config_cache_path = datasets_config.get('cache_path')
     if datasets_config_cache_path is not None:
         os.environ[consts.ENV_DATASETS_CACHE_PATH] = datasets_config_cache_path
@@ -102,9 +90,38 @@ def load_benchmark(config_file: str, working_dir=None):
                                                             data_size=datasets_filter_data_sizes,
                                                             ids=datasets_filter_data_ids)
     assert selected_task_ids is not None and len(selected_task_ids) > 0, "no task selected"
+    return selected_task_ids
+
+
+def prefetch_datasets(config_file: str, n_workers=consts.DEFAULT_PREFETCH_WORKERS, keep_csv=True):
+    """Download the datasets selected by the benchmark config before running it, so that jobs never wait for
+    downloading. If keep_csv is False, only the feather cache of the data is kept.
+    """
+    config_dict = load_yaml(config_file)
+    selected_task_ids = _select_task_ids(config_dict.get('datasets', {}))
+    logger.info(f"prefetch datasets of {len(selected_task_ids)} tasks with {n_workers} workers")
+    tsbenchmark.tasks.prefetch_task_configs(selected_task_ids, n_workers=n_workers, keep_csv=keep_csv)
+    return selected_task_ids
+
+
+def load_benchmark(config_file: str, working_dir=None, resume=False):
+    config_dict = load_yaml(config_file)
+    name = config_dict['name']
+    desc = config_dict.get('desc', '')
+    kind = config_dict.get('kind', 'local')
+    assert kind in ['local', 'remote', 'inprocess', 'multiprocessing']
+
+    # working_dir
+    if working_dir is None:
+        working_dir = Path(config_dict.get('working_dir', "~/tsbenchmark-data")).expanduser().as_posix()
+
+    # select datasets and tasks
+    datasets_config = config_dict.get('datasets', {})
+    datasets_filter_tasks = datasets_config.get('filter', {}).get('tasks')
+    selected_task_ids = _select_task_ids(datasets_config)
 
     # load tasks
-    task_configs = [tsbenchmark.tasks.get_task_config(tid) for tid in selected_task_ids]
+    task_configs = tsbenchmark.tasks.get_task_configs(selected_task_ids)
 
     # load players
     players_name_or_path = config_dict.get('players')
@@ -113,6 +130,12 @@ def load_benchmark(config_file: str, working_dir=None):
 
     # random_states
     random_states = config_dict.get('random_states')
+    random_states_file = Path(working_dir) / 'random_states'
+    if resume and random_states_file.exists():
+        # continue with the random states of the interrupted run
+        with open(random_states_file, 'r') as f:
+            random_states = json.load(f)
+        logger.info(f"resume with random states {random_states} from {random_states_file}")
     if random_states is None or len(random_states) < 1:
         n_random_states = config_dict.get('n_random_states', 3)
         random_states = [random.Random().randint(1000, 10000) for _ in range(n_random_states)]
@@ -122,11 +145,12 @@ def load_benchmark(config_file: str, working_dir=None):
 
     # copy configs
     copy_cfg_callback = CopyCfgCallback(config_file)
-    callbacks = [copy_cfg_callback]
+    callbacks = [copy_cfg_callback, JournalCallback()]
 
     # report
     report = config_dict.get('report', {})
     report_enable = report.get('enable', True)
+    server_metrics = report.get('server_metrics', False)
     if report_enable is True:
         report_path = Path(report.get('path', '~/benchmark-output/hyperts')).expanduser().as_posix()
         # task_types = list(set(tsbenchmark.tasks.get_task_config(t).task for t in selected_task_ids))
@@ -136,9 +160,31 @@ def load_benchmark(config_file: str, working_dir=None):
             'name': name,
             'desc': desc,
             'random_states': random_states,
-            'task_filter.tasks': datasets_filter_tasks
+            'task_filter.tasks': datasets_filter_tasks,
+            'report.stats': report.get('stats'),
+            'report.live_interval': report.get('live_interval'),
+            'report.figures': report.get('figures'),
+            'report.render_workers': report.get('render_workers')
          }
-        callbacks.append(ReporterCallback(benchmark_config=benchmark_config))
+        reporter_callback = ReporterCallback(benchmark_config=benchmark_config)
+        callbacks.append(reporter_callback)
+        # the reference forecasts computed by the server
+        baselines = report.get('baselines')
+        if baselines is not None and len(baselines) > 0:
+            from tsbenchmark.baselines import BaselineEngine
+            baselines = BaselineEngine(baselines, window=report.get('baselines_window'))
+        else:
+            baselines = None
+        # the durations of the former runs of the configured players and tasks order the jobs, and the results of
+        # them are completed if resume
+        player_names = [player.name for player in players]
+        if baselines is not None:
+            player_names.extend(player.name for player in baselines.players.values())
+        history = reporter_callback.reporter.result_store.query(player=player_names,
+                                                                task_id=[str(t) for t in selected_task_ids])
+    else:
+        history = None
+        baselines = None
 
     # batch_application_config
     batch_application_config = config_dict.get('batch_application_config', {})
@@ -146,16 +192,24 @@ def load_benchmark(config_file: str, working_dir=None):
     init_kwargs = dict(name=name, desc=desc, players=players, callbacks=callbacks,
                        batch_app_init_kwargs=batch_application_config,
                        working_dir=working_dir, random_states=random_states,
-                       ts_tasks_config=task_configs, task_constraints=task_constraints)
+                       ts_tasks_config=task_configs, task_constraints=task_constraints,
+                       server_metrics=server_metrics, history=history, resume=resume, baselines=baselines)
+
+    conda_packs = config_dict.get('venv', {}).get('conda', {}).get('packs')
 
     if kind == 'local':
         # venvs
         conda_home = config_dict.get('venv', {}).get('conda', {}).get('home')
-        benchmark = LocalBenchmark(conda_home=conda_home, **init_kwargs)
+        resource = config_dict.get('resource')
+        benchmark = LocalBenchmark(conda_home=conda_home, conda_packs=conda_packs, resource=resource, **init_kwargs)
         return benchmark
     elif kind == 'remote':
         machines = config_dict['machines']
-        benchmark = RemoteSSHBenchmark(**init_kwargs, machines=machines)
+        benchmark = RemoteSSHBenchmark(**init_kwargs, machines=machines, conda_packs=conda_packs)
+        return benchmark
+    elif kind in ['inprocess', 'multiprocessing']:
+        n_workers = config_dict.get('inprocess', {}).get('n_workers')
+        benchmark = InProcessBenchmark(n_workers=n_workers, **init_kwargs)
         return benchmark
     else:
         raise RuntimeError(f"Unseen kind {kind}")
@@ -4,8 +4,9 @@ from pathlib import Path
 
 from hypernets.utils import logging
 from hypernets.utils import logging as hyn_logging
-from tsbenchmark.cfg import load_benchmark
-from tsbenchmark.reporter import load_compare_reporter
+from tsbenchmark import consts
+from tsbenchmark.cfg import load_benchmark, prefetch_datasets
+from tsbenchmark.reporter import load_compare_reporter, render_figures
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +20,11 @@ def main():
     Examples:
         cd tsbenchmark/tests
         tsb run --config ./benchmark_example_local.yaml
+        tsb run --config ./benchmark_example_local.yaml --resume
         tsb --log-level=DEBUG run --config ./benchmark_example_local.yaml
         tsb compare ~/tsbenchmark-data/report/bechmark1 ~/tsbenchmark-data/report/bechmark2
+        tsb prefetch --config ./benchmark_example_local.yaml --workers 8
+        tsb render --path ~/benchmark-output/hyperts/benchmark1
     """
     print("PWD_path")
     print(PWD_path.as_posix())
@@ -46,11 +50,27 @@ def main():
     def setup_run_parser(operation_parser):
         exec_parser = operation_parser.add_parser("run", help="run benchmark")
         exec_parser.add_argument("-c", "--config", help="benchmark yaml config file", default=None, required=True)
+        exec_parser.add_argument("--resume", action="store_true",
+                                 help="resume the interrupted benchmark, skip the tasks already have results")
 
     def setup_compare_parser(operation_parser):
         exec_parser = operation_parser.add_parser("compare", help="compare benchmark reports")
         exec_parser.add_argument("-c", "--config", help="compare yaml config file", default=None, required=True)
 
+    def setup_prefetch_parser(operation_parser):
+        exec_parser = operation_parser.add_parser("prefetch", help="download datasets of benchmark")
+        exec_parser.add_argument("-c", "--config", help="benchmark yaml config file", default=None, required=True)
+        exec_parser.add_argument("-w", "--workers", type=int, default=consts.DEFAULT_PREFETCH_WORKERS,
+                                 help="max number of datasets to download at the same time, default is %(default)s")
+        exec_parser.add_argument("--no-csv", dest="keep_csv", action="store_false",
+                                 help="unzip train and test data into the feather cache only, without the csv files")
+
+    def setup_render_parser(operation_parser):
+        exec_parser = operation_parser.add_parser("render", help="render figures of benchmark reports")
+        exec_parser.add_argument("-p", "--path", help="dir of the report csv files", default=None, required=True)
+        exec_parser.add_argument("-w", "--workers", type=int, default=None,
+                                 help="number of processes to render figures, default is the number of cpus")
+
     parser = argparse.ArgumentParser(prog="tsb",
                                      description='tsb command is used to manage benchmarks', add_help=True)
     setup_global_args(parser)
@@ -59,6 +79,8 @@ def main():
 
     setup_run_parser(subparsers)
     setup_compare_parser(subparsers)
+    setup_prefetch_parser(subparsers)
+    setup_render_parser(subparsers)
 
     args_namespace = parser.parse_args()
 
@@ -72,12 +94,15 @@ def main():
     operation = kwargs.pop('operation')
 
     if operation == 'run':
-        benchmark = load_benchmark(kwargs.get('config'))
+        benchmark = load_benchmark(kwargs.get('config'), resume=kwargs.get('resume'))
         benchmark.run()
     elif operation == 'compare':
         reporter = load_compare_reporter(kwargs.get('config'))
         reporter.run_compare()
-
+    elif operation == 'prefetch':
+        prefetch_datasets(kwargs.get('config'), n_workers=kwargs.get('workers'), keep_csv=kwargs.get('keep_csv'))
+    elif operation == 'render':
+        render_figures(kwargs.get('path'), n_workers=kwargs.get('workers'))
     else:
         parser.print_help()
         # raise ValueError(f"unknown job operation: {operation} ")
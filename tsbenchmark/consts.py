@@ -10,10 +10,12 @@ DEFAULT_WORKING_DIR = Path("~/tsbenchmark-working-dir").expanduser().as_posix()
 DATASETS_SOURCE_MAP = {'AWS': 'https://tsbenchmark.s3.amazonaws.com/datas'}
 DATASETS_SOURCE_DEFAULT = 'AWS'
 
-DEFAULT_REPORT_METRICS = ['smape', 'mape', 'rmse', 'mae']
+DEFAULT_REPORT_METRICS = ['smape', 'mape', 'rmse', 'mae', 'mase', 'rmsse', 'rel_mae', 'rel_rmse']
 
 DEFAULT_DOWNLOAD_RETRY_TIMES = 3
 
+DEFAULT_PREFETCH_WORKERS = 4
+
 NONE_DEV_ENV = os.getenv('developer') is None
 
 DATA_SIZE_SMALL = 'small'
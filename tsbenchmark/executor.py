@@ -0,0 +1,75 @@
+from multiprocessing import cpu_count
+
+import psutil
+from hypernets.hyperctl.executor import LocalExecutorManager, LocalShellExecutor, NoResourceException
+from hypernets.utils import logging
+
+from tsbenchmark.players import DEFAULT_RESOURCE
+
+logger = logging.getLogger(__name__)
+
+THREAD_ENV_NAMES = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+
+def thread_envs(resource):
+    '''Environments to limit the threads of the numeric libraries in a job to the requested cpu cores.'''
+    cpu = -1 if resource is None else resource.get('cpu', -1)
+    if cpu is None or cpu < 1:
+        return {}
+    return {name: str(cpu) for name in THREAD_ENV_NAMES}
+
+
+class LocalResourceExecutorManager(LocalExecutorManager):
+    '''Run the jobs concurrently on the local machine as long as the requested cpu cores and memory fit.
+
+    A job requests resource like `{'cpu': 4, 'mem': 8192}`(memory in MB), a value of -1 means it
+    occupies the whole machine and a key not in the request defaults to DEFAULT_RESOURCE. The jobs without any
+    request run exclusively as before.
+    '''
+
+    def __init__(self, api_server_portal, environments=None, cpu=None, mem=None):
+        super(LocalResourceExecutorManager, self).__init__(api_server_portal, environments=environments)
+        self.cpu = cpu if cpu is not None and cpu > 0 else cpu_count()
+        self.mem = mem if mem is not None and mem > 0 else psutil.virtual_memory().total // (1024 * 1024)
+        self._usages = {}
+
+    @property
+    def usage(self):
+        cpu = sum(u[0] for u in self._usages.values())
+        mem = sum(u[1] for u in self._usages.values())
+        return cpu, mem
+
+    def request_of(self, job):
+        resource = job.resource if job.resource is not None and len(job.resource) > 0 else {'cpu': -1, 'mem': -1}
+
+        def value_of(key, capacity):
+            value = resource.get(key)
+            if value is None:
+                return DEFAULT_RESOURCE[key]
+            if value < 0:
+                return capacity
+            if value > capacity:
+                logger.warning(f"job {job.name} requests {value} {key} more than the capacity {capacity}")
+                return capacity
+            return value
+
+        return value_of('cpu', self.cpu), value_of('mem', self.mem)
+
+    def alloc_executor(self, job):
+        cpu, mem = self.request_of(job)
+        used_cpu, used_mem = self.usage
+        if used_cpu + cpu > self.cpu or used_mem + mem > self.mem:
+            raise NoResourceException
+
+        executor = LocalShellExecutor(job, self.api_server_portal, environments=self.environments)
+        self._allocated_executors.append(executor)
+        self._waiting_queue.append(executor)
+        self._usages[executor] = (cpu, mem)
+        logger.debug(f"allocated cpu={cpu}, mem={mem} for job {job.name}, "
+                     f"usage is {self.usage} of ({self.cpu}, {self.mem})")
+        return executor
+
+    def release_executor(self, executor):
+        self._usages.pop(executor, None)
+        self._waiting_queue.remove(executor)
+        executor.close()
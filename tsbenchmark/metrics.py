@@ -1,3 +1,5 @@
+import warnings
+
 import numpy as np
 from sklearn.metrics import *
 from hypernets.utils import const
@@ -174,6 +176,227 @@ def msle(y_true, y_pred, epsihon=1e-06, axis=None):
     return mse(np.log1p(y_true), np.log1p(y_pred), axis)
 
 
+REGRESSION_METRICS = ('mse', 'mae', 'rmse', 'mape', 'smape')
+
+# metrics scaled by the in-sample errors of the naive forecasts or relative to the naive forecast on the test
+SCALED_METRICS = ('mase', 'rmsse', 'rel_mae', 'rel_rmse')
+
+# seasonal period of the seasonal naive forecast by the frequency of the dataset
+FREQUENCY_SEASONALITY = {
+    'Year': 1,
+    'Quarter': 4,
+    'Month': 12,
+    'Week': 52,
+    'Day': 7,
+    'Hour': 24,
+    'Minute': 60,
+    'Second': 60,
+}
+
+regression_metric_aliases = {
+    'mean_squared_error': 'mse',
+    'neg_mean_squared_error': 'mse',
+    'mean_absolute_error': 'mae',
+    'neg_mean_absolute_error': 'mae',
+    'root_mean_squared_error': 'rmse',
+    'neg_root_mean_squared_error': 'rmse',
+    'mean_absolute_percentage_error': 'mape',
+}
+
+
+def _to_regression_metric(metric):
+    if not isinstance(metric, str):
+        return None
+    metric_lower = metric.lower()
+    metric_lower = regression_metric_aliases.get(metric_lower, metric_lower)
+    return metric_lower if metric_lower in REGRESSION_METRICS + SCALED_METRICS else None
+
+
+def is_regression_metrics(metrics):
+    """Whether all the metrics can be computed by `calc_regression_scores`."""
+    return all(_to_regression_metric(metric) is not None for metric in metrics)
+
+
+def _check_is_batch(y_true, y_pred):
+    y_true = np.asarray(y_true, dtype='float64')
+    y_pred = np.asarray(y_pred, dtype='float64')
+
+    if y_true.ndim == 1:
+        y_true = y_true.reshape((-1, 1))
+    if y_pred.ndim == 1:
+        y_pred = y_pred.reshape((-1, 1))
+
+    return y_true, y_pred
+
+
+def season_of(frequency, n_rows):
+    """The seasonal period of a dataset by its frequency, 1 if unknown or the train data is not longer than it."""
+    season = FREQUENCY_SEASONALITY.get(frequency, 1)
+    return season if n_rows > season else 1
+
+
+def in_sample_scales(values, season):
+    """The denominators of the scaled metrics of every column of the train data, computed once per dataset.
+
+    Parameters
+    ----------
+    values : array-like of shape (n_rows, n_series), the train data.
+    season : int, period of the seasonal naive forecast.
+
+    Returns
+    -------
+    scales : dict
+        'naive_mae', 'naive_mse' and 'snaive_mae' are the mean absolute or squared in-sample errors of the naive and
+        seasonal naive forecasts, 'last' is the last observed value, the naive forecast on the test. Each value is
+        an ndarray of shape (n_series,).
+    """
+    values = np.asarray(values, dtype='float64')
+    if values.ndim == 1:
+        values = values.reshape((-1, 1))
+    naive_diff = values[1:] - values[:-1]
+    seasonal_diff = values[season:] - values[:-season]
+    with warnings.catch_warnings():
+        # series which are all NaN result in NaN
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        scales = {
+            'naive_mae': np.nanmean(np.abs(naive_diff), axis=0),
+            'naive_mse': np.nanmean(naive_diff ** 2, axis=0),
+            'snaive_mae': np.nanmean(np.abs(seasonal_diff), axis=0),
+        }
+    observed = ~np.isnan(values)
+    last_rows = values.shape[0] - 1 - np.argmax(observed[::-1], axis=0)
+    scales['last'] = np.where(observed.any(axis=0), values[last_rows, np.arange(values.shape[1])], np.nan)
+    return scales
+
+
+def scales_of_series(scales, series_names):
+    """The scales of the series in the order of series_names from the scales of a dataset, which is a dict of the
+    series name to the dict of its scales. The series not in the dataset are not scaled."""
+    keys = ['naive_mae', 'naive_mse', 'snaive_mae', 'last']
+    return {key: np.array([scales.get(name, {}).get(key, np.nan) for name in series_names], dtype='float64')
+            for key in keys}
+
+
+def _scale_of(scales, key):
+    scale = np.asarray(scales[key], dtype='float64')
+    # a constant series can't be scaled
+    return np.where(scale > 0, scale, np.nan)
+
+
+def _residual_terms(y_true, y_pred, metrics, epsihon, scales=None):
+    diff = y_pred - y_true
+    terms = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if 'mse' in metrics or 'rmse' in metrics or 'rel_rmse' in metrics:
+            terms['mse'] = diff ** 2
+        if 'mae' in metrics or 'mape' in metrics or 'smape' in metrics or 'rel_mae' in metrics:
+            abs_diff = np.abs(diff)
+            terms['mae'] = abs_diff
+            if 'mape' in metrics:
+                terms['mape'] = abs_diff / np.clip(np.abs(y_true), epsihon, None)
+            if 'smape' in metrics:
+                terms['smape'] = abs_diff / (np.abs(y_pred) + np.abs(y_true))
+        if 'mase' in metrics:
+            terms['mase'] = np.abs(diff) / _scale_of(scales, 'snaive_mae')
+        if 'rmsse' in metrics:
+            terms['rmsse'] = diff ** 2 / _scale_of(scales, 'naive_mse')
+        if 'rel_mae' in metrics or 'rel_rmse' in metrics:
+            # errors of the naive forecast, which repeats the last observed value
+            naive_diff = np.asarray(scales['last'], dtype='float64') - y_true
+            terms['naive_mae'] = np.abs(naive_diff)
+            terms['naive_mse'] = naive_diff ** 2
+    return terms
+
+
+def _reduce_terms(terms, metrics, axis):
+    means = {}
+    with warnings.catch_warnings():
+        # slices which are all NaN result in NaN
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        for key, term in terms.items():
+            means[key] = np.nanmean(term, axis=axis)
+
+    score = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for metric in metrics:
+            metric_lower = _to_regression_metric(metric)
+            if metric_lower == 'rmse':
+                score[metric] = np.sqrt(means['mse'])
+            elif metric_lower == 'rmsse':
+                score[metric] = np.sqrt(means['rmsse'])
+            elif metric_lower == 'smape':
+                score[metric] = 2.0 * means['smape']
+            elif metric_lower == 'rel_mae':
+                score[metric] = means['mae'] / means['naive_mae']
+            elif metric_lower == 'rel_rmse':
+                score[metric] = np.sqrt(means['mse'] / means['naive_mse'])
+            else:
+                score[metric] = means[metric_lower]
+    return score
+
+
+def calc_regression_scores(y_true, y_pred, metrics=REGRESSION_METRICS, breakdown=False, epsihon=1e-06,
+                           scales=None):
+    """Compute several regression metrics in one pass over the residuals.
+
+    The residuals and the element-wise error terms are computed once and shared by all the metrics,
+    which is much faster than calling `mse`, `mae`, `mape` and `smape` one by one.
+
+    Note that this implementation can handle NaN.
+
+    Parameters
+    ----------
+    y_true : pd.DataFrame or array-like of shape (horizon,), (horizon, n_series) or (n_runs, horizon, n_series)
+        Ground truth (correct) target values.
+
+    y_pred : pd.DataFrame or array-like of shape (horizon,), (horizon, n_series) or (n_runs, horizon, n_series)
+        Estimated target values. A stacked batch of predictions of several runs may be scored against
+        the same y_true of shape (horizon, n_series) at once.
+
+    metrics : list of str, default is REGRESSION_METRICS.
+        The names of the metrics, see `REGRESSION_METRICS` and `regression_metric_aliases`.
+
+    breakdown: bool, default is False.
+        If True, the metrics per series and per horizon step are returned too.
+
+    epsihon: float, threshold to avoid division by zero in mape. Default is 1e-06.
+
+    scales: dict, optional.
+        The in-sample scales of the series in the order of the columns of y_true, see `in_sample_scales`. It is
+        required by the `SCALED_METRICS`, so that they are computed in O(horizon) without the train data.
+        The scaled squared errors of rmsse are pooled over the series like rmse.
+    Returns
+    -------
+    score : dict
+        The value of each metric, a float or an ndarray of shape (n_runs,) for a batch.
+        If breakdown is True, a dict with keys 'total', 'series' and 'horizon' is returned, the values of
+        'series' have a shape of (n_series,) and those of 'horizon' have a shape of (horizon,),
+        prefixed with n_runs for a batch.
+    """
+    unsupported = [metric for metric in metrics if _to_regression_metric(metric) is None]
+    if len(unsupported) > 0:
+        raise ValueError(f"{unsupported} are not supported regression metrics.")
+
+    metrics_lower = set(map(_to_regression_metric, metrics))
+    if scales is None and len(metrics_lower.intersection(SCALED_METRICS)) > 0:
+        raise ValueError(f"scales are required by {sorted(metrics_lower.intersection(SCALED_METRICS))}.")
+
+    y_true, y_pred = _check_is_batch(y_true, y_pred)
+    terms = _residual_terms(y_true, y_pred, metrics_lower, epsihon, scales)
+
+    total = _reduce_terms(terms, metrics, axis=(-2, -1))
+    if y_true.ndim == 2 and y_pred.ndim == 2:
+        total = {k: float(v) for k, v in total.items()}
+    if not breakdown:
+        return total
+
+    return {
+        'total': total,
+        'series': _reduce_terms(terms, metrics, axis=-2),
+        'horizon': _reduce_terms(terms, metrics, axis=-1),
+    }
+
+
 def auc(y_true, y_score, average="macro", sample_weight=None,
         max_fpr=None, multi_class="raise", labels=None):
     """Compute Area Under the Receiver Operating Characteristic Curve (ROC AUC)
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import sys
 from pathlib import Path
@@ -15,8 +16,15 @@ class BaseMRGConfig:
 
 
 class CondaVenvMRGConfig(BaseMRGConfig):
-    def __init__(self, name):
+    def __init__(self, name, env_hash=None):
         self.name = name
+        self.env_hash = env_hash  # hash of the requirements, the envs are reused across benchmarks by it
+
+    @property
+    def env_name(self):
+        if self.env_hash is None:
+            return self.name
+        return f"{self.name}-{self.env_hash}"
 
 
 class CustomPyMRGConfig(BaseMRGConfig):
@@ -41,6 +49,14 @@ class ReqsCondaYamlConfig(BaseReqsConfig):
         self.file_name = file_name
 
 
+class WarmWorkerConfig:
+    """Run the jobs of a custom_python player in a warm worker, the modules in preload are imported in advance."""
+
+    def __init__(self, enable=False, preload=None):
+        self.enable = enable
+        self.preload = preload if preload is not None else []
+
+
 class PythonEnv:
 
     def __init__(self, venv: BaseMRGConfig, requirements: BaseReqsConfig):
@@ -73,7 +89,8 @@ class PythonEnv:
 
 
 class Player:
-    def __init__(self, base_dir, exec_file: str, env: PythonEnv, tasks=None, random=True):
+    def __init__(self, base_dir, exec_file: str, env: PythonEnv, tasks=None, random=True, resource=None,
+                 warm_worker: WarmWorkerConfig = None):
         self.base_dir = base_dir
         self.base_dir_path = Path(base_dir)
 
@@ -81,6 +98,10 @@ class Player:
         self.exec_file = exec_file
         self.tasks = tasks  # default is None, mean support all task type
         self.random = random
+        # cpu cores and memory(MB) requested by a job of the player, -1 means the whole machine, an undeclared key
+        # requests DEFAULT_RESOURCE and a player without resource occupies the whole machine
+        self.resource = load_resource(resource)
+        self.warm_worker = warm_worker if warm_worker is not None else WarmWorkerConfig()
 
         assert self.abs_exec_file_path().exists(), "exec_file not exists"
 
@@ -92,15 +113,47 @@ class Player:
         return self.base_dir_path / self.exec_file
 
 
+def requirements_hash(requirements_file, py_version=None):
+    md5 = hashlib.md5()
+    with open(requirements_file, 'rb') as f:
+        md5.update(f.read())
+    if py_version is not None:
+        md5.update(f"python={py_version}".encode('utf-8'))
+    return md5.hexdigest()[:8]
+
+
+DEFAULT_RESOURCE = {'cpu': 1, 'mem': 0}
+
+
+def load_resource(resource_dict):
+    if resource_dict is None or len(resource_dict) == 0:
+        return {'cpu': -1, 'mem': -1}
+    unknown_keys = set(resource_dict.keys()) - {'cpu', 'mem'}
+    if len(unknown_keys) > 0:
+        raise ValueError(f"unknown resource keys {unknown_keys}, only 'cpu' and 'mem' are supported")
+
+    resource = {}
+    for key in ['cpu', 'mem']:
+        if key not in resource_dict:
+            resource[key] = DEFAULT_RESOURCE[key]
+            continue
+        value = int(resource_dict[key])
+        if value == 0 or value < -1:
+            raise ValueError(f"resource '{key}' should be positive or -1 but is {value}")
+        resource[key] = value
+    return resource
+
+
 class JobParams:
     def __init__(self, bm_task_id, task_config_id,  random_state,  max_trials=None,
-                 reward_metric=None, dataset_cache_path=None, **kwargs):
+                 reward_metric=None, dataset_cache_path=None, server_metrics=False, **kwargs):
         self.bm_task_id = bm_task_id
         self.task_config_id = task_config_id
         self.random_state = random_state
         self.max_trials = max_trials
         self.reward_metric = reward_metric
         self.dataset_cache_path = dataset_cache_path
+        self.server_metrics = server_metrics
 
     def to_dict(self):
         return self.__dict__
@@ -150,6 +203,8 @@ def load_player(player_dir):
         else:
             raise Exception(f"Unsupported env manager {env_mgr_kind}")
 
+        env_mgr_config['env_hash'] = requirements_hash(player_dir_path / reqs_config.file_name,
+                                                       getattr(reqs_config, 'py_version', None))
         mgr_config = CondaVenvMRGConfig(**env_mgr_config)
 
     elif env_mgr_kind == PythonEnv.KIND_CUSTOM_PYTHON:
@@ -160,5 +215,11 @@ def load_player(player_dir):
         raise Exception(f"Unsupported env manager {env_mgr_kind}")
 
     play_dict['env'] = PythonEnv(venv=mgr_config, requirements=reqs_config)
+
+    warm_worker_config = WarmWorkerConfig(**play_dict.get('warm_worker', {}))
+    if warm_worker_config.enable and env_mgr_kind != PythonEnv.KIND_CUSTOM_PYTHON:
+        raise ValueError(f"warm worker is only supported by {PythonEnv.KIND_CUSTOM_PYTHON} players "
+                         f"but the venv of {player_name} is {env_mgr_kind}")
+    play_dict['warm_worker'] = warm_worker_config
     play_dict['base_dir'] = Path(player_dir).absolute().as_posix()
     return Player(**play_dict)
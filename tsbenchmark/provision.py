@@ -0,0 +1,124 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from hypernets.utils import logging, ssh_utils
+
+from tsbenchmark import consts
+from tsbenchmark.players import Player, PythonEnv
+
+logger = logging.getLogger(__name__)
+
+HERE = Path(__file__).parent
+
+PROVISION_ENV_SH = (HERE / "provision_env.sh").absolute().as_posix()
+
+
+class EnvProvisioner:
+    '''Build the conda envs of the players before submitting the jobs.
+
+    Each distinct env, named by the player env name and the hash of its requirements, is built once per machine,
+    the envs are built in parallel and `provision_env.sh` locks every env so that the jobs and benchmarks sharing
+    the conda home never build the same env concurrently. The envs are kept in conda home and reused by later
+    benchmarks. If `packs_dir` has a tarball `{env_name}.tar.gz` packed by conda-pack, the env is unpacked from it
+    instead of being built.
+    '''
+
+    def __init__(self, packs_dir=None, n_workers=None):
+        self.packs_dir = packs_dir
+        self.n_workers = n_workers
+
+    @staticmethod
+    def distinct_envs(players):
+        envs = {}
+        for player in players:
+            player: Player = player
+            if player.env.venv_kind == PythonEnv.KIND_CONDA:
+                envs.setdefault(player.env.venv.env_name, player)
+        return envs
+
+    def env_pack(self, env_name):
+        if self.packs_dir is None:
+            return None
+        pack_file = os.path.join(self.packs_dir, f'{env_name}.tar.gz')
+        return pack_file if os.path.exists(pack_file) else None
+
+    @staticmethod
+    def provision_args(player, requirements_file, env_pack=None):
+        requirements = player.env.requirements
+        args = [f"--venv-name={player.env.venv.env_name}", f"--requirements-kind={player.env.reqs_kind}"]
+        if player.env.reqs_kind == PythonEnv.REQUIREMENTS_REQUIREMENTS_TXT:
+            args += [f"--requirements-txt-file={requirements_file}",
+                     f"--requirements-txt-py-version={requirements.py_version}"]
+        else:
+            args += [f"--requirements-yaml-file={requirements_file}"]
+        if env_pack is not None:
+            args.append(f"--env-pack={env_pack}")
+        return args
+
+    def _run(self, provisions):
+        if len(provisions) == 0:
+            return
+        n_workers = self.n_workers if self.n_workers is not None else len(provisions)
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [(desc, executor.submit(fn)) for desc, fn in provisions]
+        failed = []
+        for desc, future in futures:
+            try:
+                future.result()
+                logger.info(f"provisioned {desc}")
+            except Exception as e:
+                logger.error(f"failed to provision {desc}: {e}")
+                failed.append(desc)
+        if len(failed) > 0:
+            raise RuntimeError(f"failed to provision envs: {failed}")
+
+    def provision_local(self, players, conda_home):
+        def provision(player):
+            env_name = player.env.venv.env_name
+            requirements_file = (player.base_dir_path / player.env.requirements.file_name).as_posix()
+            command = ['/bin/bash', PROVISION_ENV_SH] + self.provision_args(player, requirements_file,
+                                                                            self.env_pack(env_name))
+            env = os.environ.copy()
+            env[consts.ENV_TSB_CONDA_HOME] = conda_home
+            process = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            if process.returncode != 0:
+                raise RuntimeError(f"provision_env.sh exited with code {process.returncode}:\n"
+                                   f"{process.stdout.decode('utf-8', errors='replace')}")
+
+        envs = self.distinct_envs(players)
+        self._run([(f"env {env_name} on localhost", lambda p=player: provision(p))
+                   for env_name, player in envs.items()])
+
+    def provision_remote(self, players, machines, remote_dir='/tmp/tsbenchmark-provision'):
+        def provision(machine, player):
+            connection = machine['connection']
+            conda_home = machine['environments'][consts.ENV_TSB_CONDA_HOME]
+            env_name = player.env.venv.env_name
+            env_dir = f'{remote_dir}/{env_name}'
+            requirements_file = f'{env_dir}/{player.env.requirements.file_name}'
+            env_pack = self.env_pack(env_name)
+            with ssh_utils.sftp_client(**connection) as sftp_client:
+                ssh_utils.makedirs(sftp_client, env_dir)
+                ssh_utils.upload_file(sftp_client, PROVISION_ENV_SH, f'{env_dir}/provision_env.sh')
+                ssh_utils.upload_file(sftp_client, (player.base_dir_path / player.env.requirements.file_name)
+                                      .as_posix(), requirements_file)
+                remote_env_pack = None
+                if env_pack is not None:
+                    remote_env_pack = f'{env_dir}/{os.path.basename(env_pack)}'
+                    ssh_utils.upload_file(sftp_client, env_pack, remote_env_pack)
+
+            args = " ".join(self.provision_args(player, requirements_file, remote_env_pack))
+            command = f'{consts.ENV_TSB_CONDA_HOME}="{conda_home}" /bin/bash {env_dir}/provision_env.sh {args}'
+            with ssh_utils.ssh_client(**connection) as client:
+                _, stdout, _ = client.exec_command(command, get_pty=True)
+                output = stdout.read().decode('utf-8', errors='replace')
+                exit_status = stdout.channel.recv_exit_status()
+            if exit_status != 0:
+                raise RuntimeError(f"provision_env.sh exited with code {exit_status}:\n{output}")
+
+        envs = self.distinct_envs(players)
+        self._run([(f"env {env_name} on {machine['connection']['hostname']}",
+                    lambda m=machine, p=player: provision(m, p))
+                   for machine in machines for env_name, player in envs.items()])
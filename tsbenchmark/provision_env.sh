@@ -0,0 +1,121 @@
+#!/bin/bash
+
+# Create a conda virtual env once, the callers for the same env wait for the first one under a lock.
+# The env is ready only if it has the file .tsb-ready. The file .<venv-name>.tsb-building is written next to the env
+# dir before the build and removed after it, only an env dir with it is left by a broken build and rebuilt, any other
+# existing env dir is not touched.
+
+usage() {
+    echo "Usage: $0  [options]" 1>&2;
+}
+
+for i in "$@"; do
+    case $i in
+        -h | --help)
+            usage
+            exit ;;
+        --venv-name=*)
+            venv_name="${i#*=}"
+            shift ;;
+        --requirements-kind=*)
+            requirements_kind="${i#*=}"
+            shift ;;
+        --requirements-txt-file=*)
+            requirements_txt_file="${i#*=}"
+            shift ;;
+        --requirements-txt-py-version=*)
+            requirements_txt_py_version="${i#*=}"
+            shift ;;
+        --requirements-yaml-file=*)
+            requirements_yaml_file="${i#*=}"
+            shift ;;
+        --env-pack=*)
+            env_pack="${i#*=}"
+            shift ;;
+        *)
+            echo "unknown_args $i" 1>&2
+            usage
+            exit 1 ;;
+    esac
+done
+
+conda_home="$TSB_CONDA_HOME"
+
+function require_input() {
+  if [ -z $1 ];then
+    echo "$2 can not be none" 1>&2
+    exit -1
+  fi
+}
+
+require_input "$conda_home" "TSB_CONDA_HOME"
+require_input "$venv_name" "venv-name"
+require_input "$requirements_kind" "requirements-kind"
+
+# define vars
+conda_exec="$conda_home/bin/conda"
+venv_dir="$conda_home/envs/$venv_name"
+py_exec="$venv_dir/bin/python"
+ready_file="$venv_dir/.tsb-ready"
+building_file="$conda_home/envs/.$venv_name.tsb-building"
+
+# check conda executable
+if [ ! -f $conda_exec ];then
+  echo "conda executable $conda_exec is not exists"  1>&2
+  exit -1
+fi
+
+# lock the env
+mkdir -p "$conda_home/envs"
+exec 9>"$conda_home/envs/.$venv_name.lock"
+if command -v flock > /dev/null 2>&1; then
+  flock 9
+else
+  echo "flock is not available, create env $venv_name without lock"
+fi
+
+if [ -f "$ready_file" ];then
+  echo "venv dir $venv_dir already exists, skip to create"
+  exit 0
+fi
+
+if [ -d "$venv_dir" ];then
+  if [ ! -f "$building_file" ];then
+    echo "venv dir $venv_dir exists but is not created by tsbenchmark, remove it or use another env name" 1>&2
+    exit -1
+  fi
+  echo "venv dir $venv_dir is left by a broken build, remove it"
+  rm -rf "$venv_dir"
+fi
+
+echo "env is not already exists, create it"
+touch "$building_file"
+if [ ! -z "$env_pack" ];then
+  # env packed by conda-pack
+  mkdir -p "$venv_dir"
+  tar -xzf "$env_pack" -C "$venv_dir"
+  if [ -f "$venv_dir/bin/conda-unpack" ];then
+    "$venv_dir/bin/conda-unpack"
+  fi
+elif [ "$requirements_kind" == "requirements_txt"  ];then
+  require_input "$requirements_txt_file" "requirements-txt-file"
+  $conda_exec create -n $venv_name python=$requirements_txt_py_version pip -y
+  pip_exec="$venv_dir/bin/pip"
+  $pip_exec install -r $requirements_txt_file || { rm -rf "$venv_dir"; exit -1; }
+elif [  "$requirements_kind" == "conda_yaml" ]; then
+  require_input "$requirements_yaml_file" "requirements-yaml-file"
+  $conda_exec env create -f $requirements_yaml_file -n "$venv_name"
+else
+  echo "unseen requirements $requirements_kind for conda"  1>&2
+  exit -1
+fi
+
+if [ ! -f $py_exec ];then
+  echo "python executable $py_exec is not exists, create virtual env failed."  1>&2
+  rm -rf "$venv_dir"
+  exit -1
+fi
+
+touch "$ready_file"
+rm -f "$building_file"
+echo "prepare virtual env succeed."
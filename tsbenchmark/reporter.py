@@ -1,11 +1,20 @@
+import math
+import multiprocessing
+from contextlib import closing, contextmanager
 import os
-from tsbenchmark.util import file_util, dict_util
+import sqlite3
+import threading
+import time
+from tsbenchmark import consts
+from tsbenchmark.baselines import is_baseline_player
+from tsbenchmark.util import file_util, df_util, payload_util
 from hypernets.hyperctl.utils import load_yaml
 import pandas as pd
 from hypernets.utils import logging
 import traceback
 import numpy as np
 import json
+from hashlib import md5
 import matplotlib.pyplot as plt
 
 logging.set_level('DEBUG')  # TODO
@@ -17,10 +26,13 @@ class PathMaintainer:
 
     /report_path
     /report_path/benchmark_name
+    /report_path/benchmark_name/results.db
     /report_path/benchmark_name/task
     /report_path/benchmark_name/task/datas
     /report_path/benchmark_name/task/datas/player.csv
     /report_path/benchmark_name/task/datas/player_tmp.csv
+    /report_path/benchmark_name/task/datas/predictions/bm_task_id.feather
+    /report_path/benchmark_name/task/live/summary.csv
     /report_path/benchmark_name/task/report
     /report_path/benchmark_name/task/report/report_name.csv
     /report_path/benchmark_name/task/report/imgs
@@ -35,6 +47,10 @@ class PathMaintainer:
         report_path = file_util.get_dir_path(self.report_path)
         return file_util.get_dir_path(os.path.join(report_path, self.benchmark_name))
 
+    # e.g. /mnt/result/hyperts_v0.1.0/results.db
+    def results_db(self):
+        return os.path.join(self.benchmark_dir(), 'results.db')
+
     # e.g. /mnt/result/hyperts_v0.1.0/univariate-forecast/
     def task_dir(self, task_type):
         return file_util.get_dir_path(os.path.join(self.benchmark_dir(), task_type))
@@ -43,6 +59,15 @@ class PathMaintainer:
     def datas_dir(self, task_type):
         return file_util.get_dir_path(os.path.join(self.task_dir(task_type), 'datas'))
 
+    # e.g. /mnt/result/hyperts_v0.1.0/univariate-forecast/datas/predictions
+    def predictions_dir(self, task_type):
+        return file_util.get_dir_path(os.path.join(self.datas_dir(task_type), 'predictions'))
+
+    # e.g. /mnt/result/hyperts_v0.1.0/univariate-forecast/live/summary.csv
+    def live_summary_file(self, task_type):
+        live_dir = file_util.get_dir_path(os.path.join(self.task_dir(task_type), 'live'))
+        return os.path.join(live_dir, 'summary.csv')
+
     # e.g. /mnt/result/hyperts_v0.1.0/univariate-forecast/report
     def report_dir(self, task_type):
         return file_util.get_dir_path(os.path.join(self.task_dir(task_type), 'report'))
@@ -53,7 +78,10 @@ class PathMaintainer:
 
     # e.g. /mnt/result/hyperts_v0.1.0/univariate-forecast/datas/hyperts_dl.csv
     def data_file(self, bmtask):
-        return os.path.join(self.datas_dir(bmtask.ts_task.task), bmtask.player.name + '.csv')
+        return self.player_data_file(bmtask.ts_task.task, bmtask.player.name)
+
+    def player_data_file(self, task_type, player_name):
+        return os.path.join(self.datas_dir(task_type), player_name + '.csv')
 
     # e.g. /mnt/result/hyperts_v0.1.0/univariate-forecast/datas/hyperts_dl_tmp.csv
     def data_file_tmp(self, bmtask):
@@ -69,7 +97,353 @@ class PathMaintainer:
     #     return file_util.get_dir_path(os.path.join(self.compare_framework_dir(task, framework), 'imgs'))
 
 
+class ResultStore:
+    '''Append-only store of the results of benchmark tasks in a SQLite database in WAL mode.
+    Each metric is saved in a float column, which is added when the metric is reported for the first time.
+    A metric named like a base column is saved in a column prefixed with METRIC_PREFIX, and one whose name is not
+    an identifier is skipped. Rows are buffered and written in batches of buffer_size.
+    '''
+    TABLE = 'results'
+    COLUMNS = [('task_id', 'TEXT'), ('round_no', 'INTEGER'), ('player', 'TEXT'), ('dataset', 'TEXT'),
+               ('shape', 'TEXT'), ('data_size', 'TEXT'), ('task', 'TEXT'), ('horizon', 'INTEGER'),
+               ('reward_metric', 'TEXT'), ('duration', 'REAL'), ('random_state', 'INTEGER'), ('key_params', 'TEXT'),
+               ('best_params', 'TEXT')]
+    METRIC_PREFIX = 'metric_'
+
+    def __init__(self, db_path, buffer_size=1):
+        self.db_path = db_path
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._lock = threading.RLock()
+
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            columns = ', '.join(f'"{name}" {type_}' for name, type_ in self.COLUMNS)
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {self.TABLE} ({columns})')
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {self.TABLE}_task_player ON {self.TABLE} (task, player)')
+
+    @contextmanager
+    def _connect(self):
+        # the context of a connection commits or rolls back the transaction but does not close it
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as connection, connection:
+            yield connection
+
+    def _columns(self, connection):
+        return [row[1] for row in connection.execute(f'PRAGMA table_info({self.TABLE})')]
+
+    def metrics(self):
+        self.flush()
+        with self._connect() as connection:
+            base_columns = [name for name, _ in self.COLUMNS]
+            return [col for col in self._columns(connection) if col not in base_columns]
+
+    def _metric_column(self, metric):
+        if not str(metric).isidentifier():
+            return None
+        # the column names of sqlite are case insensitive
+        if str(metric).lower() in [name.lower() for name, _ in self.COLUMNS]:
+            return f'{self.METRIC_PREFIX}{metric}'
+        return str(metric)
+
+    def append(self, row):
+        '''Append a result, the metrics of it are given in a dict with key 'metrics'.
+        '''
+        row = row.copy()
+        for metric, value in (row.pop('metrics', None) or {}).items():
+            col = self._metric_column(metric)
+            if col is None:
+                logger.warning(f"Skip metric {metric!r} because of its name is not an identifier.")
+                continue
+            row[col] = None if value is None else float(value)
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.buffer_size:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if len(self._buffer) == 0:
+                return
+            with self._connect() as connection:
+                columns = self._columns(connection)
+                # a metric named like an existing column in another case is saved in that column
+                names = {col.lower(): col for col in columns}
+                rows = []
+                for row in self._buffer:
+                    for col in row.keys():
+                        if col.lower() not in names:
+                            connection.execute(f'ALTER TABLE {self.TABLE} ADD COLUMN "{col}" REAL')
+                            columns.append(col)
+                            names[col.lower()] = col
+                    rows.append({names[col.lower()]: value for col, value in row.items()})
+                columns_sql = ', '.join(f'"{col}"' for col in columns)
+                values_sql = ', '.join('?' for _ in columns)
+                connection.executemany(f'INSERT INTO {self.TABLE} ({columns_sql}) VALUES ({values_sql})',
+                                       [[row.get(col) for col in columns] for row in rows])
+            self._buffer = []
+
+    def query(self, **predicates):
+        '''Read the results matching the predicates as a dataframe, e.g. query(task='univariate-forecast').
+        A predicate with a list value matches any of the values.
+        '''
+        self.flush()
+        conditions = []
+        params = []
+        for col, value in predicates.items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            conditions.append(f'"{col}" IN ({", ".join("?" for _ in values)})')
+            params.extend(values)
+        where_sql = f' WHERE {" AND ".join(conditions)}' if len(conditions) > 0 else ''
+        with self._connect() as connection:
+            float_columns = [row[1] for row in connection.execute(f'PRAGMA table_info({self.TABLE})')
+                             if row[2] == 'REAL']
+            return pd.read_sql_query(f'SELECT * FROM {self.TABLE}{where_sql}', connection, params=params,
+                                     dtype={col: 'float64' for col in float_columns})
+
+
+class PredictionStore:
+    '''Store the predicted and real values of benchmark tasks in feather files keyed by bm_task_id.
+    The columns of the predicted values are prefixed with 'y_predict.' and those of the real values with 'y_real.'.
+    '''
+    PREFIXES = ('y_predict', 'y_real')
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+
+    def file_path(self, bm_task_id):
+        return os.path.join(self.store_dir, f'{bm_task_id}.feather')
+
+    def exists(self, bm_task_id):
+        return os.path.exists(self.file_path(bm_task_id))
+
+    def save(self, bm_task_id, **values):
+        df = pd.concat([values[prefix].reset_index(drop=True).add_prefix(f'{prefix}.')
+                        for prefix in self.PREFIXES if values.get(prefix) is not None], axis=1)
+        df_util.to_feather(df, self.file_path(bm_task_id))
+
+    def load(self, bm_task_id):
+        df = df_util.read_feather(self.file_path(bm_task_id))
+        values = {}
+        for prefix in self.PREFIXES:
+            cols = [col for col in df.columns if col.startswith(f'{prefix}.')]
+            if len(cols) > 0:
+                values[prefix] = df[cols].rename(columns=lambda col: col[len(prefix) + 1:])
+        return values
+
+
+class ReportAggregator:
+    '''Compute the report tables of all the metrics and stats from the results with one groupby.
+    The results are kept in a long-format frame with the columns dataset, shape, horizon, player, metric and value.
+
+    Supported stats are mean, std, max, min, median, count, quantiles like q25 and q75, and rank, which is the rank
+    of the mean value of the player among all the players, starting from 1 for the lowest value.
+    '''
+    COLUMNS = ['dataset', 'shape', 'horizon']
+
+    def __init__(self, df_long):
+        self.df_long = df_long
+        self.rows = pd.MultiIndex.from_frame(df_long[self.COLUMNS].drop_duplicates())
+        self._stats = None
+
+    @staticmethod
+    def from_results(df_results, metrics):
+        df_long = df_results.melt(id_vars=ReportAggregator.COLUMNS + ['player'],
+                                  value_vars=[m for m in metrics if m in df_results.columns] + ['duration'],
+                                  var_name='metric')
+        return ReportAggregator(df_long.dropna(subset=['value']))
+
+    @staticmethod
+    def from_results_datas(results_datas):
+        records = [(data_row['dataset'], data_row['shape'], data_row['horizon'], data_row['player'], metric, value)
+                   for data_row in results_datas.values()
+                   for metric, values in data_row.items() if isinstance(values, list)
+                   for value in values]
+        df_long = pd.DataFrame(records, columns=ReportAggregator.COLUMNS + ['player', 'metric', 'value'])
+        return ReportAggregator(df_long.dropna(subset=['value']))
+
+    @staticmethod
+    def _quantile(stat):
+        if len(stat) > 1 and stat[0] == 'q' and stat[1:].isdigit():
+            return int(stat[1:]) / 100
+        return None
+
+    def aggregate(self, stats):
+        '''Compute the stats of every (metric, dataset, player) in one groupby.
+        Returns a dataframe indexed by metric, dataset, shape, horizon and player with a column for each stat.
+        '''
+        grouped = self.df_long.groupby(['metric'] + self.COLUMNS + ['player'], sort=False, dropna=False)['value']
+        aggs = {}
+        for stat in stats:
+            if stat == 'std':
+                aggs[stat] = grouped.std(ddof=0)
+            elif stat == 'rank':
+                mean = aggs['mean'] if 'mean' in aggs else grouped.mean()
+                aggs[stat] = mean.groupby(level=['metric'] + self.COLUMNS, sort=False, dropna=False) \
+                    .rank(method='min')
+            elif self._quantile(stat) is not None:
+                aggs[stat] = grouped.quantile(self._quantile(stat))
+            elif stat in ['mean', 'max', 'min', 'median', 'count']:
+                aggs[stat] = getattr(grouped, stat)()
+            else:
+                raise ValueError(f"Unsupported stat {stat}.")
+        self._stats = pd.DataFrame(aggs)
+        return self._stats
+
+    def table(self, metric, stat, players):
+        '''The report table of a metric and stat, with a row for each dataset and a column for each player.
+        '''
+        if self._stats is None:
+            self.aggregate([stat])
+        elif stat not in self._stats.columns:
+            self.aggregate(list(self._stats.columns) + [stat])
+        values = self._stats[stat]
+        if metric in values.index.get_level_values('metric'):
+            df = values.xs(metric, level='metric').unstack('player')
+        else:
+            df = pd.DataFrame(index=self.rows)
+        df = df.reindex(index=self.rows, columns=players).reset_index()
+        df.columns.name = None
+        return df
+
+
+class RunningAggregator:
+    '''Running count, sum, sum of squares, min and max of the results per (metric, dataset, player).
+    Each result is added in O(1), so that the stats of a running benchmark can be published after every task.
+    '''
+    COLUMNS = ReportAggregator.COLUMNS
+    STATS = ['count', 'mean', 'std', 'min', 'max']
+
+    def __init__(self):
+        self._cells = {}
+        self._rows = {}
+
+    def update(self, result):
+        '''Add a result, the metrics of it are given in a dict with key 'metrics'.
+        '''
+        row = tuple(result[col] for col in self.COLUMNS)
+        self._rows.setdefault(row, None)
+        values = dict(result.get('metrics') or {})
+        values['duration'] = result.get('duration')
+        for metric, value in values.items():
+            if value is None or math.isnan(value):
+                continue
+            cell = self._cells.setdefault((metric,) + row + (result['player'],), [0, 0.0, 0.0, math.inf, -math.inf])
+            cell[0] += 1
+            cell[1] += value
+            cell[2] += value * value
+            cell[3] = min(cell[3], value)
+            cell[4] = max(cell[4], value)
+
+    @staticmethod
+    def _stats(cell):
+        count, total, total_sq, min_value, max_value = cell
+        mean = total / count
+        return [count, mean, math.sqrt(max(total_sq / count - mean * mean, 0.0)), min_value, max_value]
+
+    def to_frame(self):
+        '''All the stats in long format, with a row for each (metric, dataset, player).
+        '''
+        records = [key + tuple(self._stats(cell)) for key, cell in self._cells.items()]
+        return pd.DataFrame(records, columns=['metric'] + self.COLUMNS + ['player'] + self.STATS)
+
+    def table(self, metric, stat, players):
+        '''The report table of a metric and stat, in the same format as `ReportAggregator.table`.
+        '''
+        i = self.STATS.index(stat)
+        return pd.DataFrame([list(row) + [self._stats(self._cells[(metric,) + row + (player,)])[i]
+                                          if (metric,) + row + (player,) in self._cells else np.nan
+                                          for player in players]
+                             for row in self._rows], columns=self.COLUMNS + players)
+
+
+def _init_render_worker():
+    plt.switch_backend('Agg')
+
+
+def _render_figure(job):
+    csv_path, png_path, title_cols, title_text, fontsize = job
+    Painter().paint_table(pd.read_csv(csv_path), title_cols=title_cols, title_text=title_text, fontsize=fontsize,
+                          result_path=png_path)
+    return png_path
+
+
+def default_title_text(report_name):
+    '''The title of a report figure from the report file name, e.g. report_smape_mean.csv.
+    '''
+    metric, stat_type = os.path.splitext(report_name)[0][len('report_'):].rsplit('_', 1)
+    if metric == 'duration':
+        return stat_type.upper() + ' duration'
+    return '{} {} {} '.format(metric.upper(), stat_type, 'scores')
+
+
 class Painter:
+    '''Paint report tables to png figures.
+
+    Figures are submitted with the report csv files and rendered by `render` in a pool of processes with the Agg
+    backend. A figure is skipped if its csv file and title are not changed since it was rendered. With enable=False,
+    only the csv files are generated, the figures can be rendered on demand by `render_figures` later.
+    '''
+    HASHES_FILE_NAME = '.figures.json'
+
+    def __init__(self, enable=True, n_workers=None):
+        self.enable = enable
+        self.n_workers = n_workers
+        self._jobs = []
+
+    def submit(self, csv_path, png_path, title_cols, title_text, fontsize=-1):
+        if self.enable:
+            self._jobs.append((csv_path, png_path, title_cols, title_text, fontsize))
+
+    @staticmethod
+    def _job_hash(job):
+        csv_path, png_path, title_cols, title_text, fontsize = job
+        with open(csv_path, 'rb') as f:
+            return md5(f.read() + json.dumps([title_cols, title_text, fontsize]).encode()).hexdigest()
+
+    @staticmethod
+    def _load_hashes(imgs_dir):
+        hashes_file = os.path.join(imgs_dir, Painter.HASHES_FILE_NAME)
+        if not os.path.exists(hashes_file):
+            return {}
+        with open(hashes_file, 'r') as f:
+            return json.load(f)
+
+    def render(self):
+        jobs, self._jobs = self._jobs, []
+        hashes = {}
+        for job in jobs:
+            imgs_dir = os.path.dirname(job[1])
+            if imgs_dir not in hashes:
+                hashes[imgs_dir] = self._load_hashes(imgs_dir)
+        jobs_hash = {job[1]: self._job_hash(job) for job in jobs}
+        jobs = [job for job in jobs if not os.path.exists(job[1]) or
+                hashes[os.path.dirname(job[1])].get(os.path.basename(job[1])) != jobs_hash[job[1]]]
+        if len(jobs) == 0:
+            return
+
+        def record(png_paths):
+            for png_path in png_paths:
+                hashes[os.path.dirname(png_path)][os.path.basename(png_path)] = jobs_hash[png_path]
+                logger.info('report figure generated: {}'.format(png_path))
+
+        try:
+            if self.n_workers == 1 or len(jobs) == 1:
+                _init_render_worker()
+                record(map(_render_figure, jobs))
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                # spawn rather than fork, the forked workers would inherit the gui backend and the threads of the
+                # server, e.g. the web application and the sqlite connections
+                with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_render_worker,
+                                         mp_context=multiprocessing.get_context('spawn')) as executor:
+                    record(executor.map(_render_figure, jobs))
+        finally:
+            # keep the hashes of the rendered figures even if some of them failed
+            for imgs_dir, imgs_hashes in hashes.items():
+                with file_util.atomic_write(os.path.join(imgs_dir, self.HASHES_FILE_NAME)) as file_tmp:
+                    with open(file_tmp, 'w') as f:
+                        json.dump(imgs_hashes, f)
+
     def get_steps_colors(self, values):
         _range = np.max(values) - np.min(values)
         if _range == 0:
@@ -157,6 +531,7 @@ class Painter:
                     facecolor=fig.get_facecolor(),
                     dpi=400
                     )
+        plt.close(fig)
 
 
 class Analysis:
@@ -192,87 +567,6 @@ class Analysis:
                         traceback.print_exc()
                         logger.error('{png_path} generate error')
 
-    def generate_report(self):
-        for task_type in self.benchmark_config['task_filter.tasks']:
-            task_dir = self.path_maintainer.task_dir(task_type)
-            report_dir = self.path_maintainer.report_dir(task_type)
-            report_imgs_dir = self.path_maintainer.report_imgs_dir(task_type)
-
-            logger.info('start generate report')
-            data_results_file = file_util.get_filelist(task_dir, [])
-
-            results_datas, players = self.get_result_datas(data_results_file)
-
-            self.report_calc(results_datas, players, report_dir, report_imgs_dir)
-
-    def report_calc(self, results_datas, players, report_dir, report_imgs_dir):
-        columns = ['dataset', 'shape', 'horizon']
-        frameworks_non_navie = [p for p in players if 'navie' not in p]
-        # Metrics report
-        self.report_calc_metric(results_datas, columns, players, report_dir, report_imgs_dir, 'smape', 'mean')
-        self.report_calc_metric(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir, 'smape',
-                                'std')
-        self.report_calc_metric(results_datas, columns, players, report_dir, report_imgs_dir, 'mape', 'mean')
-        self.report_calc_metric(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir, 'mape',
-                                'std')
-        self.report_calc_metric(results_datas, columns, players, report_dir, report_imgs_dir, 'rmse', 'mean')
-        self.report_calc_metric(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir, 'rmse',
-                                'std')
-        self.report_calc_metric(results_datas, columns, players, report_dir, report_imgs_dir, 'mae', 'mean')
-        self.report_calc_metric(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir, 'mae', 'std')
-
-        self.report_calc_metric(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir, 'duration',
-                                'mean',
-                                title_text='MEAN duration')
-        self.report_calc_metric(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir, 'duration',
-                                'std',
-                                title_text='STD duration')
-        self.report_calc_metric(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir, 'duration',
-                                'max',
-                                title_text='MAX duration')
-        self.report_calc_metric(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir, 'duration',
-                                'min',
-                                title_text='MIN duration')
-
-    def report_calc_metric(self, results_datas, columns, players, report_dir, report_imgs_dir, metric, stat_type,
-                           title_text=None):
-        columns_report = columns + players
-        report_datas = {}
-        for row_key in list(results_datas.keys()):
-            row_data = results_datas[row_key]
-            player = row_data['player']
-            report_data_key = row_data['dataset'] + row_data['task']
-            if report_data_key not in (report_datas.keys()):
-                row_report = {}
-                for col in columns:
-                    row_report[col] = row_data[col]
-                report_datas[report_data_key] = row_report
-            row_report = report_datas[report_data_key]
-            if stat_type == 'mean':
-                row_report[player] = np.mean(row_data[metric])
-            elif stat_type == 'std':
-                row_report[player] = np.std(row_data[metric])
-            elif stat_type == 'max':
-                row_report[player] = np.max(row_data[metric])
-            elif stat_type == 'min':
-                row_report[player] = np.min(row_data[metric])
-        logger.debug(report_datas)
-
-        df_report = pd.DataFrame(columns=columns_report)
-        for row_report in report_datas.values():
-            df_report = df_report.append(dict_util.sub_dict(row_report, columns_report), ignore_index=True)
-        logger.debug(df_report)
-        report_path = '{}{}report_{}_{}.csv'.format(report_dir, os.sep, metric, stat_type)
-        df_report.to_csv(report_path, index=False)
-        logger.info('report generated: {}'.format(report_path))
-        return df_report
-
-        # png_path = '{}{}report_{}_{}.png'.format(report_imgs_dir, os.sep, metric, stat_type)
-        # if title_text == None:
-        #     title_text = '{} {} {} '.format(metric.upper(), stat_type, 'scores')
-        # self.painter.paint_table(df_report, title_cols=columns, title_text=title_text, fontsize=6,
-        #                          result_path=png_path)
-
     def get_result_datas(self, result_file_list):
         results_datas = {}
         players = []
@@ -315,21 +609,22 @@ class Reporter():
         self.benchmark_config = benchmark_config
         self.path_maintainer = PathMaintainer(benchmark_config['report.path'], benchmark_config['name'])
         self.analysis = Analysis(self.benchmark_config)
-        self.painter = Painter()
+        figures = benchmark_config.get('report.figures')
+        self.painter = Painter(enable=figures is None or figures,
+                               n_workers=benchmark_config.get('report.render_workers'))
+        self.result_store = ResultStore(self.path_maintainer.results_db())
+        # the live summary is published at most once in live_interval seconds
+        self.live_interval = benchmark_config.get('report.live_interval') or 0
+        self._live_aggregators = {}
+        self._live_published = {}
 
     def save_results(self, message, bm_task):
         # todo missing_rate periods cv cv_folds run_times init_params ensemble best_model_params run_kwargs industry frequency
-        cols_data_tmp = ['task_id', 'round_no', 'player', 'dataset', 'shape', 'data_size', 'task', 'horizon',
-                         'reward_metric', 'metrics', 'duration', 'random_state', 'y_predict', 'y_real', 'key_params',
-                         'best_params']
-        data_df = pd.DataFrame(columns=cols_data_tmp)
-        data_file = self.path_maintainer.data_file(bm_task)
-
         round_no = 1
         if 'random_states' in self.benchmark_config and bm_task.ts_task.random_state is not None:
             round_no = self.benchmark_config['random_states'].index(bm_task.ts_task.random_state) + 1
 
-        data = {'task_id': bm_task.ts_task.id,
+        data = {'task_id': str(bm_task.ts_task.id),
                 'round_no': round_no,
                 'player': bm_task.player.name,
                 'dataset': bm_task.ts_task.taskdata.name,
@@ -341,97 +636,174 @@ class Reporter():
                 'metrics': message['metrics'],
                 'duration': message['duration'],
                 'random_state': bm_task.ts_task.random_state,
-                'y_predict': message['y_predict'],
-                'y_real': message['y_real'],
                 'key_params': message['key_params'],
                 'best_params': message['best_params']
                 }
 
-        data_df = data_df.append(data, ignore_index=True)
-        if os.path.exists(data_file):
-            data_df[cols_data_tmp].to_csv(data_file, mode='a', index=False, header=False)
-            logger.info(f"Save result to : {data_file}")
-        else:
-            data_df[cols_data_tmp].to_csv(data_file, mode='a', index=False)
-            logger.info(f"Append result to : {data_file}")
+        # predictions are kept in the predictions store, the result store keeps scalars only
+        self.save_predictions(message, bm_task)
+
+        aggregator = self.live_aggregator(bm_task.ts_task.task)
+        self.result_store.append(data)
+        logger.info(f"Append result of {bm_task.id} to : {self.result_store.db_path}")
+
+        aggregator.update(data)
+        if time.time() - self._live_published.get(bm_task.ts_task.task, 0) >= self.live_interval:
+            self.publish_live_summary(bm_task.ts_task.task)
+
+    def live_aggregator(self, task_type):
+        if task_type not in self._live_aggregators:
+            # continue with the results saved before, e.g. by the interrupted run
+            aggregator = RunningAggregator()
+            metrics = self.result_store.metrics()
+            for result in self.result_store.query(task=task_type).to_dict('records'):
+                result['metrics'] = {m: result[m] for m in metrics if m in result}
+                aggregator.update(result)
+            self._live_aggregators[task_type] = aggregator
+        return self._live_aggregators[task_type]
+
+    def publish_live_summary(self, task_type):
+        summary_file = self.path_maintainer.live_summary_file(task_type)
+        with file_util.atomic_write(summary_file) as file_tmp:
+            self.live_aggregator(task_type).to_frame().to_csv(file_tmp, index=False)
+        self._live_published[task_type] = time.time()
+        logger.info(f"Publish live summary to : {summary_file}")
+
+    def prediction_store(self, task_type):
+        return PredictionStore(self.path_maintainer.predictions_dir(task_type))
+
+    def save_predictions(self, message, bm_task):
+        if message.get('y_predict') is None:
+            return
+        values = {prefix: payload_util.decode(message[prefix]) for prefix in PredictionStore.PREFIXES
+                  if message.get(prefix) is not None}
+        self.prediction_store(bm_task.ts_task.task).save(bm_task.id, **values)
 
     def generate_report(self):
         logger.info('start generate report')
+        metrics = self.result_store.metrics()
         for task_type in self.benchmark_config['task_filter.tasks']:
             task_dir = self.path_maintainer.task_dir(task_type)
             report_dir = self.path_maintainer.report_dir(task_type)
             report_imgs_dir = self.path_maintainer.report_imgs_dir(task_type)
-            data_results_file = file_util.get_filelist(task_dir, [])
-            results_datas, players = self.analysis.get_result_datas(data_results_file)
-            self.generate_type_reports(results_datas, players, report_dir, report_imgs_dir)
-
-    def generate_type_reports(self, results_datas, players, report_dir, report_imgs_dir):
-        columns = ['dataset', 'shape', 'horizon']
-        frameworks_non_navie = [p for p in players if 'navie' not in p]
+            df_results = self.result_store.query(task=task_type)
+            if df_results.shape[0] > 0:
+                self.export_results(df_results, task_type)
+                aggregator = ReportAggregator.from_results(df_results, metrics)
+                players = list(dict.fromkeys(df_results['player']))
+            else:
+                # results saved in csv files by former versions
+                data_results_file = file_util.get_filelist(task_dir, [])
+                results_datas, players = self.analysis.get_result_datas(data_results_file)
+                aggregator = ReportAggregator.from_results_datas(results_datas)
+            self.generate_type_reports(aggregator, players, report_dir, report_imgs_dir)
+        self.painter.render()
+
+    def export_results(self, df_results, task_type):
+        for player, df_player in df_results.groupby('player', sort=False):
+            data_file = self.path_maintainer.player_data_file(task_type, player)
+            df_player.to_csv(data_file, index=False)
+            logger.info(f"Export results to : {data_file}")
+
+    def generate_type_reports(self, aggregator, players, report_dir, report_imgs_dir):
+        columns = ReportAggregator.COLUMNS
+        # the naive players and the baselines computed by the server have no std or durations worth reporting
+        frameworks_non_navie = [p for p in players if 'navie' not in p and not is_baseline_player(p)]
+        # extra stats of metrics, e.g. median, q25, q75 and rank
+        extra_stats = self.benchmark_config.get('report.stats') or []
+        aggregator.aggregate(list(dict.fromkeys(['mean', 'std', 'max', 'min'] + extra_stats)))
 
         # metrics reports
-        for metric in ['smape', 'mape', 'rmse', 'mae']:
-            self.calc_and_paint(results_datas, columns, players, report_dir, report_imgs_dir, metric, 'mean')
-            self.calc_and_paint(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir,
+        for metric in consts.DEFAULT_REPORT_METRICS:
+            self.calc_and_paint(aggregator, columns, players, report_dir, report_imgs_dir, metric, 'mean')
+            self.calc_and_paint(aggregator, columns, frameworks_non_navie, report_dir, report_imgs_dir,
                                 metric,
                                 'std')
+            for stat_type in extra_stats:
+                self.calc_and_paint(aggregator, columns, players, report_dir, report_imgs_dir, metric, stat_type)
 
         # duration reports
         for stat_type in ['mean', 'std', 'max', 'min']:
-            self.calc_and_paint(results_datas, columns, frameworks_non_navie, report_dir, report_imgs_dir,
+            self.calc_and_paint(aggregator, columns, frameworks_non_navie, report_dir, report_imgs_dir,
                                 'duration',
                                 stat_type,
                                 title_text=stat_type.upper() + ' duration')
 
-    def calc_and_paint(self, results_datas, columns, players, report_dir, report_imgs_dir, metric, stat_type,
+    def calc_and_paint(self, aggregator, columns, players, report_dir, report_imgs_dir, metric, stat_type,
                        title_text=None):
         if len(players) == 0:
             return
-        df_report = self.analysis.report_calc_metric(results_datas, columns, players, report_dir, report_imgs_dir,
-                                                     metric, stat_type)
+        df_report = aggregator.table(metric, stat_type, players)
+        report_path = '{}{}report_{}_{}.csv'.format(report_dir, os.sep, metric, stat_type)
+        df_report.to_csv(report_path, index=False)
+        logger.info('report generated: {}'.format(report_path))
         if title_text == None:
             title_text = '{} {} {} '.format(metric.upper(), stat_type, 'scores')
         png_path = '{}{}report_{}_{}.png'.format(report_imgs_dir, os.sep, metric, stat_type)
-        self.painter.paint_table(df_report, title_cols=columns, title_text=title_text, fontsize=6,
-                                 result_path=png_path)
-        logger.info('report figure generated: {}'.format(png_path))
+        self.painter.submit(report_path, png_path, title_cols=columns, title_text=title_text, fontsize=6)
 
 
 class CompareReporter():
     def __init__(self, config_dict):
         self.config_dict = config_dict
-        self.painter = Painter()
-        self.reports = [os.path.basename(p) for p in config_dict['report_paths']]
+        report = config_dict.get('report', {})
+        self.painter = Painter(enable=report.get('figures', True), n_workers=report.get('render_workers'))
+        self.reports = [os.path.basename(os.path.normpath(p)) for p in config_dict['report_paths']]
+        if len(set(self.reports)) != len(self.reports):
+            raise ValueError(f"The names of the report paths should be unique, but got {self.reports}.")
 
     def run_compare(self):
         logger.info(f'Begin generate compare report {self.config_dict["name"]}')
-        columns = ['dataset', 'shape', 'horizon']
+        columns = ReportAggregator.COLUMNS
+        players = self.config_dict['players']
         for task in self.config_dict['tasks']:
-            compare_reports_dirs = self.compare_reports_dirs(task)
-
-            report_files = [os.listdir(crd) for crd in compare_reports_dirs]
-            report_names = set(report_files[0] + report_files[1])
-            report_names.remove('imgs')
+            df_reports = self.load_reports(task)
+            if df_reports.shape[0] == 0:
+                logger.warning(f'No reports of task {task} found.')
+                continue
 
-            for player in self.config_dict['players']:
-                compare_player_dir = self.compare_player_dir(task, player)
-                for report_name in report_names:
-                    try:
-                        dfs = [pd.read_csv(os.path.join(report_dir, report_name)) for report_dir in
-                               compare_reports_dirs]
-                        df = pd.concat([dfs[0][columns], dfs[0][[player]], dfs[1][[player]]], axis=1)
-                        df.columns = columns + self.reports
-                        df.to_csv(os.path.join(compare_player_dir, report_name), index=False)
-                        png_path = os.path.join(self.compare_imgs_dir(task, player), report_name[:-3] + 'png')
-                        self.painter.paint_table(df, title_cols=columns,
-                                                 title_text=player + ' ' + report_name[7:-4].replace('_', ' '),
-                                                 fontsize=6,
-                                                 result_path=png_path)
-                    except:
-                        traceback.print_exc()
-                        logger.error('{png_path} generate error')
+            df_reports = df_reports[df_reports['player'].isin(players)]
+            for (report_name, player), df_player in df_reports.groupby(['report_name', 'player'], sort=False):
+                try:
+                    rows = pd.MultiIndex.from_frame(df_player[columns].drop_duplicates())
+                    df = df_player.set_index(columns + ['report'])['value'].unstack('report') \
+                        .reindex(index=rows, columns=self.reports).reset_index()
+                    df.columns.name = None
+                    compare_player_dir = self.compare_player_dir(task, player)
+                    df.to_csv(os.path.join(compare_player_dir, report_name), index=False)
+                    png_path = os.path.join(self.compare_imgs_dir(task, player), report_name[:-3] + 'png')
+                    self.painter.submit(os.path.join(compare_player_dir, report_name), png_path,
+                                        title_cols=columns,
+                                        title_text=player + ' ' + report_name[7:-4].replace('_', ' '),
+                                        fontsize=6)
+                except:
+                    traceback.print_exc()
+                    logger.error(f'{report_name} of {player} generate error')
+        self.painter.render()
         logger.info(f'Finish generate compare report in {self.config_dict["report"]["path"]}')
-        
+
+    def load_reports(self, task):
+        '''Load the report csv files of all the benchmarks for the task once into a long-format frame, with the
+        columns dataset, shape, horizon, report_name, report, player and value.
+        '''
+        columns = ReportAggregator.COLUMNS
+        dfs = []
+        for report, report_dir in zip(self.reports, self.compare_reports_dirs(task)):
+            if not os.path.isdir(report_dir):
+                logger.warning(f'{report_dir} does not exist.')
+                continue
+            for report_name in os.listdir(report_dir):
+                if not (report_name.startswith('report_') and report_name.endswith('.csv')):
+                    continue
+                df = pd.read_csv(os.path.join(report_dir, report_name))
+                df = df.melt(id_vars=columns, var_name='player', value_name='value')
+                df['report_name'] = report_name
+                df['report'] = report
+                dfs.append(df)
+        if len(dfs) == 0:
+            return pd.DataFrame(columns=columns + ['player', 'value', 'report_name', 'report'])
+        return pd.concat(dfs, ignore_index=True)
+
     def compare_reports_dirs(self, task):
         return [os.path.join(report_path, task, 'report') for report_path in self.config_dict['report_paths']]
 
@@ -446,3 +818,18 @@ class CompareReporter():
 def load_compare_reporter(config_file: str):
     config_dict = load_yaml(config_file)
     return CompareReporter(config_dict)
+
+
+def render_figures(report_path, n_workers=None):
+    '''Render the figures of all the report csv files under report_path, e.g. reports generated without figures.
+    The figure of dir/report_smape_mean.csv is rendered to dir/imgs/report_smape_mean.png.
+    '''
+    painter = Painter(n_workers=n_workers)
+    for csv_path in file_util.get_filelist(report_path, []):
+        report_dir, report_name = os.path.split(csv_path)
+        if not (report_name.startswith('report_') and report_name.endswith('.csv')):
+            continue
+        png_path = os.path.join(file_util.get_dir_path(os.path.join(report_dir, 'imgs')), report_name[:-3] + 'png')
+        painter.submit(csv_path, png_path, title_cols=ReportAggregator.COLUMNS,
+                       title_text=default_title_text(report_name), fontsize=6)
+    painter.render()
@@ -47,6 +47,9 @@ for i in "$@"; do
         --python-script=*)
             python_script="${i#*=}"
             shift ;;
+        --warm-socket=*)
+            warm_socket="${i#*=}"
+            shift ;;
         -*|--*=)
             unknown_args="${i#*=}"
             echo "unknown_args $unknown_args" >2 1>&2
@@ -73,6 +76,7 @@ echo "requirements-yaml-file: $requirements_yaml_file"
 echo "python-path: $python_path"
 echo "datasets-cache_path: $datasets_cache_path"
 echo "python-script: $python_script"
+echo "warm-socket: $warm_socket"
 echo "-----------------------"
 
 function require_input() {
@@ -99,46 +103,15 @@ elif [ "$venv_kind" == "conda"   ]; then
     require_input "$requirements_kind" "requirements-kind"
 
     # define vars
-    conda_exec="$conda_home/bin/conda"
     venv_dir="$conda_home/envs/$venv_name"
     py_exec="$venv_dir/bin/python"
 
-    # check conda executable
-    if [ ! -f $conda_exec ];then
-      echo "conda executable $conda_exec is not exists"  1>&2
-      exit -1
-    fi
-
-    # create env
-    if [ ! -d $venv_dir ];then
-      echo "env is not already exists, create it"
-      if [ "$requirements_kind" == "requirements_txt"  ];then
-        require_input "$requirements_kind" "requirements-kind"
-        # handle requirement.txt
-        $conda_exec create -n $venv_name python=$requirements_txt_py_version pip -y
-        pip_exec="$venv_dir/bin/pip"
-        $pip_exec install -r $requirements_txt_file
-        echo "prepare virtual env succeed."
-      elif [  "$requirements_kind" == "conda_yaml" ]; then
-        require_input "$requirements_yaml_file" "requirements-yaml-file"
-        $conda_exec env create -f $requirements_yaml_file -n "$venv_name"
-      else
-        echo "unseen requirements $requirements_kind for conda"  1>&2
-        exit -1
-      fi
-
-      if [ ! -f $py_exec ];then
-          echo "python executable $py_exec is not exists, create virtual env failed."  1>&2
-          exit -1
-      fi
-
-      # pip install tsbenchmark
-      # $conda_exec install -n $venv_name -y pip
-      # "$venv_dir/bin/pip" install tsbenchmark
-
-    else
-      echo "venv dir $venv_dir already exists, skip to create"
-    fi
+    # create env if it is not provisioned
+    /bin/bash "$(dirname "$0")/provision_env.sh" --venv-name="$venv_name" \
+      --requirements-kind="$requirements_kind" \
+      --requirements-txt-file="$requirements_txt_file" \
+      --requirements-txt-py-version="$requirements_txt_py_version" \
+      --requirements-yaml-file="$requirements_yaml_file" || exit -1
 fi
 
 # check pyton executable
@@ -158,4 +131,8 @@ if [ ! -z "$datasets_cache_path" ];then
 fi
 
 # run script
-$py_exec $python_script
+if [ ! -z "$warm_socket" ];then
+  $py_exec -m tsbenchmark.worker connect --socket=$warm_socket --python-script=$python_script
+else
+  $py_exec $python_script
+fi
@@ -1,13 +1,69 @@
 # -*- encoding: utf-8 -*-
+import threading
+from collections import OrderedDict
 
 from hypernets.hyperctl.appliation import BatchApplication
+from hypernets.hyperctl.executor import create_executor_manager
+from hypernets.hyperctl.scheduler import JobScheduler
+from hypernets.hyperctl.utils import http_portal
+from tornado.ioloop import IOLoop
 from hypernets.hyperctl.server import RestCode, BaseHandler, create_hyperctl_handlers, \
     HyperctlWebApplication
 from hypernets.utils import logging as hyn_logging
+from tsbenchmark.consts import DEFAULT_REPORT_METRICS
+from tsbenchmark.executor import LocalResourceExecutorManager
+from tsbenchmark.util import cal_task_metrics, payload_util
 
 logger = hyn_logging.getLogger(__name__)
 
 
+class TaskScorer:
+    """Compute the metrics of the predicted values reported by players with the test data on the server.
+    The test data and metadata of each task are loaded once and shared by all the players and random states,
+    at most `max_tests` tasks are cached and the least recently used one is evicted first.
+    The reports are scored in the threads of the server, so the cache is guarded by a lock.
+    """
+
+    def __init__(self, metrics=DEFAULT_REPORT_METRICS, max_tests=8):
+        self.metrics = metrics
+        self.max_tests = max_tests
+        self._tests = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_test(self, ts_task):
+        with self._lock:
+            if ts_task.id in self._tests:
+                self._tests.move_to_end(ts_task.id)
+            else:
+                metadata = ts_task.taskdata.taskdata_loader.dataset_loader.ready(ts_task.id)
+                self._tests[ts_task.id] = (ts_task.taskdata.get_test(), metadata)
+                while len(self._tests) > self.max_tests:
+                    evicted, _ = self._tests.popitem(last=False)
+                    logger.debug(f"evicted the test data of task {evicted}")
+            return self._tests[ts_task.id]
+
+    def score(self, ts_task, report_data):
+        y_real, metadata = self.get_test(ts_task)
+        try:
+            y_pred = payload_util.decode(report_data['y_predict'])
+        except ValueError:
+            raise
+        except Exception as e:
+            # e.g. a corrupt npz or a payload without the data
+            raise ValueError(f"Failed to decode the predicted values: {e!r}. ") from e
+        if y_pred.shape[0] != y_real.shape[0]:
+            raise ValueError(f"The result should have {y_real.shape[0]} rows but got {y_pred.shape[0]}. ")
+        missing = [col for col in metadata['series_name'] if col not in y_pred.columns]
+        if len(missing) > 0:
+            raise ValueError(f"The result misses the series columns {missing}. ")
+
+        report_data = report_data.copy()
+        report_data['metrics'] = cal_task_metrics(y_pred, y_real[metadata['series_name']], metadata['date_name'],
+                                                  metadata['series_name'], metadata['covariables_name'],
+                                                  self.metrics, 'regression', scales=metadata.get('scales'))
+        return report_data
+
+
 class IndexHandler(BaseHandler):
 
     def get(self, *args, **kwargs):
@@ -38,7 +94,7 @@ class TSTaskHandler(BaseHandler):
 
 class BenchmarkTaskOperationHandler(BaseHandler):
 
-    def post(self, bm_task_id, operation,  **kwargs):
+    async def post(self, bm_task_id, operation,  **kwargs):
         request_body = self.get_request_as_dict()
         benchmark = self.benchmark
         message_dict = request_body
@@ -50,18 +106,30 @@ class BenchmarkTaskOperationHandler(BaseHandler):
             return
 
         if operation == 'report':
+            report_data = message_dict.get('data')
+            if report_data is not None and 'metrics' not in report_data and 'y_predict' in report_data:
+                try:
+                    # loading the test data and scoring may take long, they run out of the io loop
+                    report_data = await IOLoop.current().run_in_executor(None, self.scorer.score,
+                                                                         bm_task.ts_task, report_data)
+                except Exception as e:
+                    logger.exception(f"failed to score the report of task {bm_task_id}: {e}")
+                    self.response({"msg": str(e)}, RestCode.Exception)
+                    return
+
             for callback in benchmark.callbacks:
                 from tsbenchmark.callbacks import BenchmarkCallback
                 callback: BenchmarkCallback = callback
-                callback.on_task_message(benchmark, bm_task, message_dict.get('data'))
+                callback.on_task_message(benchmark, bm_task, report_data)
 
             return self.response({}, code=RestCode.Success)
         else:
             # TODO kill operation
             pass
 
-    def initialize(self, benchmark):
+    def initialize(self, benchmark, scorer):
         self.benchmark = benchmark
+        self.scorer = scorer
 
 
 class TSTaskListHandler(BaseHandler):
@@ -80,14 +148,28 @@ class BenchmarkBatchApplication(BatchApplication):
 
     def __init__(self, benchmark, **kwargs):  # TODO
         self.benchmark = benchmark
+        self.scorer = TaskScorer()
         super(BenchmarkBatchApplication, self).__init__(**kwargs)
 
+    def _create_scheduler(self, backend_type, backend_conf, server_host, server_port,
+                          scheduler_exit_on_finish, scheduler_interval, scheduler_callbacks):
+        if backend_type == 'local':
+            backend_conf = backend_conf if backend_conf is not None else {}
+            resource = backend_conf.get('resource', {})
+            executor_manager = LocalResourceExecutorManager(http_portal(server_host, server_port),
+                                                            environments=backend_conf.get('environments'),
+                                                            cpu=resource.get('cpu'), mem=resource.get('mem'))
+        else:
+            executor_manager = create_executor_manager(backend_type, backend_conf, server_host, server_port)
+        return JobScheduler(self.batch, scheduler_exit_on_finish,
+                            scheduler_interval, executor_manager, callbacks=scheduler_callbacks)
+
     def _create_web_app(self, server_host, server_port, batch):
         hyperctl_handlers = create_hyperctl_handlers(batch, self.job_scheduler)
         tsbenchmark_handlers = [
             (r'/tsbenchmark/api/task/(?P<task_id>.+)', TSTaskHandler),
             (r'/tsbenchmark/api/benchmark-task/(?P<bm_task_id>.+)/(?P<operation>.+)',
-             BenchmarkTaskOperationHandler, dict(benchmark=self.benchmark)),
+             BenchmarkTaskOperationHandler, dict(benchmark=self.benchmark, scorer=self.scorer)),
             (r'/tsbenchmark/api/job', TSTaskListHandler),
             (r'/tsbenchmark', IndexHandler)
         ]
@@ -2,7 +2,7 @@ import os
 from pathlib import Path
 import time
 
-from tsbenchmark.consts import DEFAULT_CACHE_PATH, ENV_DATASETS_CACHE_PATH
+from tsbenchmark.consts import DEFAULT_CACHE_PATH, ENV_DATASETS_CACHE_PATH, DEFAULT_PREFETCH_WORKERS
 
 __all__ = ['TSTask']
 
@@ -72,6 +72,9 @@ class TSTask(object):
                 - r2
                 - recall
 
+        server_metrics : bool, default=False
+            Whether the metrics are computed by the benchmark server, the players upload only the predicted values.
+
     Notes:
     ----------
     In the report it support smape, mape, mae and rmse.
@@ -85,7 +88,7 @@ class TSTask(object):
         task_config : TSTaskConfig
             The TSTaskConfig construct from dataset_desc.
         kwargs:
-            Parameters to initialize TSTask. Include random_state, max_trials and reward_metric.
+            Parameters to initialize TSTask. Include random_state, max_trials, reward_metric and server_metrics.
         """
         for k, v in task_config.__dict__.items():
             self.__dict__[k] = v
@@ -93,6 +96,7 @@ class TSTask(object):
         self.random_state = kwargs.pop("random_state") if "random_state" in kwargs else None
         self.max_trials = kwargs.pop("max_trials") if "max_trials" in kwargs else None
         self.reward_metric = kwargs.pop("reward_metric") if "reward_metric" in kwargs else None
+        self.server_metrics = kwargs.pop("server_metrics") if "server_metrics" in kwargs else False
 
         self.start_time = time.time()
         self.download_time = 0
@@ -120,6 +124,11 @@ class TSTask(object):
     def get_train(self):
         """Get a pandas.DadaFrame train data.
 
+        Notes:
+        ----------
+        The task from tsbenchmark.api.get_task() maps the data from the datasets cache, its numeric columns are
+        read-only and shared with other players on the same host. Copy it before modifying in place.
+
         Returns:
         -------
             pandas.DataFrame : The data for train.
@@ -132,6 +141,10 @@ class TSTask(object):
     def get_test(self):
         """Get a pandas.DadaFrame test data.
 
+        Notes:
+        ----------
+        Same as get_train, the data may be read-only.
+
         Returns:
         -------
             pandas.DataFrame : The data for test.
@@ -150,23 +163,36 @@ class TSTask(object):
         self.start_time = time.time()
 
 
-def _get_task_load(cache_path=None):
+# the task loaders shared in the process, keyed by (cache_path, memory_map)
+_task_loaders = {}
+
+
+def _get_task_load(cache_path=None, memory_map=False):
     if cache_path is None:
         cache_path = os.getenv(ENV_DATASETS_CACHE_PATH)
         if cache_path is None:
             cache_path = DEFAULT_CACHE_PATH
 
-    from tsbenchmark.tsloader import TSTaskLoader
-    task_loader = TSTaskLoader(cache_path)
-    return task_loader
+    key = (cache_path, memory_map)
+    if key not in _task_loaders:
+        from tsbenchmark.tsloader import TSTaskLoader
+        _task_loaders[key] = TSTaskLoader(cache_path, memory_map=memory_map)
+    return _task_loaders[key]
 
 
-def get_task_config(task_id, cache_path=None) -> TSTaskConfig:
-    task_loader = _get_task_load(cache_path)
+def get_task_config(task_id, cache_path=None, memory_map=False) -> TSTaskConfig:
+    task_loader = _get_task_load(cache_path, memory_map=memory_map)
     task_config: TSTaskConfig = task_loader.load(task_id)
     return task_config
 
 
+def get_task_configs(task_ids, cache_path=None):
+    """Get the task configs of the task ids with one loader, the data of the tasks is loaded on demand.
+    """
+    task_loader = _get_task_load(cache_path)
+    return [task_loader.load(task_id) for task_id in task_ids]
+
+
 def list_task_configs(*args, **kwargs):
     if 'cache_path' in kwargs:
         cache_path = kwargs.pop("cache_path")
@@ -182,8 +208,17 @@ def list_task_configs(*args, **kwargs):
     tasks = task_loader.list(*args, **kwargs)
 
     if dataset_ids is not None and len(dataset_ids) > 0:
-        ret_tasks = list(filter(lambda t: get_task_config(t).dataset_id in list(map(str, dataset_ids)), tasks))
+        from tsbenchmark.tsloader import _to_dataset
+        dataset_ids = set(map(str, dataset_ids))
+        ret_tasks = [t for t in tasks if _to_dataset(t)[0] in dataset_ids]
     else:
         ret_tasks = tasks
 
     return ret_tasks
+
+
+def prefetch_task_configs(task_ids, cache_path=None, n_workers=DEFAULT_PREFETCH_WORKERS, keep_csv=True):
+    """Download and verify the datasets of the tasks into the datasets cache in parallel.
+    """
+    task_loader = _get_task_load(cache_path)
+    task_loader.prefetch(task_ids, n_workers=n_workers, keep_csv=keep_csv)
@@ -0,0 +1,16 @@
+import os
+import shutil
+import tempfile
+
+import tsbenchmark
+
+DATA_PATH = os.path.join(os.path.dirname(tsbenchmark.__file__), 'tests', 'datas')
+
+
+def copy_test_datas():
+    '''Copy the test datas to a temp dir for the tests caching datasets, the loaders write the caches and the columns
+    computed by them, e.g. the scales, into the data path.'''
+    data_path = os.path.join(tempfile.mkdtemp(prefix='tsb-datas'), 'datas')
+    shutil.copytree(DATA_PATH, data_path,
+                    ignore=shutil.ignore_patterns('*.feather', '*.pkl', '*.lock', '.md5manifest', 'tmp'))
+    return data_path
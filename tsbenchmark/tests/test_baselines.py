@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import tsbenchmark.tasks
+from tsbenchmark import consts
+from tsbenchmark.baselines import BaselineEngine, forecast_baselines, infer_periods
+from tsbenchmark.server import TaskScorer
+from tsbenchmark.tasks import TSTask
+from tsbenchmark.tests import copy_test_datas
+
+
+def test_forecast_baselines():
+    steps = np.arange(24)
+    values = np.stack([np.tile([1., 2., 3., 4.], 6), steps * 2.], axis=1)
+    values[-1, 1] = np.nan  # filled by the former value
+
+    forecasts = forecast_baselines(values, 3, window=2)
+    np.testing.assert_array_equal(forecasts['naive'], [[4., 44.]] * 3)
+    np.testing.assert_allclose(forecasts['mean'], [[2.5, 550. / 24]] * 3)
+    np.testing.assert_allclose(forecasts['drift'][:, 1], 44. + np.arange(1, 4) * 44. / 23)
+    np.testing.assert_array_equal(forecasts['moving_average'], [[3.5, 44.]] * 3)
+    assert forecasts['seasonal_naive'].shape == (3, 2)
+    np.testing.assert_array_equal(forecasts['seasonal_naive'][:, 0], [1., 2., 3.])
+
+
+def test_infer_periods():
+    values = np.stack([np.sin(np.arange(120) * 2 * np.pi / 12), np.sin(np.arange(120) * 2 * np.pi / 7)], axis=1)
+    assert infer_periods(values).tolist()[0] == 12
+    assert infer_periods(values[:2]).tolist() == [1, 1]
+
+
+def test_unseen_baseline():
+    with pytest.raises(ValueError):
+        BaselineEngine(['naive', 'arima'])
+    with pytest.raises(ValueError):
+        forecast_baselines(np.ones((5, 1)), 2, ['arima'])
+
+
+def test_report():
+    scorer = TaskScorer()
+    ts_task = TSTask(tsbenchmark.tasks.get_task_config('512754', cache_path=copy_test_datas()), random_state=None)
+    engine = BaselineEngine()
+    reports = engine.report(ts_task, scorer)
+
+    assert [player.name for player, _ in reports] == ['baseline_naive', 'baseline_seasonal_naive', 'baseline_drift',
+                                                       'baseline_mean', 'baseline_moving_average']
+    for _, report_data in reports:
+        assert set(report_data['metrics'].keys()) == set(consts.DEFAULT_REPORT_METRICS)
+    # the test data is cached by the scorer
+    assert ts_task.id in scorer._tests
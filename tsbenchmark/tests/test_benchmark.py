@@ -412,3 +412,262 @@ class TestRemoteCondaReqsCondaYamlBenchmark(BaseBenchmarkTest):
         assets = ["run_py.sh", "plain_player_conda_yaml/exec.py",
                   "plain_player_conda_yaml/player.yaml", "plain_player_conda_yaml/env.yaml"]
         assert_remote_bm_batch_succeed(self.benchmark, self.connection, assets)
+
+
+class TestTaskIndex:
+
+    def setup_class(self):
+        players = [load_test_player('plain_player'), load_test_player('plain_player_univariate')]
+        self.benchmark = create_local_benchmark(players=players,
+                                                tasks=[tsbenchmark.tasks.get_task_config('512754')],
+                                                random_states=[DEFAULT_RANDOM_STATE, 8087])
+        self.benchmark._reset_tasks()
+        for ts_task_config in self.benchmark.ts_tasks_config:
+            self.benchmark._create_tasks(ts_task_config)
+
+    def test_get_task(self):
+        assert len(self.benchmark.tasks()) == 4
+        for bm_task in self.benchmark.tasks():
+            assert self.benchmark.get_task(bm_task.id) is bm_task
+            assert self.benchmark.find_task(bm_task.player.name, bm_task.ts_task.random_state,
+                                            bm_task.ts_task.id) is bm_task
+        assert self.benchmark.get_task('not_exists') is None
+
+    def test_find_ts_task(self):
+        from tsbenchmark.benchmark import HyperctlBatchCallback
+        from tsbenchmark.players import JobParams
+
+        callback = HyperctlBatchCallback(self.benchmark)
+        for bm_task in self.benchmark.tasks():
+            job_params = JobParams(bm_task_id=bm_task.id, task_config_id=bm_task.ts_task.id,
+                                   random_state=bm_task.ts_task.random_state)
+            job = ShellJob(name=bm_task.id, params=job_params.to_dict(), command='', output_dir='')
+            # the tasks of the players differ in player only
+            assert callback.find_ts_task(job) is bm_task
+
+    def test_on_job_finish(self):
+        from tsbenchmark.benchmark import HyperctlBatchCallback
+        from tsbenchmark.callbacks import BenchmarkCallback
+        from tsbenchmark.players import JobParams
+
+        class CollectCallback(BenchmarkCallback):
+            def __init__(self):
+                self.statuses = {}
+
+            def on_task_finish(self, bm, bm_task, elapsed: float):
+                self.statuses[bm_task.id] = bm_task.status()
+
+        collect_callback = CollectCallback()
+        self.benchmark.callbacks = [collect_callback]
+        callback = HyperctlBatchCallback(self.benchmark)
+        bm_task = self.benchmark.tasks()[0]
+        for bm_task_id in [bm_task.id, 'not_exists']:
+            job_params = JobParams(bm_task_id=bm_task_id, task_config_id=bm_task.ts_task.id,
+                                   random_state=bm_task.ts_task.random_state)
+            job = ShellJob(name=bm_task_id, params=job_params.to_dict(), command='', output_dir='')
+            job.set_status(ShellJob.STATUS_SUCCEED)
+            # the job of an unknown task is skipped
+            callback.on_job_finish(None, job, None, 1)
+        assert collect_callback.statuses == {bm_task.id: ShellJob.STATUS_SUCCEED}
+
+
+class TestTaskCostEstimator:
+
+    def setup_class(self):
+        players = [load_test_player('plain_player'), load_test_player('plain_player_univariate')]
+        self.benchmark = create_local_benchmark(players=players,
+                                                tasks=[tsbenchmark.tasks.get_task_config('512754'),
+                                                       tsbenchmark.tasks.get_task_config('61807')],
+                                                random_states=[DEFAULT_RANDOM_STATE])
+        self.benchmark._reset_tasks()
+        for ts_task_config in self.benchmark.ts_tasks_config:
+            self.benchmark._create_tasks(ts_task_config)
+
+    def ordered_ids(self, estimator):
+        return [(t.player.name, t.ts_task.id) for t in estimator.order(self.benchmark.tasks())]
+
+    def test_order_by_shape(self):
+        from tsbenchmark.benchmark import TaskCostEstimator
+
+        estimator = TaskCostEstimator()
+        assert estimator.cells_of('(124, 2)', 'small') == 248
+        assert estimator.cells_of(None, 'large') == TaskCostEstimator.DATA_SIZE_CELLS['large']
+        assert self.ordered_ids(estimator)[0] == ('plain_player', '61807')
+
+    def test_order_by_history(self):
+        import pandas as pd
+        from tsbenchmark.benchmark import TaskCostEstimator
+
+        history = pd.DataFrame({'player': ['plain_player', 'plain_player_univariate', 'plain_player_univariate'],
+                                'task_id': ['61807', '512754', '512754'],
+                                'shape': ['(105, 112)', '(124, 2)', '(124, 2)'],
+                                'data_size': ['small', 'small', 'small'],
+                                'duration': [10.0, 40.0, 60.0]})
+        estimator = TaskCostEstimator(history)
+        assert self.ordered_ids(estimator) == [('plain_player_univariate', '512754'),
+                                               ('plain_player', '61807'),
+                                               ('plain_player', '512754')]
+
+
+class TestResume:
+
+    def setup_class(self):
+        players = [load_test_player('plain_player'), load_test_player('plain_player_univariate')]
+        self.benchmark = create_local_benchmark(players=players,
+                                                tasks=[tsbenchmark.tasks.get_task_config('512754')],
+                                                random_states=[DEFAULT_RANDOM_STATE, 8087])
+        self.benchmark._reset_tasks()
+        for ts_task_config in self.benchmark.ts_tasks_config:
+            self.benchmark._create_tasks(ts_task_config)
+
+    def test_journal(self):
+        from tsbenchmark.callbacks import JobJournal, JournalCallback
+
+        callback = JournalCallback()
+        callback.on_start(self.benchmark)
+        bm_task1, bm_task2, bm_task3 = self.benchmark.tasks()[:3]
+        for bm_task in [bm_task1, bm_task2, bm_task3]:
+            callback.on_task_start(self.benchmark, bm_task)
+        bm_task1.set_status(ShellJob.STATUS_SUCCEED)
+        callback.on_task_finish(self.benchmark, bm_task1, 1)
+        bm_task2.set_status(ShellJob.STATUS_FAILED)
+        callback.on_task_finish(self.benchmark, bm_task2, 1)
+        # a line truncated by the crash
+        with open(self.benchmark.journal_file(), 'a') as f:
+            f.write('{"bm_task_id": ')
+
+        journal = JobJournal(self.benchmark.journal_file())
+        assert len(journal.records()) == 5
+        assert journal.succeed_tasks() == {('plain_player', '512754', bm_task1.ts_task.random_state)}
+
+    def test_completed_tasks(self):
+        import pandas as pd
+        from tsbenchmark.callbacks import JobJournal
+
+        bm_task, bm_task_failed = self.benchmark.tasks()[-1], self.benchmark.tasks()[0]
+        random_state = float(bm_task.ts_task.random_state)
+        # the rows of other random states, other players and without a duration are not completed tasks
+        self.benchmark.history = pd.DataFrame({'player': [bm_task.player.name, bm_task.player.name,
+                                                          'other_player', bm_task_failed.player.name],
+                                               'task_id': ['512754', '512754', '512754', '512754'],
+                                               'random_state': [random_state, random_state + 100, random_state,
+                                                                float(bm_task_failed.ts_task.random_state)],
+                                               'duration': [1.0, 1.0, 1.0, None]})
+        task_key = (bm_task.player.name, '512754', bm_task.ts_task.random_state)
+        assert self.benchmark.completed_tasks() == JobJournal(self.benchmark.journal_file()).succeed_tasks() | {task_key}
+
+
+class TestInProcessBenchmark:
+
+    def test_run(self):
+        from tsbenchmark.benchmark import InProcessBenchmark
+        from tsbenchmark.callbacks import BenchmarkCallback
+
+        class CollectCallback(BenchmarkCallback):
+            def __init__(self):
+                self.messages = {}
+                self.statuses = {}
+                self.finished = False
+
+            def on_task_message(self, bm, bm_task, message):
+                self.messages[bm_task.id] = message
+
+            def on_task_finish(self, bm, bm_task, elapsed: float):
+                self.statuses[bm_task.id] = bm_task.status()
+
+            def on_finish(self, bm):
+                self.finished = True
+
+        callback = CollectCallback()
+        players = [load_test_player('plain_navie_player'), load_test_player('plain_player_univariate')]
+        benchmark = InProcessBenchmark(name='inprocess-benchmark', desc='desc', players=players,
+                                       ts_tasks_config=[tsbenchmark.tasks.get_task_config('512754')],
+                                       random_states=[DEFAULT_RANDOM_STATE], callbacks=[callback], n_workers=2)
+        benchmark.run()
+
+        assert callback.finished
+        assert callback.statuses == {bm_task.id: ShellJob.STATUS_SUCCEED for bm_task in benchmark.tasks()}
+        # plain_navie_player is not random
+        message = callback.messages['plain_navie_player_512754_None']
+        assert set(message['metrics'].keys()) == set(consts.DEFAULT_REPORT_METRICS)
+        assert callback.messages[f'plain_player_univariate_512754_{DEFAULT_RANDOM_STATE}'] == {'reward': 0.7}
+
+    def test_start_on_pickup(self):
+        from tsbenchmark.benchmark import InProcessBenchmark
+        from tsbenchmark.callbacks import BenchmarkCallback
+
+        class EventsCallback(BenchmarkCallback):
+            def __init__(self):
+                self.events = []
+
+            def on_task_start(self, bm, bm_task):
+                self.events.append(('start', bm_task.id))
+
+            def on_task_finish(self, bm, bm_task, elapsed: float):
+                self.events.append(('finish', bm_task.id))
+
+        callback = EventsCallback()
+        benchmark = InProcessBenchmark(name='inprocess-benchmark', desc='desc',
+                                       players=[load_test_player('plain_player_univariate')],
+                                       ts_tasks_config=[tsbenchmark.tasks.get_task_config('512754')],
+                                       random_states=[1, 2, 3], callbacks=[callback], n_workers=1)
+        benchmark.run()
+
+        # a task starts when the only process picks it up, not when it is submitted
+        assert len(callback.events) == 6
+        for i in range(0, 6, 2):
+            assert callback.events[i][0] == 'start'
+            assert callback.events[i + 1] == ('finish', callback.events[i][1])
+
+    def test_stop(self):
+        from tsbenchmark.benchmark import InProcessBenchmark
+        from tsbenchmark.callbacks import BenchmarkCallback
+
+        class StopCallback(BenchmarkCallback):
+            def __init__(self):
+                self.statuses = []
+
+            def on_task_start(self, bm, bm_task):
+                bm.stop()
+
+            def on_task_finish(self, bm, bm_task, elapsed: float):
+                self.statuses.append(bm_task.status())
+
+        callback = StopCallback()
+        benchmark = InProcessBenchmark(name='inprocess-benchmark', desc='desc',
+                                       players=[load_test_player('plain_player_univariate')],
+                                       ts_tasks_config=[tsbenchmark.tasks.get_task_config('512754')],
+                                       random_states=list(range(1, 7)), callbacks=[callback], n_workers=1)
+        benchmark.run()
+
+        # the tasks still pending in the pool are cancelled and finished as failed
+        assert len(callback.statuses) == 6
+        assert ShellJob.STATUS_FAILED in callback.statuses
+
+    def test_run_baselines(self):
+        from tsbenchmark.baselines import BaselineEngine
+        from tsbenchmark.benchmark import InProcessBenchmark
+        from tsbenchmark.callbacks import BenchmarkCallback
+
+        class CollectCallback(BenchmarkCallback):
+            def __init__(self):
+                self.messages = {}
+
+            def on_task_message(self, bm, bm_task, message):
+                self.messages[bm_task.id] = message
+
+        callback = CollectCallback()
+        benchmark = InProcessBenchmark(name='inprocess-benchmark', desc='desc',
+                                       players=[load_test_player('plain_navie_player')],
+                                       ts_tasks_config=[tsbenchmark.tasks.get_task_config('512754')],
+                                       random_states=[DEFAULT_RANDOM_STATE], callbacks=[callback], n_workers=1,
+                                       baselines=BaselineEngine(['naive', 'seasonal_naive']))
+        benchmark.run()
+
+        assert set(callback.messages.keys()) == {'plain_navie_player_512754_None', 'baseline_naive_512754_None',
+                                                 'baseline_seasonal_naive_512754_None'}
+        # the baselines are scored with the test data cached for the players
+        assert list(benchmark.scorer._tests.keys()) == ['512754']
+        # plain_navie_player repeats the last value as the naive baseline does
+        assert callback.messages['baseline_naive_512754_None']['metrics'] == \
+            callback.messages['plain_navie_player_512754_None']['metrics']
@@ -0,0 +1,62 @@
+import tempfile
+
+import pytest
+from hypernets.hyperctl.batch import ShellJob
+from hypernets.hyperctl.executor import NoResourceException
+
+from tsbenchmark.executor import LocalResourceExecutorManager, thread_envs
+
+
+def create_job(name, resource):
+    return ShellJob(name=name, params={}, command='echo', output_dir=tempfile.mkdtemp(prefix='tsb-job'),
+                    resource=resource)
+
+
+class TestLocalResourceExecutorManager:
+
+    def test_pack_jobs(self):
+        em = LocalResourceExecutorManager('http://localhost:8060', cpu=8, mem=4096)
+        e1 = em.alloc_executor(create_job('job1', {'cpu': 4, 'mem': 1024}))
+        e2 = em.alloc_executor(create_job('job2', {'cpu': 2, 'mem': 2048}))
+        assert em.usage == (6, 3072)
+
+        # not enough cpu
+        with pytest.raises(NoResourceException):
+            em.alloc_executor(create_job('job3', {'cpu': 4, 'mem': 512}))
+        # not enough memory
+        with pytest.raises(NoResourceException):
+            em.alloc_executor(create_job('job4', {'cpu': 1, 'mem': 2048}))
+
+        em.release_executor(e1)
+        assert em.usage == (2, 2048)
+        em.alloc_executor(create_job('job3', {'cpu': 4, 'mem': 512}))
+        assert len(em.waiting_executors()) == 2
+        assert e2 in em.waiting_executors()
+
+    def test_exclusive_job(self):
+        em = LocalResourceExecutorManager('http://localhost:8060', cpu=8, mem=4096)
+        executor = em.alloc_executor(create_job('job1', {'cpu': -1, 'mem': -1}))
+        assert em.usage == (8, 4096)
+        with pytest.raises(NoResourceException):
+            em.alloc_executor(create_job('job2', {'cpu': 1, 'mem': 1}))
+        em.release_executor(executor)
+
+        # request more than the capacity is limited to the capacity
+        em.alloc_executor(create_job('job3', {'cpu': 16, 'mem': 1024}))
+        assert em.usage == (8, 1024)
+
+    def test_default_request(self):
+        em = LocalResourceExecutorManager('http://localhost:8060', cpu=8, mem=4096)
+        # an undeclared key does not occupy the whole machine
+        assert em.request_of(create_job('job1', {'cpu': 4})) == (4, 0)
+        assert em.request_of(create_job('job2', {'mem': 1024})) == (1, 1024)
+        # a job without any request does
+        assert em.request_of(create_job('job3', None)) == (8, 4096)
+        assert em.request_of(create_job('job4', {})) == (8, 4096)
+
+
+def test_thread_envs():
+    assert thread_envs({'cpu': 4, 'mem': -1})['OMP_NUM_THREADS'] == '4'
+    assert thread_envs({'cpu': 4, 'mem': -1})['MKL_NUM_THREADS'] == '4'
+    assert thread_envs({'cpu': -1, 'mem': -1}) == {}
+    assert thread_envs(None) == {}
@@ -1,3 +1,6 @@
+import numpy as np
+import pytest
+
 from tsbenchmark import metrics
 from hypernets.utils import const
 
@@ -10,3 +13,96 @@ def test_calc_score():
     assert 'rmse' in results and results['rmse'] is not None
     assert 'mape' in results and results['mape'] is not None
     assert 'mae' in results and results['mae'] is not None
+
+
+def test_calc_regression_scores():
+    y = np.array([[4., 1.], [5., np.nan], [6., 3.]])
+    y_pred = np.array([[1., 2.], [2., 2.], [3., 2.]])
+    results = metrics.calc_regression_scores(y, y_pred, metrics=['smape', 'rmse', 'mape', 'mae', 'mse'])
+    assert np.isclose(results['smape'], metrics.smape(y, y_pred))
+    assert np.isclose(results['rmse'], metrics.rmse(y, y_pred))
+    assert np.isclose(results['mape'], metrics.mape(y, y_pred))
+    assert np.isclose(results['mae'], metrics.mae(y, y_pred))
+    assert np.isclose(results['mse'], metrics.mse(y, y_pred))
+
+    results = metrics.calc_regression_scores(y, y_pred, metrics=['mae'], breakdown=True)
+    assert np.allclose(results['series']['mae'], metrics.mae(y, y_pred, axis=0))
+    assert np.allclose(results['horizon']['mae'], metrics.mae(y, y_pred, axis=1))
+
+
+def test_calc_regression_scores_batch():
+    rng = np.random.RandomState(0)
+    y = rng.rand(12, 3)
+    y_preds = rng.rand(5, 12, 3)
+    results = metrics.calc_regression_scores(y, y_preds, breakdown=True)
+    assert results['total']['smape'].shape == (5,)
+    assert results['series']['rmse'].shape == (5, 3)
+    assert results['horizon']['mape'].shape == (5, 12)
+    for i in range(5):
+        assert np.isclose(results['total']['smape'][i], metrics.smape(y, y_preds[i]))
+        assert np.isclose(results['total']['rmse'][i], metrics.rmse(y, y_preds[i]))
+
+
+def test_calc_regression_scores_unsupported():
+    with pytest.raises(ValueError):
+        metrics.calc_regression_scores([1, 2], [1, 2], metrics=['accuracy'])
+
+
+def test_in_sample_scales():
+    y_train = np.array([[1., 5.], [3., 5.], [2., 5.], [6., np.nan]])
+    scales = metrics.in_sample_scales(y_train, season=2)
+    assert np.allclose(scales['naive_mae'], [7 / 3, 0.])
+    assert np.allclose(scales['naive_mse'], [21 / 3, 0.])
+    assert np.allclose(scales['snaive_mae'], [2., 0.])
+    assert np.allclose(scales['last'], [6., 5.])
+
+    assert metrics.season_of('Month', 100) == 12
+    assert metrics.season_of('Month', 12) == 1
+    assert metrics.season_of('Fortnight', 100) == 1
+
+
+def test_calc_regression_scores_scaled():
+    y_train = np.array([[1., 10.], [3., 14.], [2., 12.], [6., 10.]])
+    scales = metrics.in_sample_scales(y_train, season=2)
+    y = np.array([[4., 11.], [5., 12.], [7., 15.]])
+    y_pred = np.array([[5., 10.], [5., 13.], [6., 13.]])
+    results = metrics.calc_regression_scores(y, y_pred, metrics=['mase', 'rmsse', 'rel_mae', 'rel_rmse'],
+                                             scales=scales)
+
+    abs_diff = np.abs(y_pred - y)
+    assert np.isclose(results['mase'], (abs_diff / scales['snaive_mae']).mean())
+    assert np.isclose(results['rmsse'], np.sqrt(((y_pred - y) ** 2 / scales['naive_mse']).mean()))
+    naive_diff = y_train[-1] - y
+    assert np.isclose(results['rel_mae'], abs_diff.mean() / np.abs(naive_diff).mean())
+    assert np.isclose(results['rel_rmse'], np.sqrt(((y_pred - y) ** 2).mean() / (naive_diff ** 2).mean()))
+
+    # the naive forecast is 1 relative to itself
+    y_naive = np.repeat(y_train[-1:], 3, axis=0)
+    results = metrics.calc_regression_scores(y, y_naive, metrics=['rel_mae'], scales=scales, breakdown=True)
+    assert np.isclose(results['total']['rel_mae'], 1.)
+    assert np.allclose(results['series']['rel_mae'], [1., 1.])
+
+    with pytest.raises(ValueError):
+        metrics.calc_regression_scores(y, y_pred, metrics=['mase'])
+
+
+def test_cal_task_metrics_without_scales():
+    import pandas as pd
+    from tsbenchmark.util import cal_task_metrics
+
+    y = pd.DataFrame({'a': [4., 5., 6.]})
+    y_pred = pd.DataFrame({'a': [1., 2., 3.]})
+    # the scaled metrics are skipped if the scales are unknown
+    results = cal_task_metrics(y_pred, y, None, ['a'], None, ['mae', 'mase', 'rmsse'], 'regression')
+    assert results == {'mae': 3.}
+
+    results = cal_task_metrics(y_pred, y, None, ['a'], None, ['mae', 'mase'], 'regression',
+                               scales={'a': {'naive_mae': 1., 'naive_mse': 1., 'snaive_mae': 1., 'last': 6.}})
+    assert results == {'mae': 3., 'mase': 3.}
+
+
+def test_scales_of_series():
+    scales = metrics.scales_of_series({'a': {'naive_mae': 1., 'naive_mse': 2., 'snaive_mae': 3., 'last': 4.}},
+                                      ['b', 'a'])
+    assert np.isnan(scales['naive_mae'][0])
+    assert scales['last'].tolist()[1] == 4.
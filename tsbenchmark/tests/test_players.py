@@ -1,7 +1,7 @@
 import sys
 
 from tsbenchmark.benchmark import Player
-from tsbenchmark.players import PythonEnv
+from tsbenchmark.players import PythonEnv, load_resource
 from pathlib import Path
 
 from tsbenchmark.tests.players import load_test_player
@@ -65,3 +65,22 @@ class TestLoadPlayer:
         assert env.venv_kind == PythonEnv.KIND_CUSTOM_PYTHON
 
         assert player.random is False
+
+    def test_load_resource_player(self):
+        player = load_test_player("resource_player_univariate")
+        assert player.resource == {'cpu': 2, 'mem': 1024}
+
+        plain_player = load_test_player('plain_player')
+        assert plain_player.resource == {'cpu': -1, 'mem': -1}
+
+        assert load_resource({'cpu': 4}) == {'cpu': 4, 'mem': 0}
+        assert load_resource({'mem': 1024}) == {'cpu': 1, 'mem': 1024}
+        assert load_resource({'cpu': -1}) == {'cpu': -1, 'mem': 0}
+
+    def test_load_warm_worker_player(self):
+        player = load_test_player("warm_player_univariate")
+        assert player.warm_worker.enable is True
+        assert player.warm_worker.preload == ['pandas']
+
+        plain_player = load_test_player('plain_player')
+        assert plain_player.warm_worker.enable is False
@@ -0,0 +1,108 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import tsbenchmark
+from tsbenchmark.tsloader import TSDataSetLoader
+from tsbenchmark.util import data_package_util, download_util, md5_util
+
+data_path = os.path.join(os.path.dirname(tsbenchmark.__file__), 'tests', 'datas')
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Serve files like S3, support requests with the header 'Range: bytes=start-'."""
+
+    range_requests = []
+
+    def send_head(self):
+        range_header = self.headers.get('Range')
+        if range_header is None:
+            return super(RangeRequestHandler, self).send_head()
+
+        RangeRequestHandler.range_requests.append(self.path)
+        file_path = self.translate_path(self.path)
+        start = int(re.match(r'bytes=(\d+)-', range_header).group(1))
+        size = os.path.getsize(file_path)
+        if start >= size:
+            self.send_error(416)
+            return None
+        f = open(file_path, 'rb')
+        f.seek(start)
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {start}-{size - 1}/{size}')
+        self.send_header('Content-Length', str(size - start))
+        self.end_headers()
+        return f
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPrefetch:
+
+    def setup_class(self):
+        self.source_path = tempfile.mkdtemp(prefix='tsb-datas-source')
+        data_package_util().package(data_path, self.source_path)
+
+        handler = partial(RangeRequestHandler, directory=self.source_path)
+        self.server = ThreadingHTTPServer(('localhost', 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.data_source = f'http://localhost:{self.server.server_address[1]}'
+
+    def test_prefetch(self):
+        cache_path = tempfile.mkdtemp(prefix='tsb-datas-cache')
+        dataloader = TSDataSetLoader(cache_path, data_source=self.data_source)
+        dataset_ids = dataloader.list()
+        assert len(dataset_ids) == 2
+
+        dataloader.prefetch(dataset_ids, n_workers=2)
+        for dataset_id in dataset_ids:
+            assert dataloader.dataset_desc.cached(dataset_id)
+            assert os.path.exists(dataloader.dataset_desc.train_file_path(dataset_id))
+            # the scales of the metrics are computed when the dataset is cached
+            assert dataloader.dataset_desc.scales(dataset_id) is not None
+
+        # another process sharing the cache path finds the datasets cached
+        assert all(TSDataSetLoader(cache_path, data_source=self.data_source).dataset_desc.cached(dataset_id)
+                   for dataset_id in dataset_ids)
+        # the md5 of the downloaded files are recorded to the manifest of the data path of the loader
+        desc_file = os.path.join(cache_path, 'dataset_desc.csv')
+        assert md5_util.lookup(desc_file, cache_path) is not None
+
+    def test_prefetch_without_csv(self):
+        cache_path = tempfile.mkdtemp(prefix='tsb-datas-cache')
+        dataloader = TSDataSetLoader(cache_path, data_source=self.data_source)
+        dataset_id = '512754'
+
+        dataloader.prefetch([dataset_id], keep_csv=False)
+        assert not os.path.exists(dataloader.dataset_desc.train_file_path(dataset_id))
+        assert os.path.exists(dataloader.dataset_desc.train_cache_file_path(dataset_id))
+        df_train = dataloader.load_train(dataset_id)
+        assert df_train.shape[0] > 0
+        assert str(df_train[dataloader.load_meta(dataset_id)['date_name']].dtype).startswith('datetime64')
+
+    def test_download_resume(self):
+        cache_path = tempfile.mkdtemp(prefix='tsb-datas-cache')
+        file_name = 'univariate-forecast/small/Air_Passengers.zip'
+        source_file = os.path.join(self.source_path, file_name)
+        file_path = os.path.join(cache_path, 'Air_Passengers.zip')
+
+        # an interrupted download left the first half of the file
+        with open(source_file, 'rb') as f:
+            content = f.read()
+        with open(file_path + '.part', 'wb') as f:
+            f.write(content[:len(content) // 2])
+
+        download_util.download_and_check(file_path, f'{self.data_source}/{file_name}')
+        assert RangeRequestHandler.range_requests == [f'/{file_name}']
+        with open(file_path, 'rb') as f:
+            assert f.read() == content
+        assert not os.path.exists(file_path + '.part')
+
+    def teardown_class(self):
+        self.server.shutdown()
+        shutil.rmtree(self.source_path)
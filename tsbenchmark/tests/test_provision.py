@@ -0,0 +1,114 @@
+import os
+import tarfile
+import tempfile
+
+import pytest
+
+from tsbenchmark.players import PythonEnv
+from tsbenchmark.provision import EnvProvisioner
+from tsbenchmark.tests.players import load_test_player
+
+# a fake conda which records the calls and creates an env with a python executable
+FAKE_CONDA = '''#!/bin/bash
+conda_home="$(cd "$(dirname "$0")/.." && pwd)"
+echo "$@" >> "$conda_home/calls.log"
+for i in "$@"; do
+    case $i in
+        -n)
+            next_is_name=1 ;;
+        *)
+            if [ ! -z "$next_is_name" ];then
+              venv_name=$i
+              next_is_name=
+            fi ;;
+    esac
+done
+mkdir -p "$conda_home/envs/$venv_name/bin"
+touch "$conda_home/envs/$venv_name/bin/python"
+printf '#!/bin/bash\\nexit 0\\n' > "$conda_home/envs/$venv_name/bin/pip"
+chmod +x "$conda_home/envs/$venv_name/bin/pip"
+'''
+
+
+def create_conda_home():
+    conda_home = tempfile.mkdtemp(prefix='tsb-conda')
+    os.makedirs(os.path.join(conda_home, 'bin'))
+    conda_exec = os.path.join(conda_home, 'bin', 'conda')
+    with open(conda_exec, 'w') as f:
+        f.write(FAKE_CONDA)
+    os.chmod(conda_exec, 0o755)
+    return conda_home
+
+
+def read_calls(conda_home):
+    calls_file = os.path.join(conda_home, 'calls.log')
+    if not os.path.exists(calls_file):
+        return []
+    with open(calls_file) as f:
+        return f.read().splitlines()
+
+
+class TestEnvProvisioner:
+
+    def setup_class(self):
+        self.player = load_test_player('plain_player_requirements_txt')
+        self.env_name = self.player.env.venv.env_name
+
+    def test_env_name(self):
+        assert self.player.env.venv.name == 'plain_player_requirements_txt'
+        assert self.env_name == f'plain_player_requirements_txt-{self.player.env.venv.env_hash}'
+        assert len(self.player.env.venv.env_hash) == 8
+
+    def test_provision_once(self):
+        conda_home = create_conda_home()
+        # the envs of the same requirements are built once
+        EnvProvisioner().provision_local([self.player, self.player], conda_home)
+        EnvProvisioner().provision_local([self.player], conda_home)
+
+        assert len(read_calls(conda_home)) == 1
+        assert os.path.exists(os.path.join(conda_home, 'envs', self.env_name, '.tsb-ready'))
+
+    def test_rebuild_incomplete_env(self):
+        conda_home = create_conda_home()
+        os.makedirs(os.path.join(conda_home, 'envs', self.env_name, 'lib'))
+        # left by a broken build
+        open(os.path.join(conda_home, 'envs', f'.{self.env_name}.tsb-building'), 'w').close()
+
+        EnvProvisioner().provision_local([self.player], conda_home)
+        assert len(read_calls(conda_home)) == 1
+        assert not os.path.exists(os.path.join(conda_home, 'envs', self.env_name, 'lib'))
+        assert not os.path.exists(os.path.join(conda_home, 'envs', f'.{self.env_name}.tsb-building'))
+
+    def test_keep_unknown_env(self):
+        conda_home = create_conda_home()
+        os.makedirs(os.path.join(conda_home, 'envs', self.env_name, 'lib'))
+
+        # an env dir not created by the script is not removed
+        with pytest.raises(RuntimeError):
+            EnvProvisioner().provision_local([self.player], conda_home)
+        assert read_calls(conda_home) == []
+        assert os.path.exists(os.path.join(conda_home, 'envs', self.env_name, 'lib'))
+
+    def test_provision_from_pack(self):
+        conda_home = create_conda_home()
+        packs_dir = tempfile.mkdtemp(prefix='tsb-packs')
+        env_dir = tempfile.mkdtemp(prefix='tsb-env')
+        os.makedirs(os.path.join(env_dir, 'bin'))
+        with open(os.path.join(env_dir, 'bin', 'python'), 'w') as f:
+            f.write('')
+        with tarfile.open(os.path.join(packs_dir, f'{self.env_name}.tar.gz'), 'w:gz') as tar:
+            tar.add(os.path.join(env_dir, 'bin'), arcname='bin')
+
+        EnvProvisioner(packs_dir=packs_dir).provision_local([self.player], conda_home)
+        assert read_calls(conda_home) == []
+        assert os.path.exists(os.path.join(conda_home, 'envs', self.env_name, 'bin', 'python'))
+
+    def test_provision_failed(self):
+        conda_home = tempfile.mkdtemp(prefix='tsb-conda')  # without conda executable
+        with pytest.raises(RuntimeError):
+            EnvProvisioner().provision_local([self.player], conda_home)
+
+    def test_skip_custom_python(self):
+        player = load_test_player('plain_player')
+        assert player.env.venv_kind == PythonEnv.KIND_CUSTOM_PYTHON
+        assert EnvProvisioner.distinct_envs([player, self.player]) == {self.env_name: self.player}
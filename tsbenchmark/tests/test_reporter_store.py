@@ -0,0 +1,270 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tsbenchmark.benchmark import BenchmarkTask
+from tsbenchmark.reporter import CompareReporter, Painter, PredictionStore, ReportAggregator, Reporter, ResultStore, \
+    RunningAggregator, default_title_text
+from tsbenchmark.tasks import TSTask
+from tsbenchmark.tests import copy_test_datas
+from tsbenchmark.tests.players import load_test_player
+from tsbenchmark.tsloader import TSTaskLoader
+from tsbenchmark.util import payload_util
+
+data_path = copy_test_datas()
+
+
+def create_result(player, dataset, task='univariate-forecast', **metrics):
+    return {'task_id': '1', 'round_no': 1, 'player': player, 'dataset': dataset, 'shape': '(100, 2)',
+            'data_size': 'small', 'task': task, 'horizon': 6, 'reward_metric': 'smape', 'duration': 1.5,
+            'random_state': 8086, 'key_params': '', 'best_params': '', 'metrics': metrics}
+
+
+class TestResultStore:
+
+    def test_append_query(self):
+        store = ResultStore(os.path.join(tempfile.mkdtemp(prefix='tsb-results'), 'results.db'), buffer_size=2)
+        store.append(create_result('navie', 'Air_Passengers', smape=0.1, mae=1.0))
+        assert ResultStore(store.db_path).query().shape[0] == 0  # buffered
+        store.append(create_result('snavie', 'Air_Passengers', smape=0.2, mae=np.nan))
+        assert ResultStore(store.db_path).query().shape[0] == 2
+
+        # a new metric adds a column
+        store.append(create_result('navie', 'nn5_weekly', task='multivariate-forecast', smape=0.3, rmse=2.0))
+        assert store.metrics() == ['smape', 'mae', 'rmse']
+
+        df = store.query(task='univariate-forecast')
+        assert df['player'].tolist() == ['navie', 'snavie']
+        assert df['smape'].dtype == np.float64
+        assert np.isnan(df['mae'][1]) and np.isnan(df['rmse'][0])
+        assert df['horizon'].tolist() == [6, 6]
+
+        assert store.query(player=['navie', 'other'])['dataset'].tolist() == ['Air_Passengers', 'nn5_weekly']
+
+    def test_metric_names(self):
+        store = ResultStore(os.path.join(tempfile.mkdtemp(prefix='tsb-results'), 'results.db'))
+        store.append(create_result('navie', 'Air_Passengers', mae=1.0, Duration=9.0, **{'a"b': 2.0}))
+        store.append(create_result('snavie', 'Air_Passengers', MAE=3.0))
+
+        # a metric named like a base column does not overwrite it, the case variants share a column
+        assert store.metrics() == ['mae', 'metric_Duration']
+        df = store.query()
+        assert df['duration'].tolist() == [1.5, 1.5]
+        assert df['metric_Duration'][0] == 9.0
+        assert df['mae'].tolist() == [1.0, 3.0]
+
+
+class TestPredictionStore:
+
+    def test_save_load(self):
+        store = PredictionStore(tempfile.mkdtemp(prefix='tsb-predictions'))
+        y_predict = pd.DataFrame({'Var_1': [1.0, 2.0, np.nan], 'Var_2': [4.0, 5.0, 6.0]})
+        y_real = pd.DataFrame({'Var_1': [1.5, 2.5, 3.5], 'Var_2': [4.5, 5.5, 6.5]}, index=[10, 11, 12])
+
+        assert not store.exists('player_512754_8086')
+        store.save('player_512754_8086', y_predict=y_predict, y_real=y_real)
+        assert store.exists('player_512754_8086')
+
+        values = store.load('player_512754_8086')
+        pd.testing.assert_frame_equal(values['y_predict'], y_predict)
+        pd.testing.assert_frame_equal(values['y_real'], y_real.reset_index(drop=True))
+
+    def test_save_predict_only(self):
+        store = PredictionStore(tempfile.mkdtemp(prefix='tsb-predictions'))
+        store.save('player_512754_8086', y_predict=pd.DataFrame({'Var_1': [1.0, 2.0]}))
+        assert list(store.load('player_512754_8086').keys()) == ['y_predict']
+
+
+class TestReporter:
+
+    def test_save_results(self):
+        benchmark_config = {'report.path': tempfile.mkdtemp(prefix='tsb-report'), 'name': 'report_local',
+                            'random_states': [8086], 'task_filter.tasks': ['univariate-forecast']}
+        reporter = Reporter(benchmark_config)
+        ts_task = TSTask(TSTaskLoader(data_path).load('512754'), random_state=8086)
+        bm_task = BenchmarkTask(ts_task, load_test_player('plain_navie_player'))
+        y_predict = pd.DataFrame({'Passengers': [1.0, 2.0]})
+
+        reporter.save_results({'metrics': {'smape': 0.1, 'mape': 0.2, 'rmse': 0.3, 'mae': 0.4}, 'duration': 1.5,
+                               'y_predict': payload_util.encode(y_predict), 'key_params': '', 'best_params': ''},
+                              bm_task)
+
+        df_summary = pd.read_csv(reporter.path_maintainer.live_summary_file('univariate-forecast'))
+        assert df_summary.loc[df_summary['metric'] == 'smape', 'mean'].tolist() == [0.1]
+
+        # the live summary of a new reporter continues with the saved results
+        reporter = Reporter(benchmark_config)
+        reporter.save_results({'metrics': {'smape': 0.3}, 'duration': 2.5, 'key_params': '', 'best_params': ''},
+                              bm_task)
+        df_summary = pd.read_csv(reporter.path_maintainer.live_summary_file('univariate-forecast'))
+        assert df_summary.loc[df_summary['metric'] == 'smape', ['count', 'mean']].values.tolist() == [[2, 0.2]]
+
+        df = reporter.result_store.query(player=bm_task.player.name)[:1]
+        assert df[['smape', 'mape', 'rmse', 'mae']].values.tolist() == [[0.1, 0.2, 0.3, 0.4]]
+        assert df['task_id'][0] == '512754'
+        values = reporter.prediction_store('univariate-forecast').load(bm_task.id)
+        pd.testing.assert_frame_equal(values['y_predict'], y_predict)
+
+        aggregator = ReportAggregator.from_results(df, reporter.result_store.metrics())
+        df_report = aggregator.table('smape', 'mean', [bm_task.player.name])
+        assert df_report.columns.tolist() == ReportAggregator.COLUMNS + [bm_task.player.name]
+        assert df_report[bm_task.player.name].tolist() == [0.1]
+
+
+class TestReportAggregator:
+
+    def setup_class(self):
+        self.results_datas = {}
+        for player, offset in [('navie', 0.0), ('hyperts_dl', -0.05), ('hyperts_stat', 0.1)]:
+            for dataset in ['Air_Passengers', 'nn5_weekly']:
+                self.results_datas[f'{dataset}_{player}_univariate-forecast'] = {
+                    'dataset': dataset, 'player': player, 'shape': '(100, 2)', 'data_size': 'small',
+                    'task': 'univariate-forecast', 'horizon': 6, 'duration': [1.0 + offset, 2.0, 4.0],
+                    'smape': [0.1 + offset, 0.2 + offset, 0.6 + offset]}
+        self.players = ['navie', 'hyperts_dl', 'hyperts_stat']
+
+    def test_table(self):
+        aggregator = ReportAggregator.from_results_datas(self.results_datas)
+        aggregator.aggregate(['mean', 'std', 'max', 'min'])
+
+        # values of each player, the same for both datasets
+        expected = {('smape', 'mean'): [0.3, 0.25, 0.4],
+                    ('smape', 'std'): [np.std([0.1, 0.2, 0.6])] * 3,
+                    ('smape', 'max'): [0.6, 0.55, 0.7],
+                    ('smape', 'min'): [0.1, 0.05, 0.2],
+                    ('duration', 'mean'): [7.0 / 3, 6.95 / 3, 7.1 / 3],
+                    ('duration', 'std'): [np.std([1.0, 2.0, 4.0]), np.std([0.95, 2.0, 4.0]), np.std([1.1, 2.0, 4.0])],
+                    ('duration', 'max'): [4.0, 4.0, 4.0],
+                    ('duration', 'min'): [1.0, 0.95, 1.1]}
+        for (metric, stat_type), values in expected.items():
+            df = aggregator.table(metric, stat_type, self.players)
+            assert df.columns.tolist() == ReportAggregator.COLUMNS + self.players
+            assert df['dataset'].tolist() == ['Air_Passengers', 'nn5_weekly']
+            assert df['horizon'].tolist() == [6, 6]
+            assert df[self.players].values.tolist() == [pytest.approx(values), pytest.approx(values)]
+
+    def test_extra_stats(self):
+        aggregator = ReportAggregator.from_results_datas(self.results_datas)
+        aggregator.aggregate(['median', 'q75', 'rank'])
+
+        assert aggregator.table('smape', 'median', self.players)['navie'].tolist() == pytest.approx([0.2, 0.2])
+        assert aggregator.table('smape', 'q75', self.players)['navie'].tolist() == pytest.approx([0.4, 0.4])
+        assert aggregator.table('smape', 'rank', self.players).loc[0, self.players].tolist() == [2, 1, 3]
+        # stats not aggregated yet are computed on demand
+        assert aggregator.table('smape', 'mean', ['navie'])['navie'].tolist() == pytest.approx([0.3, 0.3])
+
+
+class TestRunningAggregator:
+
+    def test_table(self):
+        results = [create_result(player, dataset, smape=smape)
+                   for player, dataset, smape in [('navie', 'Air_Passengers', 0.1), ('navie', 'Air_Passengers', 0.3),
+                                                  ('snavie', 'Air_Passengers', 0.2), ('navie', 'nn5_weekly', np.nan),
+                                                  ('snavie', 'nn5_weekly', 0.4)]]
+        running_aggregator = RunningAggregator()
+        for result in results:
+            running_aggregator.update(result)
+
+        df_results = pd.DataFrame([dict(r, **r['metrics']) for r in results]).drop(columns=['metrics'])
+        aggregator = ReportAggregator.from_results(df_results, ['smape'])
+        players = ['navie', 'snavie']
+        for metric in ['smape', 'duration']:
+            for stat in ['mean', 'std', 'min', 'max']:
+                df = running_aggregator.table(metric, stat, players)
+                df_expected = aggregator.table(metric, stat, players)
+                assert df[ReportAggregator.COLUMNS].values.tolist() == \
+                       df_expected[ReportAggregator.COLUMNS].values.tolist()
+                assert np.allclose(df[players].values.astype(float), df_expected[players].values.astype(float),
+                                   equal_nan=True)
+
+        df_summary = running_aggregator.to_frame()
+        assert df_summary.shape[0] == 7
+        assert df_summary.columns.tolist() == ['metric'] + ReportAggregator.COLUMNS + ['player'] + \
+               RunningAggregator.STATS
+
+
+class TestPainter:
+
+    def test_render(self):
+        report_dir = tempfile.mkdtemp(prefix='tsb-report')
+        csv_path = os.path.join(report_dir, 'report_smape_mean.csv')
+        png_path = os.path.join(report_dir, 'report_smape_mean.png')
+        pd.DataFrame({'dataset': ['Air_Passengers'], 'shape': ['(100, 2)'], 'horizon': [6],
+                      'navie': [0.1]}).to_csv(csv_path, index=False)
+
+        painter = Painter(enable=False)
+        painter.submit(csv_path, png_path, title_cols=ReportAggregator.COLUMNS, title_text='SMAPE mean scores')
+        painter.render()
+        assert not os.path.exists(png_path)
+
+        painter = Painter(n_workers=1)
+        painter.submit(csv_path, png_path, title_cols=ReportAggregator.COLUMNS, title_text='SMAPE mean scores')
+        painter.render()
+        mtime = os.path.getmtime(png_path)
+
+        # the figure is not rendered again if the csv is not changed
+        painter.submit(csv_path, png_path, title_cols=ReportAggregator.COLUMNS, title_text='SMAPE mean scores')
+        painter.render()
+        assert os.path.getmtime(png_path) == mtime
+
+    def test_render_pool(self):
+        report_dir = tempfile.mkdtemp(prefix='tsb-report')
+        painter = Painter(n_workers=2)
+        png_paths = []
+        for metric in ['smape', 'mae']:
+            csv_path = os.path.join(report_dir, f'report_{metric}_mean.csv')
+            png_paths.append(os.path.join(report_dir, f'report_{metric}_mean.png'))
+            pd.DataFrame({'dataset': ['Air_Passengers'], 'shape': ['(100, 2)'], 'horizon': [6],
+                          'navie': [0.1]}).to_csv(csv_path, index=False)
+            painter.submit(csv_path, png_paths[-1], title_cols=ReportAggregator.COLUMNS,
+                           title_text=default_title_text(os.path.basename(csv_path)))
+        painter.render()
+        assert all(os.path.exists(png_path) for png_path in png_paths)
+
+    def test_render_in_process_backend(self):
+        import matplotlib
+        import matplotlib.pyplot as plt
+        backend = matplotlib.get_backend()
+        plt.switch_backend('pdf')
+        try:
+            self.test_render()
+            assert matplotlib.get_backend().lower() == 'agg'
+        finally:
+            plt.switch_backend(backend)
+
+    def test_default_title_text(self):
+        assert default_title_text('report_smape_mean.csv') == 'SMAPE mean scores '
+        assert default_title_text('report_duration_max.csv') == 'MAX duration'
+
+
+class TestCompareReporter:
+
+    def test_run_compare(self):
+        report_paths = []
+        for i in range(3):
+            report_path = os.path.join(tempfile.mkdtemp(prefix='tsb-report'), f'nightly_{i}')
+            report_dir = os.path.join(report_path, 'univariate-forecast', 'report')
+            os.makedirs(os.path.join(report_dir, 'imgs'))
+            datasets = ['Air_Passengers', 'nn5_weekly'][i % 2:]
+            pd.DataFrame({'dataset': datasets, 'shape': '(100, 2)', 'horizon': 6,
+                          'navie': [0.1 * i] * len(datasets), 'hyperts_dl': [0.2 * i] * len(datasets)}) \
+                .to_csv(os.path.join(report_dir, 'report_smape_mean.csv'), index=False)
+            report_paths.append(report_path)
+
+        config_dict = {'name': 'compare', 'report_paths': report_paths, 'players': ['hyperts_dl'],
+                       'tasks': ['univariate-forecast'],
+                       'report': {'path': tempfile.mkdtemp(prefix='tsb-compare'), 'figures': False}}
+        reporter = CompareReporter(config_dict)
+        assert reporter.load_reports('univariate-forecast').shape[0] == 10
+        reporter.run_compare()
+
+        df = pd.read_csv(os.path.join(reporter.compare_player_dir('univariate-forecast', 'hyperts_dl'),
+                                      'report_smape_mean.csv'))
+        assert df.columns.tolist() == ReportAggregator.COLUMNS + ['nightly_0', 'nightly_1', 'nightly_2']
+        assert df['dataset'].tolist() == ['Air_Passengers', 'nn5_weekly']
+        assert np.allclose(df[['nightly_0', 'nightly_1', 'nightly_2']].values,
+                           [[0.0, np.nan, 0.4], [0.0, 0.2, 0.4]], equal_nan=True)
+        assert not os.path.exists(os.path.join(config_dict['report']['path'], 'compare', 'univariate-forecast', 'navie'))
@@ -0,0 +1,68 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tsbenchmark.server import TaskScorer
+from tsbenchmark.tasks import TSTask
+from tsbenchmark.tests import copy_test_datas
+from tsbenchmark.tsloader import TSTaskLoader
+from tsbenchmark.util import payload_util
+
+data_path = copy_test_datas()
+
+
+class TestTaskScorer:
+
+    def setup_class(self):
+        self.ts_task = TSTask(TSTaskLoader(data_path).load('512754'), random_state=8086)
+        self.scorer = TaskScorer()
+
+    def test_score(self):
+        y_real, metadata = self.scorer.get_test(self.ts_task)
+        y_pred = y_real[metadata['series_name']] + 1
+        report_data = {'duration': 1, 'y_predict': payload_util.encode(y_pred)}
+
+        scored = self.scorer.score(self.ts_task, report_data)
+        assert 'metrics' not in report_data
+        assert scored['metrics']['mae'] == pytest.approx(1)
+        assert scored['metrics']['rmse'] == pytest.approx(1)
+        assert self.scorer.get_test(self.ts_task)[0] is y_real
+
+    def test_score_rows_mismatch(self):
+        y_real, metadata = self.scorer.get_test(self.ts_task)
+        report_data = {'y_predict': payload_util.encode(y_real[metadata['series_name']][1:])}
+        with pytest.raises(ValueError):
+            self.scorer.score(self.ts_task, report_data)
+
+    def test_score_missing_series(self):
+        y_real, metadata = self.scorer.get_test(self.ts_task)
+        y_pred = y_real[metadata['series_name']].rename(columns=lambda col: f'{col}_pred')
+        report_data = {'y_predict': payload_util.encode(y_pred)}
+        with pytest.raises(ValueError):
+            self.scorer.score(self.ts_task, report_data)
+
+    def test_score_corrupt_payload(self):
+        y_real, metadata = self.scorer.get_test(self.ts_task)
+        payload = payload_util.encode(y_real[metadata['series_name']])
+        data = base64.b64decode(payload['data'])
+        payload['data'] = base64.b64encode(data[:len(data) // 2]).decode('ascii')
+        with pytest.raises(ValueError):
+            self.scorer.score(self.ts_task, {'y_predict': payload})
+
+    def test_get_test_in_threads(self):
+        scorer = TaskScorer()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            tests = list(executor.map(lambda _: scorer.get_test(self.ts_task)[0], range(4)))
+        assert all(test is tests[0] for test in tests)
+
+    def test_evict_least_recently_used(self):
+        scorer = TaskScorer(max_tests=1)
+        ts_task_other = TSTask(TSTaskLoader(data_path).load('61807'), random_state=8086)
+        y_real, _ = scorer.get_test(self.ts_task)
+        assert scorer.get_test(self.ts_task)[0] is y_real
+
+        scorer.get_test(ts_task_other)
+        assert list(scorer._tests.keys()) == [ts_task_other.id]
+        scorer.get_test(self.ts_task)
+        assert list(scorer._tests.keys()) == [self.ts_task.id]
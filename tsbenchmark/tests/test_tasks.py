@@ -1,6 +1,26 @@
 from tsbenchmark.tasks import get_task_config
+from tsbenchmark.tests import copy_test_datas
 
 
 def test_get_task_config():
     tc = get_task_config(512754)
     assert tc.id == 512754
+
+
+def test_get_task_configs():
+    from tsbenchmark.tasks import _get_task_load, get_task_configs, list_task_configs
+    data_path = copy_test_datas()
+    task_ids = list_task_configs(ids=[61807, '512754'], cache_path=data_path)
+    assert sorted(task_ids) == ['512754', '61807']
+
+    task_configs = get_task_configs(task_ids, cache_path=data_path)
+    assert [tc.id for tc in task_configs] == task_ids
+    # the configs share one loader
+    assert all(tc.taskdata.taskdata_loader is _get_task_load(data_path).taskdata_loader for tc in task_configs)
+
+
+def test_task_server_metrics():
+    from tsbenchmark.tasks import TSTask
+    tc = get_task_config(512754, cache_path=copy_test_datas())
+    assert TSTask(tc, random_state=None).server_metrics is False
+    assert TSTask(tc, random_state=None, server_metrics=True).server_metrics is True
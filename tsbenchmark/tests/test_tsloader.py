@@ -1,9 +1,13 @@
 import os
+import time
+
+import pandas as pd
 import tsbenchmark
-from tsbenchmark.tsloader import TSDataSetLoader, TSTaskLoader
+from tsbenchmark.tsloader import TSDataSetLoader, TSTaskLoader, TSDataSetCatalog
 from tsbenchmark.tasks import TSTask
+from tsbenchmark.tests import copy_test_datas
 
-data_path = os.path.join(os.path.dirname(tsbenchmark.__file__),'tests','datas')
+data_path = copy_test_datas()
 dataloader = tsbenchmark.tsloader.TSDataSetLoader(data_path)
 
 
@@ -32,6 +36,67 @@ class Test_TSDataSetLoader():
         dataloader.load_train(512754)
         dataloader.load_train(61807)
 
+    def test_load_from_cache(self):
+        df_train = dataloader.load_train(512754)
+        assert os.path.exists(dataloader.dataset_desc.train_cache_file_path(512754))
+        assert str(df_train['month'].dtype).startswith('datetime64')
+
+        df_train_cached = dataloader.load_train(512754)
+        assert df_train_cached.equals(df_train)
+
+    def test_load_memory_map(self):
+        mmap_dataloader = TSDataSetLoader(data_path, memory_map=True)
+        df_train = mmap_dataloader.load_train(61807)
+        df_train_cached = dataloader.load_train(61807)
+        assert df_train.equals(df_train_cached)
+        assert not df_train[df_train.columns[1]].values.flags.writeable
+
+
+    def test_ready_scales(self):
+        metadata = dataloader.ready(61807)
+        assert metadata['season'] == 52
+        assert set(metadata['scales'].keys()) == set(metadata['series_name'])
+        df_train = dataloader.load_train(61807)
+        assert metadata['scales']['T1']['last'] == df_train['T1'].values[-1]
+
+
+    def test_load_while_replaced(self):
+        import threading
+        from tsbenchmark.util import file_util
+
+        loader = TSDataSetLoader(copy_test_datas())
+        dataset_dir = os.path.dirname(loader.dataset_desc.train_file_path(512754))
+        locked = threading.Event()
+
+        def replace():
+            # the first rename of file_util._replace, the dataset dir is missing until the lock is released
+            with file_util.lock(loader._dataset_lock_path(512754)):
+                os.replace(dataset_dir, dataset_dir + '.old')
+                locked.set()
+                time.sleep(0.5)
+                os.replace(dataset_dir + '.old', dataset_dir)
+
+        thread = threading.Thread(target=replace)
+        thread.start()
+        assert locked.wait(10)
+        assert loader.load_train(512754).shape[0] == 124
+        thread.join()
+
+
+class Test_TSDataSetCatalog():
+    def test_lookup(self):
+        catalog = TSDataSetCatalog.load(os.path.join(data_path, 'dataset_desc.csv'))
+        assert 512754 in catalog and 9527 not in catalog
+        assert catalog.get('512754')['name'] == 'Air_Passengers'
+        assert len(catalog.ids(type='univariate-forecast', data_size=['small', 'medium'])) == 6
+        assert catalog.ids(data_size='medium') == ['62431', '529812']
+
+    def test_persisted(self):
+        desc_file = os.path.join(data_path, 'dataset_desc.csv')
+        TSDataSetCatalog.load(desc_file)
+        assert os.path.exists(os.path.join(data_path, 'dataset_desc.pkl'))
+        assert TSDataSetCatalog.load(desc_file).df.equals(pd.read_csv(desc_file, dtype={'id': str}))
+
 
 taskdataloader = tsbenchmark.tsloader.TSTaskDataLoader(data_path)
 
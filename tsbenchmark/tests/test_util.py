@@ -0,0 +1,111 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tsbenchmark.util import file_util, md5_util, payload_util
+
+
+class Test_md5_util():
+    def test_get_md5(self):
+        cache_path = tempfile.mkdtemp(prefix='tsb-md5')
+        os.makedirs(os.path.join(cache_path, 'univariate-forecast'))
+        file_path = os.path.join(cache_path, 'univariate-forecast', 'data.bin')
+        content = os.urandom(md5_util.CHUNK_SIZE * 2 + 7)
+        with open(file_path, 'wb') as f:
+            f.write(content)
+
+        assert md5_util.lookup(file_path, cache_path) is None
+        assert md5_util.get_md5(file_path, cache_path) == hashlib.md5(content).hexdigest()
+        assert md5_util.lookup(file_path, cache_path) == hashlib.md5(content).hexdigest()
+
+        # the recorded md5 is invalid after the file changed
+        with open(file_path, 'ab') as f:
+            f.write(b'0')
+        assert md5_util.lookup(file_path, cache_path) is None
+        assert md5_util.get_md5(file_path, cache_path) == hashlib.md5(content + b'0').hexdigest()
+        # the manifest is kept in the cache root only
+        assert os.listdir(os.path.dirname(file_path)) == ['data.bin']
+        assert os.path.exists(os.path.join(cache_path, md5_util.MANIFEST_FILE_NAME))
+
+    def test_get_md5_not_recorded(self):
+        file_path = os.path.join(tempfile.mkdtemp(prefix='tsb-md5'), 'requirements.txt')
+        with open(file_path, 'w') as f:
+            f.write('numpy\n')
+
+        # files without a cache root or out of it are not recorded
+        for cache_root in [None, tempfile.mkdtemp(prefix='tsb-md5')]:
+            assert md5_util.get_md5(file_path, cache_root) == hashlib.md5(b'numpy\n').hexdigest()
+            assert md5_util.lookup(file_path, cache_root) is None
+            assert os.listdir(os.path.dirname(file_path)) == ['requirements.txt']
+
+    def test_check_md5sum_onefile(self):
+        dir_path = tempfile.mkdtemp(prefix='tsb-md5')
+        file_path = os.path.join(dir_path, 'data.csv')
+        with open(file_path, 'w') as f:
+            f.write('a,b\n1,2\n')
+        with open(os.path.join(dir_path, '.md5sum'), 'w') as f:
+            f.write(f'{md5_util.get_md5(file_path)}  data.csv\n')
+
+        assert md5_util.check_md5sum_onefile(file_path)
+        assert not md5_util.check_md5sum_onefile(file_path, 'other.csv')
+
+
+class Test_file_util():
+    def _make_zip(self):
+        zip_path = os.path.join(tempfile.mkdtemp(prefix='tsb-zip'), 'data.zip')
+        with zipfile.ZipFile(zip_path, 'w') as z:
+            z.writestr('data/train.csv', 'a,b\n1,2\n')
+            z.writestr('data/test.csv', 'a,b\n3,4\n')
+            z.writestr('data/.md5sum', '')
+        return zip_path
+
+    def test_unzip(self):
+        zip_path = self._make_zip()
+        unzip_path = tempfile.mkdtemp(prefix='tsb-unzip')
+        os.makedirs(os.path.join(unzip_path, 'data'))
+        with open(os.path.join(unzip_path, 'data', 'old.csv'), 'w') as f:
+            f.write('')
+
+        file_util.unzip(zip_path, unzip_path)
+        assert sorted(os.listdir(unzip_path)) == ['data']
+        assert sorted(os.listdir(os.path.join(unzip_path, 'data'))) == ['.md5sum', 'test.csv', 'train.csv']
+        with open(os.path.join(unzip_path, 'data', 'train.csv')) as f:
+            assert f.read() == 'a,b\n1,2\n'
+
+    def test_unzip_members(self):
+        unzip_path = tempfile.mkdtemp(prefix='tsb-unzip')
+        converted = []
+
+        def csv_converter(file_obj, save_path):
+            converted.append(os.path.basename(save_path))
+            assert file_obj.read() == b'a,b\n1,2\n'
+
+        file_util.unzip(self._make_zip(), unzip_path, members=['train.csv', '.md5sum'], csv_converter=csv_converter)
+        assert converted == ['train.csv']
+        assert os.listdir(os.path.join(unzip_path, 'data')) == ['.md5sum']
+
+    def test_unzip_not_exists(self):
+        with pytest.raises(FileNotFoundError):
+            file_util.unzip('not_exists.zip', tempfile.mkdtemp(prefix='tsb-unzip'))
+
+
+class Test_payload_util():
+    def test_encode_decode(self):
+        df = pd.DataFrame({'a': [1.5, np.nan, 3.0], 'b': [4.0, 5.0, 6.0]})
+        payload = payload_util.encode(df)
+        assert payload['format'] == payload_util.FORMAT_NPZ
+        pd.testing.assert_frame_equal(payload_util.decode(payload), df)
+
+        df_float32 = payload_util.decode(payload_util.encode(df, float32=True))
+        assert df_float32.dtypes.tolist() == [np.float32, np.float32]
+        pd.testing.assert_frame_equal(df_float32, df, check_dtype=False)
+
+    def test_decode_records(self):
+        df = pd.DataFrame({'a': [1.5, 2.0], 'b': [4.0, 5.0]})
+        payload = df.to_json(orient='records')[1:-1].replace('},{', '} {')
+        pd.testing.assert_frame_equal(payload_util.decode(payload), df)
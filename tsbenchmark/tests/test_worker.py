@@ -0,0 +1,126 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from tsbenchmark.worker import WarmWorkerPool
+
+PACKAGE_DIR = Path(__file__).parent.parent.parent.as_posix()
+
+EXEC_PY = '''import os
+import sys
+import time
+
+LOADED_PID = os.getpid()
+
+
+def main():
+    if os.environ.get('TSB_TEST_FAIL') is not None:
+        raise RuntimeError('failed')
+    if os.environ.get('TSB_TEST_SLEEP') is not None:
+        with open('pid.txt', 'w') as f:
+            f.write(str(os.getpid()))
+        time.sleep(int(os.environ['TSB_TEST_SLEEP']))
+    print(f"{os.environ['TSB_TEST_VALUE']} {LOADED_PID != os.getpid()}")
+    with open('result.txt', 'w') as f:
+        f.write(os.environ['TSB_TEST_VALUE'])
+
+
+if __name__ == '__main__':
+    main()
+'''
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="warm worker requires fork")
+class TestWarmWorkerPool:
+
+    def setup_class(self):
+        self.player_dir = tempfile.mkdtemp(prefix='tsb-player')
+        self.python_script = os.path.join(self.player_dir, 'exec.py')
+        with open(self.python_script, 'w') as f:
+            f.write(EXEC_PY)
+        self.pool = WarmWorkerPool()
+        self.socket_path = self.pool.start('test_player', sys.executable, self.python_script, preload=['json'])
+
+    def start_job(self, socket_path, **envs):
+        working_dir = tempfile.mkdtemp(prefix='tsb-job')
+        env = os.environ.copy()
+        env['PYTHONPATH'] = PACKAGE_DIR
+        env.update(envs)
+        process = subprocess.Popen([sys.executable, '-m', 'tsbenchmark.worker', 'connect', f'--socket={socket_path}',
+                                    f'--python-script={self.python_script}'],
+                                   env=env, cwd=working_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return process, working_dir
+
+    def run_job(self, socket_path, **envs):
+        process, working_dir = self.start_job(socket_path, **envs)
+        stdout, stderr = process.communicate()
+        return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr), working_dir
+
+    @staticmethod
+    def wait_job_pid(working_dir, timeout=30):
+        pid_file = os.path.join(working_dir, 'pid.txt')
+        start_at = time.time()
+        while not os.path.exists(pid_file) or os.path.getsize(pid_file) == 0:
+            assert time.time() - start_at < timeout
+            time.sleep(0.1)
+        with open(pid_file) as f:
+            return int(f.read())
+
+    @staticmethod
+    def process_alive(pid, timeout=10):
+        # the job is not a child of the test, so it is gone once it does not exist
+        start_at = time.time()
+        while time.time() - start_at < timeout:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def test_run_job(self):
+        for value in ['job1', 'job2']:
+            process, working_dir = self.run_job(self.socket_path, TSB_TEST_VALUE=value)
+            assert process.returncode == 0
+            # the job runs in a forked child of the worker with the environments of the job
+            assert process.stdout.decode().strip() == f'{value} True'
+            with open(os.path.join(working_dir, 'result.txt')) as f:
+                assert f.read() == value
+
+    def test_run_failed_job(self):
+        process, _ = self.run_job(self.socket_path, TSB_TEST_VALUE='job', TSB_TEST_FAIL='1')
+        assert process.returncode == 1
+        assert 'RuntimeError' in process.stderr.decode()
+
+    def test_worker_not_available(self):
+        process, working_dir = self.run_job(os.path.join(self.pool.socket_dir, 'not_exists.sock'),
+                                            TSB_TEST_VALUE='cold')
+        assert process.returncode == 0
+        assert process.stdout.decode().strip() == 'cold False'
+
+    def test_kill_client(self):
+        process, working_dir = self.start_job(self.socket_path, TSB_TEST_VALUE='job', TSB_TEST_SLEEP='600')
+        job_pid = self.wait_job_pid(working_dir)
+        assert job_pid != process.pid
+        # e.g. the job is timed out and killed by the scheduler
+        process.kill()
+        process.wait()
+        assert not self.process_alive(job_pid)
+
+    def test_stop_with_running_job(self):
+        pool = WarmWorkerPool()
+        socket_path = pool.start('test_player', sys.executable, self.python_script)
+        process, working_dir = self.start_job(socket_path, TSB_TEST_VALUE='job', TSB_TEST_SLEEP='600')
+        job_pid = self.wait_job_pid(working_dir)
+        pool.stop()
+        assert not self.process_alive(job_pid)
+        process.wait(timeout=10)
+
+    def teardown_class(self):
+        self.pool.stop()
+        assert not os.path.exists(self.socket_path)
@@ -1,12 +1,13 @@
 from tsbenchmark.core.loader import DataSetLoader, TaskLoader
 from tsbenchmark.datasets import TSDataset, TSTaskData
+import json
 import os
 from hypernets.utils import logging
 import pandas as pd
 import yaml
 from tsbenchmark.tasks import TSTaskConfig
 from tsbenchmark.util import download_util, file_util, df_util, md5_util
-from tsbenchmark import consts
+from tsbenchmark import consts, metrics
 
 logging.set_level('DEBUG')  # TODO
 logger = logging.getLogger(__name__)
@@ -16,31 +17,136 @@ logger = logging.getLogger(__name__)
 # DESC_URL = f'{BASE_URL}/dataset_desc.csv'
 
 
+class TSDataSetCatalog:
+    '''Id-keyed catalog of the datasets in a dataset desc file.
+
+    Lookups by dataset id are O(1), and the ids are indexed by task and data_size. The parsed desc is persisted
+    as a pickle file next to the csv and reused by other processes until the csv changes.
+    '''
+
+    def __init__(self, df):
+        self.df = df
+        self._ids = list(df['id'].values)
+        self._records = dict(zip(self._ids, df.to_dict('records')))
+        self._task_index = self._build_index('task')
+        self._data_size_index = self._build_index('data_size')
+
+    @staticmethod
+    def _cache_file(desc_file):
+        return os.path.splitext(desc_file)[0] + '.pkl'
+
+    @staticmethod
+    def load(desc_file):
+        cache_file = TSDataSetCatalog._cache_file(desc_file)
+        if os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(desc_file):
+            return TSDataSetCatalog(pd.read_pickle(cache_file))
+        df = pd.read_csv(desc_file)
+        df['id'] = df['id'].astype(str)
+        df_util.to_pickle(df, cache_file)
+        return TSDataSetCatalog(df)
+
+    def save(self, desc_file):
+        with file_util.atomic_write(desc_file) as file_tmp:
+            self.df.to_csv(file_tmp, index=False)
+        df_util.to_pickle(self.df, self._cache_file(desc_file))
+
+    def _build_index(self, key):
+        index = {}
+        for dataset_id, value in zip(self._ids, self.df[key].values):
+            index.setdefault(value, set()).add(dataset_id)
+        return index
+
+    @staticmethod
+    def _lookup(index, values):
+        if values is None:
+            return None
+        if not isinstance(values, list):
+            values = [values]
+        return set().union(*[index.get(v, set()) for v in values])
+
+    def __contains__(self, dataset_id):
+        return str(dataset_id) in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, dataset_id):
+        return self._records.get(str(dataset_id))
+
+    def ids(self, type=None, data_size=None):
+        '''Ids of the datasets filtered by task type and data_size, in the order of the desc file.
+        The filter value could be a str or a list of str.
+        '''
+        selected = [s for s in [self._lookup(self._task_index, type),
+                                self._lookup(self._data_size_index, data_size)] if s is not None]
+        if len(selected) == 0:
+            return list(self._ids)
+        selected = set.intersection(*selected)
+        return [i for i in self._ids if i in selected]
+
+
 class TSDataSetDesc:
     def __init__(self, data_path, data_source):
         self.data_path = data_path
 
         if not os.path.exists(self._desc_file()):
-            logger.info('Downloading dataset_desc.csv from remote.')
-            download_util.download_and_check(self._desc_file(), f'{data_source}/dataset_desc.csv')
-            logger.info('Finish download dataset_desc.csv.')
-        self.dataset_desc = pd.read_csv(self._desc_file())
-        self.dataset_desc['id'] = self.dataset_desc['id'].astype(str)
-        self.dataset_desc_local = None
-        if os.path.exists(self._desc_local_file()):
-            self.dataset_desc_local = pd.read_csv(self._desc_local_file())
-            self.dataset_desc_local['id'] = self.dataset_desc_local['id'].astype(str)
+            with file_util.lock(self._desc_file() + '.lock'):
+                if not os.path.exists(self._desc_file()):
+                    logger.info('Downloading dataset_desc.csv from remote.')
+                    download_util.download_and_check(self._desc_file(), f'{data_source}/dataset_desc.csv',
+                                                     cache_root=self.data_path)
+                    logger.info('Finish download dataset_desc.csv.')
+        self.catalog = TSDataSetCatalog.load(self._desc_file())
+        self.catalog_local = None
+        self.reload_local()
+
+    @property
+    def dataset_desc(self):
+        return self.catalog.df
+
+    @property
+    def dataset_desc_local(self):
+        return self.catalog_local.df if self.catalog_local is not None else None
 
     def exists(self, dataset_id):
-        return self.dataset_desc[self.dataset_desc['id'] == str(dataset_id)].shape[0] == 1
+        return dataset_id in self.catalog
 
     def cached(self, dataset_id):
-        return self.dataset_desc_local is not None and \
-               self.dataset_desc_local[self.dataset_desc_local['id'] == str(dataset_id)].shape[0] == 1
+        return self.catalog_local is not None and dataset_id in self.catalog_local
 
-    def update_local(self, dataset_id):
-        df = pd.read_csv(self._desc_file())
-        df[df['id'] == str(dataset_id)].to_csv(self._desc_local_file(), index=False, mode='a')
+    def reload_local(self):
+        if os.path.exists(self._desc_local_file()):
+            self.catalog_local = TSDataSetCatalog.load(self._desc_local_file())
+
+    def update_local(self, dataset_id, **columns):
+        '''Record the dataset as cached, with the extra columns computed when it is cached, e.g. the scales.'''
+        with file_util.lock(self._desc_local_file() + '.lock'):
+            # other processes may have updated it
+            self.reload_local()
+            if self.cached(dataset_id):
+                return
+            meta = self.dataset_desc[self.dataset_desc['id'] == str(dataset_id)].copy()
+            for name, value in columns.items():
+                meta[name] = value
+            if self.dataset_desc_local is not None:
+                df = pd.concat([self.dataset_desc_local, meta], axis=0)
+            else:
+                df = meta.copy()
+            self.catalog_local = TSDataSetCatalog(df)
+            self.catalog_local.save(self._desc_local_file())
+
+    def update_local_columns(self, dataset_id, **columns):
+        '''Set the columns of a cached dataset, e.g. the scales of the datasets cached by the former versions.'''
+        with file_util.lock(self._desc_local_file() + '.lock'):
+            self.reload_local()
+            df = self.dataset_desc_local.copy()
+            for name, value in columns.items():
+                if name not in df.columns:
+                    df[name] = None
+                df[name] = df[name].astype(object)
+                df.loc[df['id'] == str(dataset_id), name] = value
+            self.catalog_local = TSDataSetCatalog(df)
+            self.catalog_local.save(self._desc_local_file())
 
     def _desc_file(self):
         return os.path.join(self.data_path, 'dataset_desc.csv')
@@ -57,21 +163,31 @@ class TSDataSetDesc:
     def test_file_path(self, dataset_id):
         return os.path.join(self.dataset_path_local(dataset_id), 'test.csv')
 
+    def train_cache_file_path(self, dataset_id):
+        return os.path.join(self.dataset_path_local(dataset_id), 'train.feather')
+
+    def test_cache_file_path(self, dataset_id):
+        return os.path.join(self.dataset_path_local(dataset_id), 'test.feather')
+
     def meta_file_path(self, dataset_id):
         return os.path.join(self.dataset_path_local(dataset_id), 'metadata.yaml')
 
     def dataset_path_local(self, dataset_id):
-        dataset = self.dataset_desc_local[self.dataset_desc_local['id'] == str(dataset_id)]
-        return os.path.join(self.data_path, dataset.task.values[0],
-                            dataset.data_size.values[0], dataset.name.values[0])
+        dataset = self.catalog_local.get(dataset_id)
+        return os.path.join(self.data_path, dataset['task'], dataset['data_size'], dataset['name'])
 
     def data_size(self, dataset_id):
-        dataset = self.dataset_desc_local[self.dataset_desc_local['id'] == str(dataset_id)]
-        return dataset.data_size.values[0]
+        return self.catalog_local.get(dataset_id)['data_size']
 
     def data_shape(self, dataset_id):
-        dataset = self.dataset_desc_local[self.dataset_desc_local['id'] == str(dataset_id)]
-        return dataset.shape
+        return self.catalog_local.get(dataset_id)['shape']
+
+    def scales(self, dataset_id):
+        '''The season and the in-sample scales of the series of a cached dataset, None if they are not recorded.'''
+        dataset = self.catalog_local.get(dataset_id)
+        if not isinstance(dataset.get('scales'), str):
+            return None
+        return int(dataset['season']), json.loads(dataset['scales'])
 
 
 def _get_metadata(meta_file_path):
@@ -93,38 +209,65 @@ def _to_dataset(taskdata_id):
 
 
 class TSDataSetLoader(DataSetLoader):
-    def __init__(self, data_path, data_source=None):
+    def __init__(self, data_path, data_source=None, memory_map=False):
         self.data_path = data_path
+        self.memory_map = memory_map
         self.data_source = consts.DATASETS_SOURCE_MAP[
             consts.DATASETS_SOURCE_DEFAULT] if data_source is None else data_source
         self.dataset_desc = TSDataSetDesc(data_path, self.data_source)
 
     def list(self, type=None, data_size=None):
-        df = self.dataset_desc.dataset_desc
-        df = df_util.filter(df, 'data_size', data_size)
-        df = df_util.filter(df, 'task', type)
-        df = df[df['format'] != 'tsf']  # todo support in the future.
-        return df['id'].values
+        catalog = self.dataset_desc.catalog
+        return [dataset_id for dataset_id in catalog.ids(type, data_size)
+                if catalog.get(dataset_id)['format'] != 'tsf']  # todo support in the future.
 
     def exists(self, dataset_id):
         return self.dataset_desc.exists(dataset_id)
 
     def data_format(self, dataset_id):
-        df = self.dataset_desc.dataset_desc
-        return df[df['id'] == str(dataset_id)]['format'].values[0]
+        return self.dataset_desc.catalog.get(dataset_id)['format']
 
     def load_train(self, dataset_id):
         self._download_if_not_cached(dataset_id)
-        df_train = pd.read_csv(self.dataset_desc.train_file_path(dataset_id))
+        df_train = self._load_data(dataset_id, self.dataset_desc.train_file_path(dataset_id),
+                                   self.dataset_desc.train_cache_file_path(dataset_id))
         return df_train
 
     def load_test(self, dataset_id):
         self._download_if_not_cached(dataset_id)
-        df_test = pd.read_csv(self.dataset_desc.test_file_path(dataset_id))
+        df_test = self._load_data(dataset_id, self.dataset_desc.test_file_path(dataset_id),
+                                  self.dataset_desc.test_cache_file_path(dataset_id))
         return df_test
 
+    def _load_data(self, dataset_id, csv_file_path, cache_file_path):
+        ''' Read data from the feather cache, the csv is parsed and converted only once.
+        The cache is rebuilt if the csv file is newer than it. The csv file may not exist if the dataset is
+        downloaded without keeping csv.
+        '''
+        try:
+            return self._read_data(dataset_id, csv_file_path, cache_file_path)
+        except FileNotFoundError:
+            # The dataset dir is missing for a moment while it is replaced by another process, see
+            # file_util._replace. The replacement holds the dataset lock, so the retry waits until it is done.
+            with file_util.lock(self._dataset_lock_path(dataset_id)):
+                return self._read_data(dataset_id, csv_file_path, cache_file_path)
+
+    def _read_data(self, dataset_id, csv_file_path, cache_file_path):
+        if os.path.exists(cache_file_path) and (not os.path.exists(csv_file_path) or
+                                                os.path.getmtime(cache_file_path) >= os.path.getmtime(csv_file_path)):
+            return df_util.read_feather(cache_file_path, memory_map=self.memory_map)
+
+        metadata = self.load_meta(dataset_id)
+        df = pd.read_csv(csv_file_path)
+        df = df_util.parse_date(df, metadata['date_name'], metadata['dtformat'])
+        df_util.to_feather(df, cache_file_path)
+        logger.info(f"Cache {csv_file_path} to {cache_file_path}.")
+        if self.memory_map:
+            return df_util.read_feather(cache_file_path, memory_map=True)
+        return df
+
     def load_meta(self, dataset_id):
-        metadata = self.dataset_desc.dataset_desc[self.dataset_desc.dataset_desc.id == str(dataset_id)].iloc[0].to_dict()
+        metadata = dict(self.dataset_desc.catalog.get(dataset_id))
         return metadata
 
     def ready(self, dataset_id):
@@ -141,6 +284,7 @@ class TSDataSetLoader(DataSetLoader):
         metadata = _get_metadata(self.dataset_desc.meta_file_path(dataset_id))
         metadata['data_size'] = self.dataset_desc.data_size(dataset_id)
         metadata['shape'] = self.dataset_desc.data_shape(dataset_id)
+        metadata['season'], metadata['scales'] = self.load_scales(dataset_id)
 
         metadata['series_name'] = metadata['series_name'].split(
             ",") if 'series_name' in metadata else None
@@ -166,66 +310,112 @@ class TSDataSetLoader(DataSetLoader):
 
         return metadata
 
-    def _download_if_not_cached(self, dataset_id):
+    def load_scales(self, dataset_id):
+        '''The season and the in-sample scales of the series of the dataset, which are computed when the dataset is
+        cached. They are computed and recorded now if the dataset was cached by the former versions.
+        '''
+        scales = self.dataset_desc.scales(dataset_id)
+        if scales is None:
+            logger.info(f"Compute the scales of the dataset {dataset_id} cached without them.")
+            season, series_scales = self._compute_scales(dataset_id, self.load_train(dataset_id))
+            self.dataset_desc.update_local_columns(dataset_id, season=season, scales=series_scales)
+            scales = self.dataset_desc.scales(dataset_id)
+        return scales
+
+    def _compute_scales(self, dataset_id, df_train):
+        '''The season and the in-sample scales of every series of the train data, the scales in json.'''
+        df_values = df_train.drop(columns=[self.load_meta(dataset_id)['date_name']], errors='ignore') \
+            .select_dtypes('number')
+        season = metrics.season_of(self.load_meta(dataset_id)['frequency'], df_values.shape[0])
+        scales = metrics.in_sample_scales(df_values.values, season)
+        series_scales = {name: {key: float(values[i]) for key, values in scales.items()}
+                         for i, name in enumerate(df_values.columns)}
+        return season, json.dumps(series_scales)
+
+    def prefetch(self, dataset_ids, n_workers=consts.DEFAULT_PREFETCH_WORKERS, keep_csv=True):
+        '''Download and verify the datasets in parallel with at most n_workers downloading at the same time.
+        If keep_csv is False, train.csv and test.csv are unzipped straight into the feather cache.
+        '''
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            list(executor.map(lambda dataset_id: self._download_if_not_cached(dataset_id, keep_csv=keep_csv),
+                              dataset_ids))
+
+    def _csv_converter(self, dataset_id):
+        metadata = self.load_meta(dataset_id)
+
+        def to_feather(file_obj, save_path):
+            df = df_util.parse_date(pd.read_csv(file_obj), metadata['date_name'], metadata['dtformat'])
+            df_util.to_feather(df, os.path.splitext(save_path)[0] + '.feather')
+
+        return to_feather
+
+    def _dataset_lock_path(self, dataset_id):
+        return os.path.join(self.data_path, 'tmp', f'{dataset_id}.lock')
+
+    def _download_if_not_cached(self, dataset_id, keep_csv=True):
         if not self.exists(dataset_id):
             raise ValueError(f"TaskData {dataset_id} does not exists!")
-        if not self.dataset_desc.cached(dataset_id):
+        if self.dataset_desc.cached(dataset_id):
+            return
+
+        tmp_path = os.path.join(self.data_path, 'tmp', str(dataset_id))
+        # Lock the dataset, so that the processes share the cache path never download the same dataset at once.
+        with file_util.lock(self._dataset_lock_path(dataset_id)):
+            self.dataset_desc.reload_local()
+            if self.dataset_desc.cached(dataset_id):
+                return
+
             # 1. Get dataset's meta from dataset_desc.
-            meta = self.dataset_desc.dataset_desc[self.dataset_desc.dataset_desc['id'] == str(dataset_id)]
-            task_type = meta['task'].values[0]
-            data_size = meta['data_size'].values[0]
-            name = meta['name'].values[0]
+            meta = self.dataset_desc.catalog.get(dataset_id)
+            task_type = meta['task']
+            data_size = meta['data_size']
+            name = meta['name']
 
-            # 2. Download tmp zip file from cloud.
-            tmp_path = file_util.get_dir_path(os.path.join(self.data_path, 'tmp'))
+            # 2. Download tmp zip file from cloud, a partial file left by the interrupted download will be resumed.
             url = f"{self.data_source}/{task_type}/{data_size}/{name}.zip"
-            import uuid
-            file_name = str(uuid.uuid1()) + '.zip'
-            file_tmp = os.path.join(tmp_path, file_name)
-            download_util.download_and_check(file_tmp, url)
+            file_tmp = os.path.join(file_util.get_dir_path(tmp_path), f'{name}.zip')
+            download_util.download_and_check(file_tmp, url, cache_root=self.data_path)
 
             # 3. Unzip file under data_path
             data_path = os.path.join(self.data_path, task_type, data_size)
-            file_util.unzip(file_tmp, data_path)
+            file_util.unzip(file_tmp, data_path,
+                            csv_converter=None if keep_csv else self._csv_converter(dataset_id))
 
-            # 4. Record to dataset_desc_local.
-            if self.dataset_desc.dataset_desc_local is not None:
-                self.dataset_desc.dataset_desc_local = pd.concat([self.dataset_desc.dataset_desc_local, meta], 0)
-            else:
-                self.dataset_desc.dataset_desc_local = meta.copy()
-            self.dataset_desc.dataset_desc_local.to_csv(self.dataset_desc._desc_local_file(), index=False)
+            # 4. Compute the scales of the metrics once, and record them to dataset_desc_local.
+            dataset_path = os.path.join(data_path, name)
+            df_train = self._load_data(dataset_id, os.path.join(dataset_path, 'train.csv'),
+                                       os.path.join(dataset_path, 'train.feather'))
+            season, scales = self._compute_scales(dataset_id, df_train)
+            self.dataset_desc.update_local(dataset_id, season=season, scales=scales)
 
             # 5. Remove tmp file.
             os.remove(file_tmp)
 
 
 class TSTaskDataLoader():
-    def __init__(self, data_path, data_source=None):
+    def __init__(self, data_path, data_source=None, memory_map=False):
         self.data_path = data_path
-        self.dataset_loader = TSDataSetLoader(data_path, data_source)
+        self.dataset_loader = TSDataSetLoader(data_path, data_source, memory_map=memory_map)
 
     def list(self, type=None, data_size=None):
-        df = self.dataset_loader.dataset_desc.dataset_desc
-        df = df_util.filter(df, 'data_size', data_size)
-        df = df_util.filter(df, 'task', type)
-        df = df[df['format'] != 'tsf']  # todo support in the future.
+        catalog = self.dataset_loader.dataset_desc.catalog
 
         taskdata_list = []
 
-        for i, row in df.iterrows():
-            task_count = row['task_count']
+        for dataset_id in self.dataset_loader.list(type, data_size):
+            task_count = catalog.get(dataset_id)['task_count']
             if task_count == 1:
-                taskdata_list.append(str(row['id']))
+                taskdata_list.append(dataset_id)
             else:
-                taskdata_list = taskdata_list + [str("{}_{}".format(row['id'], i)) for i in range(task_count)]
+                taskdata_list.extend([str("{}_{}".format(dataset_id, i)) for i in range(task_count)])
 
         return taskdata_list
 
     def exists(self, task_data_id):
-        df = self.dataset_loader.dataset_desc.dataset_desc
         dataset_id, task_no = _to_dataset(task_data_id)
-        row = df[df['id'] == str(dataset_id)]
-        return row.shape[0] == 1 and int(row['task_count'].values[0]) >= task_no
+        dataset = self.dataset_loader.dataset_desc.catalog.get(dataset_id)
+        return dataset is not None and int(dataset['task_count']) >= task_no
 
     def load_meta(self, task_data_id):
         dataset_id, task_no = _to_dataset(task_data_id)
@@ -252,9 +442,9 @@ class TSTaskDataLoader():
 
 
 class TSTaskLoader(TaskLoader):
-    def __init__(self, data_path, data_source=None):
+    def __init__(self, data_path, data_source=None, memory_map=False):
         self.data_path = data_path
-        self.taskdata_loader = TSTaskDataLoader(data_path, data_source)
+        self.taskdata_loader = TSTaskDataLoader(data_path, data_source, memory_map=memory_map)
 
     def list(self, type=None, data_size=None):
         return self.taskdata_loader.list(type, data_size)
@@ -262,6 +452,10 @@ class TSTaskLoader(TaskLoader):
     def exists(self, taskconfig_id):
         return self.taskdata_loader.exists(taskconfig_id)
 
+    def prefetch(self, taskconfig_ids, n_workers=consts.DEFAULT_PREFETCH_WORKERS, keep_csv=True):
+        dataset_ids = list(dict.fromkeys([_to_dataset(tid)[0] for tid in taskconfig_ids]))
+        self.taskdata_loader.dataset_loader.prefetch(dataset_ids, n_workers=n_workers, keep_csv=keep_csv)
+
     def load(self, taskconfig_id):
         metadata = self.taskdata_loader.load_meta(taskconfig_id)
         dataset_id, task_no = _to_dataset(taskconfig_id)
@@ -1,6 +1,13 @@
 import os
+import json
+import uuid
+import shutil
 import requests
 import zipfile
+from contextlib import contextmanager
+from hashlib import md5
+
+import pandas as pd
 
 import tsbenchmark.consts as consts
 from hypernets.utils import logging
@@ -45,7 +52,7 @@ class file_util:
     def get_dir_path(dir_path):
         dir_path = os.path.expanduser(dir_path)
         if not os.path.exists(dir_path):
-            os.makedirs(dir_path)
+            os.makedirs(dir_path, exist_ok=True)
         return dir_path
 
     @staticmethod
@@ -71,6 +78,38 @@ class file_util:
             with open(file_path, "w") as f:
                 pass
 
+    @staticmethod
+    @contextmanager
+    def atomic_write(file_path):
+        '''Yield a temp path to write, it is renamed to file_path when the block exits without error.
+        Concurrent readers never see a half-written file_path.
+        '''
+        file_tmp = f"{file_path}.{uuid.uuid1()}.tmp"
+        try:
+            yield file_tmp
+            os.replace(file_tmp, file_path)
+        finally:
+            file_util.remove(file_tmp)
+
+    @staticmethod
+    @contextmanager
+    def lock(lock_path):
+        '''Hold an exclusive lock on lock_path, it blocks other threads and processes locking the same path.
+        '''
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, 'a') as f:
+            try:
+                import fcntl
+            except ImportError:  # TODO support windows
+                fcntl = None
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
     @staticmethod
     def remove(file_path):
         if os.path.exists(file_path):
@@ -80,32 +119,58 @@ class file_util:
                 os.removedirs(file_path)
 
     @staticmethod
-    def unzip(zipPath, unZipPath):
-        import zipfile
+    def unzip(zipPath, unZipPath, members=None, csv_converter=None):
         '''Unzip file
            zipPath : The file which will be unzip.
            unZipPath : The path which the files will be unzip to.
+           members : The base names of the files to unzip, default is None means all files.
+           csv_converter : callable(file_obj, save_path), optional. If it is set, the csv files are passed to it as
+               streams instead of being written to save_path.
+
+           The files are copied in chunks to a temp dir under unZipPath, and the top level entries are moved to
+           unZipPath by renaming when all of them are done, so readers never see half-written files.
            '''
         if not os.path.exists(zipPath):
-            raise 'function unZipFile:not exists file or dir(%s)' % zipPath;
+            raise FileNotFoundError('function unZipFile:not exists file or dir(%s)' % zipPath)
         if unZipPath == '':
-            unZipPath = os.path.splitext(zipPath)[0];
-        if not unZipPath.endswith(os.sep):
-            unZipPath += os.sep
-        z = zipfile.ZipFile(zipPath, 'r')
-        for k in z.infolist():
-            savePath = unZipPath + k.filename
-            saveDir = os.path.dirname(savePath)
-            if not os.path.exists(saveDir):
-                os.makedirs(saveDir)
-            if os.path.isdir(savePath):
-                if not os.path.exists(savePath):
-                    os.makedirs(savePath)
-            else:
-                f = open(savePath, 'wb')
-                f.write(z.read(k))
-                f.close()
-        z.close()
+            unZipPath = os.path.splitext(zipPath)[0]
+        tmp_dir = os.path.join(unZipPath, f'.unzip-{uuid.uuid1()}')
+        try:
+            with zipfile.ZipFile(zipPath, 'r') as z:
+                for k in z.infolist():
+                    save_path = os.path.join(tmp_dir, k.filename)
+                    if k.is_dir():
+                        os.makedirs(save_path, exist_ok=True)
+                        continue
+                    if members is not None and os.path.basename(k.filename) not in members:
+                        continue
+                    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+                    with z.open(k) as src:
+                        if csv_converter is not None and k.filename.endswith('.csv'):
+                            csv_converter(src, save_path)
+                        else:
+                            with open(save_path, 'wb') as dst:
+                                shutil.copyfileobj(src, dst, md5_util.CHUNK_SIZE)
+            if os.path.exists(tmp_dir):
+                for name in os.listdir(tmp_dir):
+                    file_util._replace(os.path.join(tmp_dir, name), os.path.join(unZipPath, name))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _replace(src, dst):
+        '''Replace dst by src with renaming. A file is replaced atomically, but a directory is missing between the
+        two renames, so directories are replaced under a lock that the readers take to retry when dst is missing,
+        e.g. the dataset lock of TSDataSetLoader.
+        '''
+        if os.path.isdir(dst):
+            # move the old one away first
+            dst_old = f"{dst}.{uuid.uuid1()}.old"
+            os.replace(dst, dst_old)
+            os.replace(src, dst)
+            shutil.rmtree(dst_old, ignore_errors=True)
+        else:
+            os.replace(src, dst)
 
     @staticmethod
     def exeZipFile(filePath, zipFilePath=''):
@@ -192,42 +257,65 @@ class file_util:
 
 class download_util:
     @staticmethod
-    def download(file_path, url):
+    def download(file_path, url, resume=False):
+        '''Download url to file_path and return the md5 of it, which is computed while the file is written.
+        If resume is True and file_path is partially downloaded, only the rest of it is requested by HTTP range.
+        '''
         logger.info(f"Begin download {file_path} from {url}")
         file_util.get_or_create_file(file_path)
-        response = requests.get(url=url, stream=True)
-        if response.status_code == 200:
+        offset = os.path.getsize(file_path) if resume else 0
+        headers = {'Range': f'bytes={offset}-'} if offset > 0 else None
+        response = requests.get(url=url, stream=True, headers=headers)
+        hasher = md5()
+        if response.status_code in (206, 416):  # 416 means the partial file is already complete
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(md5_util.CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+        if response.status_code == 416:
+            logger.info(f"Already downloaded {file_path} from {url}")
+        elif response.status_code in (200, 206):
             chunk_size = 1024 * 8
-            with open(file_path, 'wb') as f:
+            mode = 'ab' if response.status_code == 206 else 'wb'
+            with open(file_path, mode) as f:
                 for chunk in response.iter_content(chunk_size=chunk_size):
                     if chunk:
                         f.write(chunk)
+                        hasher.update(chunk)
             logger.info(f"Finish download {file_path} from {url}")
         else :
             raise FileNotFoundError(f"Download error with status_code {response.status_code} for "
                                     f"{file_path} from {url}")
+        return hasher.hexdigest()
 
     @staticmethod
-    def download_and_check(file_path, url):
+    def download_and_check(file_path, url, cache_root=None):
+        '''Download url to file_path and check it with the .md5sum beside the url.
+        The file is downloaded to file_path.part first and renamed after checked, an interrupted download is
+        resumed from the part file. The md5 is recorded to the manifest of cache_root if it is set.
+        '''
 
-        if md5_util.check_md5sum_onefile(file_path):
+        if md5_util.check_md5sum_onefile(file_path, cache_root=cache_root):
             return True
 
         download_success = False
+        part_path = file_path + '.part'
         md5sum_path = os.path.join(os.path.dirname(file_path), '.md5sum')
         url_md5sum = url[:url.rfind('/') + 1] + ".md5sum"
         check_name = url[url.rfind('/') + 1:]
         for i in range(consts.DEFAULT_DOWNLOAD_RETRY_TIMES):
-            file_util.remove(file_path)
+            if i > 0:
+                file_util.remove(part_path)
             file_util.remove(md5sum_path)
-            download_util.download(file_path, url)
+            md5_value = download_util.download(part_path, url, resume=True)
             download_util.download(md5sum_path, url_md5sum)
-            if md5_util.check_md5sum_onefile(file_path, check_name):
+            if md5_value == md5_util.get_md5sum_value(os.path.dirname(md5sum_path), check_name):
+                os.replace(part_path, file_path)
+                md5_util.record(file_path, md5_value, cache_root)
                 download_success = True
                 break
         if not download_success:
             raise FileNotFoundError(
-                r"Download failed for {url_file} in {consts.DEFAULT_DOWNLOAD_RETRY_TIMES} times.")
+                f"Download failed for {url} in {consts.DEFAULT_DOWNLOAD_RETRY_TIMES} times.")
 
 
 class dict_util:
@@ -246,17 +334,162 @@ class df_util:
                 df = df[df[filter_key] == filter_value]
         return df
 
+    @staticmethod
+    def parse_date(df, date_name, dtformat):
+        '''Parse the date column to datetime with the dataset's dtformat.
+        If the column can not be parsed, it will be kept as it is.
+        '''
+        if date_name not in df.columns or not isinstance(dtformat, str):
+            return df
+        try:
+            df[date_name] = pd.to_datetime(df[date_name], format=dtformat)
+        except (ValueError, TypeError):
+            logger.warning(f"Failed to parse column {date_name} with format {dtformat}, keep it as it is.")
+        return df
 
-from hashlib import md5
+    @staticmethod
+    def to_feather(df, file_path):
+        '''Write the dataframe to a feather file atomically.
+        It is written to a temp file first and then renamed, so concurrent readers never see a half-written file.
+        The file is uncompressed and NaN of float columns is kept as value instead of null, so that numeric
+        columns can be memory-mapped without copy.
+        '''
+        import pyarrow as pa
+        from pyarrow import feather
+
+        arrays = [pa.array(df[col].values, from_pandas=df[col].dtype == object) for col in df.columns]
+        table = pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns])
+        with file_util.atomic_write(file_path) as file_tmp:
+            feather.write_feather(table, file_tmp, compression='uncompressed')
+
+    @staticmethod
+    def read_feather(file_path, memory_map=False):
+        '''Read the dataframe from a feather file.
+        With memory_map, numeric columns are zero-copy views of the mapped file, so concurrent processes reading the
+        same file share the physical pages. These columns are read-only.
+        '''
+        from pyarrow import feather
+        table = feather.read_table(file_path, memory_map=memory_map)
+        return table.to_pandas(split_blocks=memory_map)
+
+    @staticmethod
+    def to_pickle(df, file_path):
+        with file_util.atomic_write(file_path) as file_tmp:
+            df.to_pickle(file_tmp)
+
+
+class payload_util:
+    '''Encode dataframes to compact binary payloads which can be sent in json, e.g. the predictions in report data.
+    The values are saved as a compressed npz and encoded with base64, the payload is a dict like
+    {'format': 'npz', 'columns': [...], 'data': '...'}.
+    '''
+    FORMAT_NPZ = 'npz'
+
+    @staticmethod
+    def encode(df, float32=False):
+        import base64
+        import io
+        import numpy as np
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, values=df.values.astype('float32' if float32 else 'float64'))
+        return {'format': payload_util.FORMAT_NPZ,
+                'columns': [str(col) for col in df.columns],
+                'data': base64.b64encode(buffer.getvalue()).decode('ascii')}
+
+    @staticmethod
+    def decode(payload):
+        '''Decode the payload to a dataframe.
+        The json records string like '{"a":1} {"a":2}' sent by the former versions is supported too.
+        '''
+        import base64
+        import io
+        import numpy as np
+
+        if isinstance(payload, str):
+            return pd.DataFrame(json.loads('[' + payload.replace('} {', '},{') + ']'))
+        if payload.get('format') != payload_util.FORMAT_NPZ:
+            raise ValueError(f"Unsupported payload format {payload.get('format')}.")
+        with np.load(io.BytesIO(base64.b64decode(payload['data']))) as data:
+            values = data['values']
+        return pd.DataFrame(values, columns=payload['columns'])
 
 
 class md5_util:
+    CHUNK_SIZE = 1024 * 1024
+    MANIFEST_FILE_NAME = '.md5manifest'
+
     @staticmethod
-    def get_md5(file_path):
-        with open(file_path, 'rb') as f:
-            md5_value = md5(f.read()).hexdigest()
+    def get_md5(file_path, cache_root=None):
+        '''Get md5 of the file by reading it in chunks.
+        If cache_root is set, e.g. the data path of a dataset loader, the md5 of a file under it is recorded to the
+        manifest in cache_root, keyed by the absolute path, size and mtime of the file, so the file is not hashed
+        again until it changes.
+        '''
+        md5_value = md5_util.lookup(file_path, cache_root)
+        if md5_value is None:
+            hasher = md5()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(md5_util.CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            md5_value = hasher.hexdigest()
+            md5_util.record(file_path, md5_value, cache_root)
         return md5_value
 
+    @staticmethod
+    def _manifest_key(file_path, cache_root):
+        '''The key of the file in the manifest, None if there is no cache root or the file is out of it.'''
+        if cache_root is None:
+            return None
+        file_path = os.path.abspath(file_path)
+        cache_root = os.path.abspath(cache_root)
+        if os.path.commonpath([file_path, cache_root]) != cache_root:
+            return None
+        return file_path
+
+    @staticmethod
+    def _manifest_path(cache_root):
+        return os.path.join(cache_root, md5_util.MANIFEST_FILE_NAME)
+
+    @staticmethod
+    def _load_manifest(manifest_path):
+        if not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            logger.warning(f"Ignore broken md5 manifest {manifest_path}.")
+            return {}
+
+    @staticmethod
+    def lookup(file_path, cache_root=None):
+        '''Get the recorded md5 of the file, None if it is not recorded or the file has changed since recorded.
+        '''
+        key = md5_util._manifest_key(file_path, cache_root)
+        if key is None:
+            return None
+        entry = md5_util._load_manifest(md5_util._manifest_path(cache_root)).get(key)
+        stat = os.stat(file_path)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return entry['md5']
+        return None
+
+    @staticmethod
+    def record(file_path, md5_value, cache_root=None):
+        '''Record the md5 of the file to the manifest of cache_root, other files are hashed every time.'''
+        key = md5_util._manifest_key(file_path, cache_root)
+        if key is None:
+            return
+        manifest_path = md5_util._manifest_path(cache_root)
+        stat = os.stat(file_path)
+        with file_util.lock(manifest_path + '.lock'):
+            manifest = md5_util._load_manifest(manifest_path)
+            manifest[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'md5': md5_value}
+            with file_util.atomic_write(manifest_path) as file_tmp:
+                with open(file_tmp, 'w') as f:
+                    json.dump(manifest, f)
+
     @staticmethod
     def get_md5sum(dir_check):
         file_md5sum = os.path.join(dir_check, '.md5sum')
@@ -265,7 +498,18 @@ class md5_util:
         return content
 
     @staticmethod
-    def check_md5sum(dir_check):
+    def get_md5sum_value(dir_check, check_name):
+        '''Get the expected md5 of check_name from the .md5sum in dir_check.
+        '''
+        for item in md5_util.get_md5sum(dir_check).splitlines():
+            hash_value = item.split()[0]
+            file_name = item.split()[1]
+            if bytes.decode(file_name) == check_name:
+                return bytes.decode(hash_value)
+        return None
+
+    @staticmethod
+    def check_md5sum(dir_check, cache_root=None):
         if not os.path.exists(dir_check) or not os.path.exists(os.path.join(dir_check, '.md5sum')):
             return False
 
@@ -276,35 +520,25 @@ class md5_util:
             hash_value = item.split()[0]
             file_name = item.split()[1]
             file_path = os.path.join(dir_check, bytes.decode(file_name))
-            hash_calc = md5_util.get_md5(file_path)
+            hash_calc = md5_util.get_md5(file_path, cache_root)
             if not (bytes.decode(hash_value) == hash_calc):
                 flag = False
                 break
         return flag
 
     @staticmethod
-    def check_md5sum_onefile(file_check, check_name=None):
+    def check_md5sum_onefile(file_check, check_name=None, cache_root=None):
         dir_path = os.path.dirname(file_check)
         if not os.path.exists(file_check) or not os.path.exists(os.path.join(dir_path, '.md5sum')):
             return False
 
         check_name = check_name if check_name is not None else os.path.basename(file_check)
+        hash_value = md5_util.get_md5sum_value(dir_path, check_name)
+        return hash_value is not None and hash_value == md5_util.get_md5(file_check, cache_root)
 
-        flag = False
-        content = md5_util.get_md5sum(dir_path)
-        check_list = content.splitlines()
-        for item in check_list:
-            hash_value = item.split()[0]
-            file_name = item.split()[1]
-            if bytes.decode(file_name) == check_name:
-                hash_calc = md5_util.get_md5(file_check)
-                if bytes.decode(hash_value) == hash_calc:
-                    flag = True
-                    break
-        return flag
 
-
-def cal_task_metrics(y_pred, y_true, date_col_name, series_col_name, covariables, metrics_target, task_calc_score):
+def cal_task_metrics(y_pred, y_true, date_col_name, series_col_name, covariables, metrics_target, task_calc_score,
+                     scales=None):
     from tsbenchmark import metrics
     if series_col_name != None:
         y_pred = y_pred[series_col_name]
@@ -323,6 +557,17 @@ def cal_task_metrics(y_pred, y_true, date_col_name, series_col_name, covariables
         if cols_del_y_pred is not None and len(cols_del_y_pred) > 1:
             y_pred = y_pred.drop(columns=cols_del_y_true)
 
+    if task_calc_score == 'regression' and metrics.is_regression_metrics(metrics_target):
+        if scales is None:
+            # e.g. the datasets cached by former versions have no scales, the other metrics are still computed
+            scaled = [m for m in metrics_target if metrics._to_regression_metric(m) in metrics.SCALED_METRICS]
+            if len(scaled) > 0:
+                logger.warning(f"Skip metrics {scaled} because of the scales of the dataset are unknown.")
+                metrics_target = [m for m in metrics_target if m not in scaled]
+        # the scales of the dataset are keyed by the series
+        series_scales = metrics.scales_of_series(scales, y_true.columns) if scales is not None else None
+        return metrics.calc_regression_scores(y_true, y_pred, metrics=metrics_target, scales=series_scales)
+
     metrics_task = metrics.calc_score(y_true, y_pred,
                                       metrics=metrics_target, task=task_calc_score)
     return metrics_task
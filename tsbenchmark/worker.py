@@ -0,0 +1,273 @@
+'''Warm workers of the custom_python players.
+
+A worker is a process started once per player, it imports the modules to preload and the exec file of the
+player, then listens on a unix socket. For every job it forks a child which runs `main()` of the exec file with
+the environments, working dir and standard streams of the job, so the job skips the cold start of the interpreter
+while it is still isolated in its own process. The child runs in its own process group, which is killed once the
+client of the job disconnects, e.g. the job is killed by the scheduler, or the worker stops.
+
+This module is also run by the jobs as the client of the workers, so it imports nothing heavy at the module level.
+'''
+import argparse
+import array
+import importlib
+import importlib.util
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+EXEC_MODULE_NAME = 'tsb_player_exec'
+
+STD_FDS = [0, 1, 2]
+
+
+def _load_exec_module(python_script, module_name=EXEC_MODULE_NAME):
+    script_dir = os.path.dirname(os.path.abspath(python_script))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    spec = importlib.util.spec_from_file_location(module_name, python_script)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    if not callable(getattr(module, 'main', None)):
+        raise ValueError(f"{python_script} has no function 'main'")
+    return module
+
+
+def _recv_request(connection):
+    fds = array.array('i')
+    data, ancdata, _, _ = connection.recvmsg(4096, socket.CMSG_LEN(len(STD_FDS) * fds.itemsize))
+    for level, type_, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[:len(cmsg_data) - (len(cmsg_data) % fds.itemsize)])
+    while not data.endswith(b'\n'):
+        chunk = connection.recv(65536)
+        if not chunk:
+            raise ConnectionError("connection closed before the request is complete")
+        data = data + chunk
+    return json.loads(data.decode('utf-8')), list(fds)
+
+
+def _watch_client(connection, worker_pid):
+    # the client sends nothing after the request, the connection is readable only if the client is gone
+    connection.settimeout(1)
+    while True:
+        try:
+            if not connection.recv(64):
+                break
+        except socket.timeout:
+            if os.getppid() != worker_pid:
+                break
+        except OSError:
+            break
+    # the job is killed or timed out, or the worker is stopped, kill the job with the processes it started
+    os.killpg(os.getpid(), signal.SIGKILL)
+
+
+def _run_job(connection, module, python_script, worker_pid):
+    request, fds = _recv_request(connection)
+    threading.Thread(target=_watch_client, args=(connection, worker_pid), daemon=True).start()
+    # take over the standard streams of the job
+    for target_fd, fd in zip(STD_FDS, fds):
+        os.dup2(fd, target_fd)
+        os.close(fd)
+    os.environ.clear()
+    os.environ.update(request['env'])
+    os.chdir(request['cwd'])
+    sys.argv = [python_script]
+
+    code = 0
+    try:
+        module.main()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    connection.sendall(f'{code}\n'.encode('utf-8'))
+    return code
+
+
+def serve(socket_path, python_script, preload=None):
+    for module_name in preload or []:
+        importlib.import_module(module_name)
+    module = _load_exec_module(python_script)
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(128)
+
+    # every job runs in its own process group, which is killed if the job is still running when the worker stops
+    worker_pid = os.getpid()
+    children = set()
+
+    def reap_children(signum, frame):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            children.discard(pid)
+
+    def kill_children(signum, frame):
+        for pid in list(children):
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        sys.exit(0)
+
+    signal.signal(signal.SIGCHLD, reap_children)
+    signal.signal(signal.SIGTERM, kill_children)
+    print(f"warm worker of {python_script} is listening on {socket_path}", flush=True)
+
+    try:
+        while True:
+            connection, _ = server.accept()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # a child must not be reaped before it is recorded
+            signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGCHLD])
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    os.setpgid(0, 0)
+                    server.close()
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    signal.pthread_sigmask(signal.SIG_UNBLOCK, [signal.SIGCHLD])
+                    code = _run_job(connection, module, python_script, worker_pid)
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    os._exit(code)
+            try:
+                # also set in the parent, so that the group exists once fork returns
+                os.setpgid(pid, pid)
+            except (ProcessLookupError, PermissionError):
+                pass
+            children.add(pid)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, [signal.SIGCHLD])
+            connection.close()
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def connect(socket_path, python_script):
+    '''Run the job in the warm worker listening on socket_path and return the exit code of it.
+    The job runs with a cold interpreter if the worker is not available.
+    '''
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError as e:
+        client.close()
+        sys.stderr.write(f"warm worker at {socket_path} is not available({e}), run {python_script} directly\n")
+        sys.stderr.flush()
+        return subprocess.call([sys.executable, python_script])
+
+    with client:
+        request = json.dumps({'env': dict(os.environ), 'cwd': os.getcwd()}).encode('utf-8') + b'\n'
+        client.sendmsg([request], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', STD_FDS))])
+        response = b''
+        while not response.endswith(b'\n'):
+            chunk = client.recv(64)
+            if not chunk:
+                sys.stderr.write(f"warm worker at {socket_path} exited before the job finished\n")
+                return 1
+            response = response + chunk
+    return int(response.decode('utf-8'))
+
+
+class WarmWorkerPool:
+    '''Start and stop the warm workers of the players on the local machine.'''
+
+    def __init__(self, socket_dir=None, start_timeout=300):
+        # the path of a unix socket is limited to about 100 chars, so it is not in the working dir
+        self.socket_dir = socket_dir if socket_dir is not None else tempfile.mkdtemp(prefix='tsb-workers')
+        self.start_timeout = start_timeout
+        self._workers = {}
+
+    def socket_path(self, player_name):
+        return os.path.join(self.socket_dir, f'{player_name}.sock')
+
+    def start(self, player_name, py_executable, python_script, preload=None):
+        socket_path = self.socket_path(player_name)
+        command = [py_executable, '-m', 'tsbenchmark.worker', 'serve', f'--socket={socket_path}',
+                   f'--python-script={python_script}']
+        if preload is not None and len(preload) > 0:
+            command.append(f"--preload={','.join(preload)}")
+
+        env = os.environ.copy()
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env['PYTHONPATH'] = os.pathsep.join(p for p in [package_dir, env.get('PYTHONPATH')] if p)
+        with open(os.path.join(self.socket_dir, f'{player_name}.log'), 'w') as log_file:
+            process = subprocess.Popen(command, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+        self._workers[player_name] = process
+
+        start_at = time.time()
+        while not os.path.exists(socket_path):
+            if process.poll() is not None:
+                raise RuntimeError(f"warm worker of player {player_name} exited with code {process.returncode}, "
+                                   f"see {os.path.join(self.socket_dir, f'{player_name}.log')}")
+            if time.time() - start_at > self.start_timeout:
+                self.stop()
+                raise TimeoutError(f"warm worker of player {player_name} is not ready in {self.start_timeout}s")
+            time.sleep(0.1)
+        return socket_path
+
+    def stop(self):
+        # a worker kills the process groups of its running jobs on SIGTERM, the jobs kill themselves if it is killed
+        for process in self._workers.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in self._workers.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._workers = {}
+        shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser('python -m tsbenchmark.worker', description='warm workers of the players')
+    subparsers = parser.add_subparsers(dest='operation')
+    serve_parser = subparsers.add_parser('serve', help='start a warm worker')
+    serve_parser.add_argument('--socket', type=str, required=True)
+    serve_parser.add_argument('--python-script', type=str, required=True)
+    serve_parser.add_argument('--preload', type=str, default='', help='modules to import, separated by comma')
+    connect_parser = subparsers.add_parser('connect', help='run a job in a warm worker')
+    connect_parser.add_argument('--socket', type=str, required=True)
+    connect_parser.add_argument('--python-script', type=str, required=True)
+
+    args = parser.parse_args()
+    if args.operation == 'serve':
+        serve(args.socket, args.python_script, [m for m in args.preload.split(',') if m])
+    elif args.operation == 'connect':
+        sys.exit(connect(args.socket, args.python_script))
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()